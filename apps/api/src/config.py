@@ -29,8 +29,36 @@ class Settings(BaseSettings):
     s3_secret_key: str = "minioadmin"
     s3_bucket: str = "zmage"
     
+    # 上传
+    upload_chunk_size: int = 8 * 1024 * 1024  # 流式上传分片大小 (S3 分片最小 5MB)
+    upload_probe_bytes: int = 512 * 1024  # 流式上传时保留用于 EXIF/尺寸探测的文件头字节数
+    upload_stream_threshold: int = 32 * 1024 * 1024  # 超过该大小的文件走流式上传
+    upload_session_ttl_hours: int = 24  # 断点续传会话有效期
+    ingest_concurrency: int = 8  # 批量上传时并行处理的文件数
+    media_process_workers: int = 0  # 图片分析进程池大小 (0 表示 CPU 核数)
+    folder_cache_size: int = 10000  # 每个用户缓存的文件夹路径数
+    import_roots: str = "/app/test_media"  # 允许服务端导入的本地目录（逗号分隔）
+    import_batch_size: int = 64  # 服务端导入每批处理的文件数
+    
+    # 任务队列
+    task_queue_enabled: bool = True  # 关闭时资产处理/后台任务在 API 进程内执行
+    queue_concurrency: int = 4  # 每个消费者进程并行执行的任务数
+    queue_visibility_timeout: int = 300  # 消费者失联多久后任务被重新投递 (秒)
+    queue_max_attempts: int = 5  # 最大执行次数，超过后进入死信队列
+    queue_retry_backoff: int = 10  # 首次重试延迟 (秒)，之后按指数增长
+    queue_retry_backoff_max: int = 600  # 重试延迟上限 (秒)
+    queue_poll_interval: float = 1.0  # 队列为空时的轮询间隔 (秒)
+    
     # Gemini
     gemini_api_key: str = ""
+    gemini_concurrency: int = 8  # 每个进程同时进行的 Gemini 调用数
+    gemini_requests_per_minute: int = 300  # 每个进程的请求速率上限 (0 表示不限速)
+    gemini_max_retries: int = 4  # 429/5xx 的最大重试次数
+    gemini_retry_backoff: float = 1.0  # 首次重试延迟 (秒)，之后按指数增长
+    gemini_retry_backoff_max: float = 30.0  # 重试延迟上限 (秒)
+    ai_analysis_max_side: int = 1536  # 发送给 AI 分析的图片长边上限 (0 表示发送原图)
+    ai_analysis_format: str = "jpeg"  # 分析图片编码格式: jpeg / webp
+    ai_analysis_quality: int = 85  # 分析图片编码质量
     
     # JWT
     jwt_secret: str = "your_jwt_secret_key"
@@ -39,6 +67,18 @@ class Settings(BaseSettings):
     
     # 向量维度
     embedding_dimension: int = 768
+    reindex_batch_size: int = 100  # 重建索引时每批处理的资产数
+    
+    # 检索
+    ai_search_max_candidates: int = 500  # AI 语义检索的候选上限（分页在候选集内进行）
+    ai_search_min_score: float = 0.65  # AI 语义检索的最低相似度
+    hybrid_search_candidates: int = 100  # 混合检索中关键词/向量各取的候选数
+    hybrid_min_score: float = 0.5  # 混合检索中向量候选的最低相似度
+    query_embedding_cache_size: int = 1024  # 进程内缓存的查询向量条数 (0 表示关闭)
+    query_embedding_cache_ttl: int = 3600  # 进程内查询向量缓存有效期 (秒)
+    query_embedding_redis_ttl: int = 86400  # Redis 中查询向量缓存有效期 (秒，0 表示不使用 Redis)
+    search_facet_limit: int = 20  # 每个搜索分面返回的最多项数
+    search_cache_ttl: int = 300  # 搜索结果缓存有效期 (秒，0 表示关闭)
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,137 @@
+"""
+任务队列消费者
+
+独立进程运行 (python -m src.consumer)，从 Redis 队列取出资产处理、后台任务等
+耗时工作执行，使 API 进程只负责请求处理。每个进程并行执行 QUEUE_CONCURRENCY 个
+任务，处理吞吐量通过增加消费者副本扩展。
+"""
+import asyncio
+import signal
+from datetime import datetime
+from typing import Dict, Any
+
+from redis.exceptions import RedisError
+
+from src.config import settings
+from src.services.queue import job_queue, Job
+from src.utils.redis import close_redis
+
+
+async def handle_process_asset(args: Dict[str, Any]):
+    """资产处理（AI 分析 + 向量化），异常向上抛出以触发重试"""
+    from src.models.database import async_session_maker
+    from src.services import asset_service
+
+    async with async_session_maker() as db:
+        await asset_service.process_asset(db, args["asset_id"])
+
+
+async def handle_execute_task(args: Dict[str, Any]):
+    """后台任务（相册建议、重建索引、服务端导入）"""
+    from src.routers.tasks import execute_task_background
+
+    await execute_task_background(args["task_id"])
+
+
+HANDLERS = {
+    "process_asset": handle_process_asset,
+    "execute_task": handle_execute_task,
+}
+
+
+class Consumer:
+    """队列消费者"""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.stopping = asyncio.Event()
+
+    async def _sleep(self, seconds: float):
+        """可被停止信号打断的等待"""
+        try:
+            await asyncio.wait_for(self.stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _heartbeat(self, job: Job):
+        """执行期间定期延长可见性截止时间"""
+        interval = max(settings.queue_visibility_timeout / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await job_queue.extend(job)
+            except RedisError as e:
+                print(f"任务心跳失败 {job.id}: {e}")
+
+    async def _run_job(self, job: Job):
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            handler = HANDLERS.get(job.type)
+            if handler is None:
+                raise ValueError(f"未知的任务类型: {job.type}")
+            await handler(job.args)
+            await job_queue.ack(job)
+        except Exception as e:
+            retrying = await job_queue.fail(job, str(e))
+            action = "稍后重试" if retrying else "已放弃"
+            print(f"任务失败 {job.type} {job.args} (第 {job.attempts} 次，{action}): {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _worker(self, index: int):
+        while not self.stopping.is_set():
+            try:
+                job = await job_queue.reserve()
+            except RedisError as e:
+                print(f"[worker-{index}] 队列连接失败: {e}")
+                await self._sleep(settings.queue_poll_interval * 5)
+                continue
+
+            if job is None:
+                await self._sleep(settings.queue_poll_interval)
+                continue
+
+            await self._run_job(job)
+
+    async def _reaper(self):
+        """定期回收可见性超时的任务"""
+        interval = max(settings.queue_visibility_timeout / 4, 5)
+        while not self.stopping.is_set():
+            try:
+                reaped = await job_queue.reap()
+                if reaped:
+                    print(f"重新投递了 {reaped} 个超时任务")
+            except RedisError as e:
+                print(f"超时任务回收失败: {e}")
+            await self._sleep(interval)
+
+    async def run(self):
+        workers = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+        reaper = asyncio.create_task(self._reaper())
+        # 收到停止信号后不再取新任务，等待执行中的任务完成
+        await asyncio.gather(*workers)
+        reaper.cancel()
+
+
+async def main():
+    """主函数"""
+    print("Zmage 队列消费者启动")
+    print(f"时间: {datetime.now().isoformat()}")
+    print(f"并发数: {settings.queue_concurrency}")
+
+    consumer = Consumer(settings.queue_concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, consumer.stopping.set)
+
+    try:
+        await consumer.run()
+    finally:
+        from src.services.media import media_service
+        media_service.shutdown()
+        await close_redis()
+        print("队列消费者已停止")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
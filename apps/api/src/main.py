@@ -1,6 +1,7 @@
 """
 Zmage API 主入口
 """
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -27,6 +28,8 @@ from src.routers import (
     vault_router,
     batch_router,  # 新增批量操作
     stats_router,  # 新增统计接口
+    uploads_router,
+    tags_router,
 )
 
 
@@ -50,12 +53,36 @@ async def lifespan(app: FastAPI):
     # 初始化默认下载预设
     await init_default_presets()
     
+    # 后台为历史向量补写检索过滤字段（不阻塞启动）
+    backfill = asyncio.create_task(backfill_vector_payloads())
+    
     yield
     
+    backfill.cancel()
     # 关闭时
+    from src.services.media import media_service
+    media_service.shutdown()
+    from src.utils.redis import close_redis
+    await close_redis()
     print("应用关闭")
 
 
+async def backfill_vector_payloads():
+    """为缺少租户/可见性字段的历史向量补写元数据"""
+    from src.models.database import async_session_maker
+    from src.services.embedding import embedding_service
+    
+    try:
+        async with async_session_maker() as db:
+            updated = await embedding_service.backfill_payloads(db)
+        if updated:
+            print(f"已为 {updated} 个历史向量补写检索元数据")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"向量元数据回填失败（下次启动时继续）: {e}")
+
+
 async def init_default_presets():
     """初始化默认下载预设"""
     from src.models.database import async_session_maker
@@ -174,6 +201,8 @@ app.include_router(trash_router, prefix="/api", dependencies=[Depends(get_curren
 app.include_router(vault_router, prefix="/api", dependencies=[Depends(get_current_user)])
 app.include_router(batch_router, prefix="/api/assets", dependencies=[Depends(get_current_user)])
 app.include_router(stats_router, prefix="/api", dependencies=[Depends(get_current_user)])
+app.include_router(uploads_router, prefix="/api", dependencies=[Depends(get_current_user)])
+app.include_router(tags_router, prefix="/api", dependencies=[Depends(get_current_user)])
 
 # Shares router 特殊处理：内部管理接口在 router 定义处或此处加权感校验
 app.include_router(shares_router, prefix="/api")
@@ -342,3 +342,264 @@ ALTER TABLE users ALTER COLUMN hashed_password DROP NOT NULL;
 
 -- Add processing_step column to assets table
 ALTER TABLE assets ADD COLUMN IF NOT EXISTS processing_step VARCHAR(32);
+
+-- 2026-10-18: Resumable chunked upload sessions (S3 multipart)
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id VARCHAR(32) PRIMARY KEY,
+    filename VARCHAR(255) NOT NULL,
+    folder_path VARCHAR(1024),
+    album_id INTEGER,
+    mime_type VARCHAR(100) NOT NULL,
+    file_size BIGINT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    total_parts INTEGER NOT NULL,
+    file_path VARCHAR(512) NOT NULL,
+    upload_id VARCHAR(255) NOT NULL,
+    status VARCHAR(32) NOT NULL DEFAULT 'ACTIVE',
+    asset_id INTEGER REFERENCES assets(id) ON DELETE SET NULL,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_user_id ON upload_sessions(user_id);
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_expires_at ON upload_sessions(expires_at);
+-- 状态列为非原生枚举，保存成员名（ACTIVE/COMPLETED/ABORTED）
+ALTER TABLE upload_sessions ALTER COLUMN status SET DEFAULT 'ACTIVE';
+UPDATE upload_sessions SET status = upper(status) WHERE status <> upper(status);
+
+CREATE TABLE IF NOT EXISTS upload_parts (
+    session_id VARCHAR(32) NOT NULL REFERENCES upload_sessions(id) ON DELETE CASCADE,
+    part_number INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    etag VARCHAR(128) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (session_id, part_number)
+);
+
+-- 2026-10-18: Content-addressed blob store with reference counting
+CREATE TABLE IF NOT EXISTS blobs (
+    hash VARCHAR(64) PRIMARY KEY,
+    file_path VARCHAR(512) NOT NULL UNIQUE,
+    file_size BIGINT NOT NULL,
+    mime_type VARCHAR(100) NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 去重改为按用户进行，不同用户可以拥有相同内容的文件
+ALTER TABLE assets DROP CONSTRAINT IF EXISTS assets_file_hash_key;
+-- (user_id, file_hash) 唯一：并发上传相同内容时只有一个能写入
+-- 已存在重复数据时跳过并给出警告，清理后重新执行迁移即可建立
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'uq_assets_user_file_hash') THEN
+        IF EXISTS (
+            SELECT 1 FROM assets WHERE file_hash IS NOT NULL
+            GROUP BY user_id, file_hash HAVING count(*) > 1
+        ) THEN
+            RAISE WARNING 'assets 中存在同一用户的重复文件，未建立 uq_assets_user_file_hash';
+        ELSE
+            CREATE UNIQUE INDEX uq_assets_user_file_hash ON assets(user_id, file_hash);
+            DROP INDEX IF EXISTS idx_assets_user_file_hash;
+        END IF;
+    END IF;
+END $$;
+CREATE INDEX IF NOT EXISTS idx_assets_file_path ON assets(file_path);
+
+-- 2026-10-18: Folder paths are unique per user (bulk upsert ON CONFLICT (user_id, path))
+ALTER TABLE folders DROP CONSTRAINT IF EXISTS folders_path_key;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_folders_user_path ON folders(user_id, path);
+
+-- 2026-10-18: Task parameters (server-side import source etc.)
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS params JSONB;
+
+-- 2026-10-18: Embedding cache keyed by hash of input text + model + dimension
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS embedding_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_assets_embedding_hash ON assets(embedding_hash);
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    hash VARCHAR(64) PRIMARY KEY,
+    model VARCHAR(100) NOT NULL,
+    vector REAL[] NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 2026-10-18: Keyword search (tsvector + pg_trgm), maintained by trigger
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS search_text TEXT;
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+-- search_vector: 'simple' 分词，标题/标签 > 描述 > 文件名 > OCR 加权
+-- search_text: 小写拼接文本，供三元组索引做子串匹配（中文等无空格分隔的文本）
+CREATE OR REPLACE FUNCTION update_assets_search_columns()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_text = lower(concat_ws(' ',
+        NEW.title, NEW.description, array_to_string(NEW.tags, ' '), NEW.original_filename, NEW.ocr_text));
+    NEW.search_vector =
+        setweight(to_tsvector('simple', concat_ws(' ', NEW.title, array_to_string(NEW.tags, ' '))), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.original_filename, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(NEW.ocr_text, '')), 'D');
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_assets_search ON assets;
+CREATE TRIGGER update_assets_search
+    BEFORE INSERT OR UPDATE OF title, description, tags, original_filename, ocr_text ON assets
+    FOR EACH ROW
+    EXECUTE FUNCTION update_assets_search_columns();
+
+-- 回填已有资产（不改变 updated_at）
+ALTER TABLE assets DISABLE TRIGGER update_assets_updated_at;
+UPDATE assets SET title = title WHERE search_vector IS NULL;
+ALTER TABLE assets ENABLE TRIGGER update_assets_updated_at;
+
+CREATE INDEX IF NOT EXISTS idx_assets_search_vector ON assets USING GIN(search_vector);
+CREATE INDEX IF NOT EXISTS idx_assets_search_text_trgm ON assets USING GIN(search_text gin_trgm_ops);
+
+-- 2026-10-18: Keyset pagination indexes (user_id, sort key, id)
+CREATE INDEX IF NOT EXISTS idx_assets_user_created_id ON assets(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_assets_user_deleted_id ON assets(user_id, deleted_at DESC, id DESC) WHERE deleted_at IS NOT NULL;
+
+-- 2026-10-18: Per-user tag dictionary maintained by trigger (autocomplete, top tags)
+CREATE TABLE IF NOT EXISTS asset_tags (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    asset_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, tag)
+);
+ALTER TABLE asset_tags ALTER COLUMN tag TYPE TEXT;
+-- 前缀匹配（C 排序规则下的范围查询）、热门标签、子串匹配
+CREATE INDEX IF NOT EXISTS idx_asset_tags_prefix ON asset_tags(user_id, (lower(tag) COLLATE "C"));
+CREATE INDEX IF NOT EXISTS idx_asset_tags_count ON asset_tags(user_id, asset_count DESC);
+CREATE INDEX IF NOT EXISTS idx_asset_tags_trgm ON asset_tags USING GIN(lower(tag) gin_trgm_ops);
+
+-- 只统计未删除、非私密的资产；同一资产的重复标签只计一次
+-- assets.tags 不限长度，超过 255 个字符的标签不进入字典（超出 B-tree 索引项上限会使资产写入失败）
+CREATE OR REPLACE FUNCTION update_asset_tag_counts()
+RETURNS TRIGGER AS $$
+DECLARE
+    owner INTEGER;
+    old_tags TEXT[] := '{}';
+    new_tags TEXT[] := '{}';
+BEGIN
+    IF TG_OP <> 'INSERT' AND OLD.deleted_at IS NULL AND NOT coalesce(OLD.is_private, FALSE) THEN
+        old_tags := coalesce(OLD.tags, '{}');
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.deleted_at IS NULL AND NOT coalesce(NEW.is_private, FALSE) THEN
+        new_tags := coalesce(NEW.tags, '{}');
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        owner := OLD.user_id;
+    ELSE
+        owner := NEW.user_id;
+    END IF;
+    IF owner IS NULL OR old_tags = new_tags THEN
+        RETURN NULL;
+    END IF;
+
+    -- 按标签排序加锁，避免并发事务间死锁
+    INSERT INTO asset_tags (user_id, tag, asset_count)
+    SELECT owner, t, 1
+    FROM (SELECT unnest(new_tags) EXCEPT SELECT unnest(old_tags)) AS added(t)
+    WHERE t IS NOT NULL AND t <> '' AND length(t) <= 255
+    ORDER BY t
+    ON CONFLICT (user_id, tag) DO UPDATE
+        SET asset_count = asset_tags.asset_count + 1, updated_at = CURRENT_TIMESTAMP;
+
+    UPDATE asset_tags
+    SET asset_count = asset_count - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE user_id = owner
+      AND tag IN (SELECT unnest(old_tags) EXCEPT SELECT unnest(new_tags));
+
+    DELETE FROM asset_tags WHERE user_id = owner AND asset_count <= 0;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- 首次迁移时根据现有资产建立字典
+INSERT INTO asset_tags (user_id, tag, asset_count)
+SELECT a.user_id, t.tag, count(DISTINCT a.id)
+FROM assets a, unnest(a.tags) AS t(tag)
+WHERE a.deleted_at IS NULL AND NOT coalesce(a.is_private, FALSE)
+  AND a.user_id IS NOT NULL AND t.tag IS NOT NULL AND t.tag <> '' AND length(t.tag) <= 255
+  AND NOT EXISTS (SELECT 1 FROM asset_tags)
+GROUP BY a.user_id, t.tag
+ON CONFLICT (user_id, tag) DO NOTHING;
+
+DROP TRIGGER IF EXISTS update_asset_tags ON assets;
+CREATE TRIGGER update_asset_tags
+    AFTER INSERT OR DELETE OR UPDATE OF tags, deleted_at, is_private ON assets
+    FOR EACH ROW
+    EXECUTE FUNCTION update_asset_tag_counts();
+
+-- 2026-10-18: Geohash column for server-side map clustering
+-- COLLATE "C"：按字节比较，前缀范围查询 (geohash >= p AND geohash < p || '{') 可使用 B-tree 索引
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS geohash VARCHAR(12) COLLATE "C";
+
+-- 标准 geohash 编码（与 src/utils/geohash.py 一致），坐标缺失或越界时返回 NULL
+CREATE OR REPLACE FUNCTION geohash_encode(lat DOUBLE PRECISION, lon DOUBLE PRECISION, geo_precision INTEGER DEFAULT 12)
+RETURNS TEXT AS $$
+DECLARE
+    base32 CONSTANT TEXT := '0123456789bcdefghjkmnpqrstuvwxyz';
+    lat_lo DOUBLE PRECISION := -90;
+    lat_hi DOUBLE PRECISION := 90;
+    lon_lo DOUBLE PRECISION := -180;
+    lon_hi DOUBLE PRECISION := 180;
+    mid DOUBLE PRECISION;
+    bits INTEGER := 0;
+    ch INTEGER := 0;
+    even BOOLEAN := TRUE;
+    hash TEXT := '';
+BEGIN
+    IF lat IS NULL OR lon IS NULL OR lat NOT BETWEEN -90 AND 90 OR lon NOT BETWEEN -180 AND 180 THEN
+        RETURN NULL;
+    END IF;
+    WHILE length(hash) < geo_precision LOOP
+        IF even THEN
+            mid := (lon_lo + lon_hi) / 2;
+            IF lon >= mid THEN ch := ch * 2 + 1; lon_lo := mid; ELSE ch := ch * 2; lon_hi := mid; END IF;
+        ELSE
+            mid := (lat_lo + lat_hi) / 2;
+            IF lat >= mid THEN ch := ch * 2 + 1; lat_lo := mid; ELSE ch := ch * 2; lat_hi := mid; END IF;
+        END IF;
+        even := NOT even;
+        bits := bits + 1;
+        IF bits = 5 THEN
+            hash := hash || substr(base32, ch + 1, 1);
+            bits := 0;
+            ch := 0;
+        END IF;
+    END LOOP;
+    RETURN hash;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION update_assets_geohash_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.geohash = geohash_encode(NEW.latitude, NEW.longitude, 12);
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_assets_geohash ON assets;
+CREATE TRIGGER update_assets_geohash
+    BEFORE INSERT OR UPDATE OF latitude, longitude ON assets
+    FOR EACH ROW
+    EXECUTE FUNCTION update_assets_geohash_column();
+
+-- 回填已有资产（不改变 updated_at）
+ALTER TABLE assets DISABLE TRIGGER update_assets_updated_at;
+UPDATE assets SET geohash = geohash_encode(latitude, longitude, 12)
+WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL;
+ALTER TABLE assets ENABLE TRIGGER update_assets_updated_at;
+
+CREATE INDEX IF NOT EXISTS idx_assets_user_geohash ON assets(user_id, geohash)
+    WHERE geohash IS NOT NULL AND deleted_at IS NULL;
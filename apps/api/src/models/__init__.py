@@ -6,6 +6,10 @@ from src.models.asset import Asset, AssetVersion, Folder, CustomField, AssetType
 from src.models.album import Album, Collection, Share, Portal, DownloadPreset, AlbumType, AlbumStatus, SharePermission, album_assets, collection_assets
 from src.models.task import Task, SystemConfig, TaskType, TaskStatus
 from src.models.user import User
+from src.models.upload import UploadSession, UploadPart, UploadSessionStatus
+from src.models.blob import Blob
+from src.models.embedding import EmbeddingCache
+from src.models.tag import AssetTag
 
 __all__ = [
     # Database
@@ -39,4 +43,14 @@ __all__ = [
     "SystemConfig",
     "TaskType",
     "TaskStatus",
+    # Upload
+    "UploadSession",
+    "UploadPart",
+    "UploadSessionStatus",
+    # Blob
+    "Blob",
+    # Embedding
+    "EmbeddingCache",
+    # Tag
+    "AssetTag",
 ]
@@ -3,12 +3,13 @@
 """
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String, Text, Integer, Float, Boolean, DateTime, ForeignKey, JSON, Enum as SQLEnum
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import String, Text, Integer, BigInteger, Float, Boolean, DateTime, ForeignKey, JSON, Index, Enum as SQLEnum
+from sqlalchemy import event
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 import enum
 
-from src.models.database import Base
+from src.models.database import Base, ASSET_OWNERS_KEY
 
 
 class AssetType(str, enum.Enum):
@@ -30,20 +31,23 @@ class AssetStatus(str, enum.Enum):
 class Asset(Base):
     """资产表"""
     __tablename__ = "assets"
+    __table_args__ = (
+        Index("uq_assets_user_file_hash", "user_id", "file_hash", unique=True),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     
     # 基本信息
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
     original_filename: Mapped[str] = mapped_column(String(255), nullable=False)
-    file_path: Mapped[str] = mapped_column(String(512), nullable=False)  # MinIO 路径
+    file_path: Mapped[str] = mapped_column(String(512), nullable=False, index=True)  # MinIO 路径 (blobs/ 下为共享内容)
     thumbnail_path: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
     
     # 文件属性
-    file_size: Mapped[int] = mapped_column(Integer, nullable=False)  # 字节
+    file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)  # 字节
     mime_type: Mapped[str] = mapped_column(String(100), nullable=False)
     asset_type: Mapped[AssetType] = mapped_column(SQLEnum(AssetType, native_enum=False), default=AssetType.OTHER)
-    file_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)  # SHA256
+    file_hash: Mapped[str] = mapped_column(String(64), nullable=False)  # SHA256 (按用户去重，内容由 blobs 表共享)
     
     # 媒体属性
     width: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
@@ -56,6 +60,10 @@ class Asset(Base):
     tags: Mapped[Optional[List[str]]] = mapped_column(ARRAY(String), default=list)
     ocr_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     
+    # 关键词检索（由数据库触发器维护，见 migrations/init.sql；默认不加载）
+    search_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True)
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, nullable=True, deferred=True)
+    
     # EXIF 元数据
     exif_data: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
     taken_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
@@ -63,6 +71,7 @@ class Asset(Base):
     location: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     latitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     longitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    geohash: Mapped[Optional[str]] = mapped_column(String(12, collation="C"), nullable=True)  # 由触发器根据经纬度维护
     
     # 自定义字段值
     custom_fields: Mapped[Optional[dict]] = mapped_column(JSON, default=dict)
@@ -85,6 +94,8 @@ class Asset(Base):
     
     # 向量 ID (Qdrant)
     vector_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # 嵌入输入文本 + 模型 + 维度的哈希，未变化时跳过重新生成向量
+    embedding_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
     
     # 时间戳
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -100,6 +111,26 @@ class Asset(Base):
     versions: Mapped[List["AssetVersion"]] = relationship("AssetVersion", back_populates="asset", cascade="all, delete-orphan")
 
 
+@event.listens_for(Session, "after_flush")
+def collect_asset_owners(session: Session, flush_context):
+    """
+    记录本次 flush 新增/修改/删除的资产所有者，提交后使其搜索结果缓存失效
+
+    删除文件夹时数据库将其中资产的 folder_id 置空（ON DELETE SET NULL），
+    不经过 ORM，因此按文件夹所有者记录。
+    """
+    owners = {
+        obj.user_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, Asset) and obj.user_id
+    }
+    owners.update(
+        obj.user_id for obj in session.deleted if isinstance(obj, Folder) and obj.user_id
+    )
+    if owners:
+        session.info.setdefault(ASSET_OWNERS_KEY, set()).update(owners)
+
+
 class AssetVersion(Base):
     """资产版本表"""
     __tablename__ = "asset_versions"
@@ -107,8 +138,8 @@ class AssetVersion(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     asset_id: Mapped[int] = mapped_column(Integer, ForeignKey("assets.id"), nullable=False)
     version_number: Mapped[int] = mapped_column(Integer, nullable=False)
-    file_path: Mapped[str] = mapped_column(String(512), nullable=False)
-    file_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    file_path: Mapped[str] = mapped_column(String(512), nullable=False, index=True)
+    file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
     file_hash: Mapped[str] = mapped_column(String(64), nullable=False)
     parameters: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # 编辑参数
     note: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -121,6 +152,9 @@ class AssetVersion(Base):
 class Folder(Base):
     """文件夹表"""
     __tablename__ = "folders"
+    __table_args__ = (
+        Index("uq_folders_user_path", "user_id", "path", unique=True),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
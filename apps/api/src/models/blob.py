@@ -0,0 +1,27 @@
+"""
+内容寻址存储数据模型
+"""
+from datetime import datetime
+from sqlalchemy import String, Integer, BigInteger, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.database import Base
+
+
+class Blob(Base):
+    """
+    内容寻址的文件对象表
+    
+    相同内容 (SHA-256) 只在对象存储中保存一份，资产、资产版本和副本
+    通过 file_path 引用，ref_count 归零时才删除物理文件。
+    """
+    __tablename__ = "blobs"
+    
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA256
+    file_path: Mapped[str] = mapped_column(String(512), nullable=False, unique=True)  # blobs/ab/cd/<hash>
+    file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    mime_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
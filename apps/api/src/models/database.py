@@ -15,10 +15,46 @@ engine = create_async_engine(
     max_overflow=20,
 )
 
+# session.info 中记录本事务写入过的资产所有者（由 models.asset 中的 flush 事件收集）
+ASSET_OWNERS_KEY = "asset_owners"
+# session.info 中记录事务提交后才能删除的存储对象
+DELETE_AFTER_COMMIT_KEY = "delete_after_commit"
+
+
+def delete_after_commit(session: AsyncSession, file_path: str):
+    """登记在事务提交成功后删除的存储对象（回滚时保留）"""
+    session.sync_session.info.setdefault(DELETE_AFTER_COMMIT_KEY, []).append(file_path)
+
+
+class AppSession(AsyncSession):
+    """
+    提交成功后：
+    - 递增相关用户的资产库版本号，使其搜索结果缓存失效
+    - 删除事务中不再引用的存储对象
+    """
+    
+    async def commit(self):
+        await super().commit()
+        owners = self.sync_session.info.pop(ASSET_OWNERS_KEY, None)
+        if owners:
+            from src.services.search_cache import search_cache
+            await search_cache.invalidate(owners)
+        file_paths = self.sync_session.info.pop(DELETE_AFTER_COMMIT_KEY, None)
+        if file_paths:
+            from src.services.storage import storage_service
+            for file_path in file_paths:
+                await storage_service.delete_file(file_path)
+    
+    async def rollback(self):
+        self.sync_session.info.pop(ASSET_OWNERS_KEY, None)
+        self.sync_session.info.pop(DELETE_AFTER_COMMIT_KEY, None)
+        await super().rollback()
+
+
 # 创建会话工厂
 async_session_maker = async_sessionmaker(
     engine,
-    class_=AsyncSession,
+    class_=AppSession,
     expire_on_commit=False,
 )
 
@@ -0,0 +1,26 @@
+"""
+向量嵌入缓存数据模型
+"""
+from datetime import datetime
+from typing import List
+from sqlalchemy import String, Float, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from src.models.database import Base
+
+
+class EmbeddingCache(Base):
+    """
+    向量嵌入缓存表
+    
+    以嵌入输入文本 + 模型 + 维度的哈希为键保存向量，与 assets.embedding_hash 对应。
+    相同文本（包括重建索引时未变化的资产）直接复用向量，不再调用嵌入接口。
+    """
+    __tablename__ = "embedding_cache"
+    
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA256
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    vector: Mapped[List[float]] = mapped_column(ARRAY(Float(precision=24)), nullable=False)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,29 @@
+"""
+标签字典数据模型
+"""
+from datetime import datetime
+from sqlalchemy import Text, Integer, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.database import Base
+
+
+class AssetTag(Base):
+    """
+    用户标签字典表
+    
+    记录每个用户各标签关联的资产数（只统计未删除、非私密的资产），
+    由 assets 表上的触发器在 tags / deleted_at / is_private 变化时增量维护
+    （见 migrations/init.sql），用于标签自动补全与热门标签统计。
+    """
+    __tablename__ = "asset_tags"
+    
+    user_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    tag: Mapped[str] = mapped_column(Text, primary_key=True)  # 超过 255 个字符的标签不收录
+    asset_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -47,7 +47,7 @@ class Task(Base):
     # processed_items: Mapped[int] = mapped_column(Integer, default=0) -> 数据库无此字段
     
     # 参数与结果
-    # params: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True) -> 数据库无此字段
+    params: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
     result: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
 
     @property
@@ -55,10 +55,6 @@ class Task(Base):
         if self.total_items > 0:
              return int(self.total_items * self.progress / 100)
         return 0
-        
-    @property
-    def params(self) -> dict:
-        return {}
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     
     # 时间
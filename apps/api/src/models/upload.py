@@ -0,0 +1,69 @@
+"""
+断点续传上传会话数据模型
+"""
+from datetime import datetime
+from typing import Optional, List
+import uuid
+from sqlalchemy import String, Integer, BigInteger, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+import enum
+
+from src.models.database import Base
+
+
+class UploadSessionStatus(str, enum.Enum):
+    """上传会话状态"""
+    ACTIVE = "active"          # 上传中
+    COMPLETED = "completed"    # 已合并并创建资产
+    ABORTED = "aborted"        # 已取消或过期
+
+
+class UploadSession(Base):
+    """上传会话表 (对应一个 S3 Multipart Upload)"""
+    __tablename__ = "upload_sessions"
+    
+    id: Mapped[str] = mapped_column(String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    
+    # 文件信息
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    folder_path: Mapped[Optional[str]] = mapped_column(String(1024), nullable=True)
+    album_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    mime_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    
+    # 分片信息
+    chunk_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    total_parts: Mapped[int] = mapped_column(Integer, nullable=False)
+    
+    # S3 分片上传
+    file_path: Mapped[str] = mapped_column(String(512), nullable=False)
+    upload_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    
+    # 状态
+    status: Mapped[UploadSessionStatus] = mapped_column(SQLEnum(UploadSessionStatus, native_enum=False), default=UploadSessionStatus.ACTIVE)
+    asset_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("assets.id", ondelete="SET NULL"), nullable=True)
+    
+    # 所有者
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # 时间
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    
+    # 关系
+    parts: Mapped[List["UploadPart"]] = relationship("UploadPart", back_populates="session", cascade="all, delete-orphan")
+
+
+class UploadPart(Base):
+    """已接收的分片表"""
+    __tablename__ = "upload_parts"
+    
+    session_id: Mapped[str] = mapped_column(String(32), ForeignKey("upload_sessions.id", ondelete="CASCADE"), primary_key=True)
+    part_number: Mapped[int] = mapped_column(Integer, primary_key=True)  # 从 1 开始
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    etag: Mapped[str] = mapped_column(String(128), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    # 关系
+    session: Mapped["UploadSession"] = relationship("UploadSession", back_populates="parts")
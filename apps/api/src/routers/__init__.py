@@ -14,6 +14,8 @@ from src.routers.trash import router as trash_router
 from src.routers.vault import router as vault_router
 from src.routers.batch import router as batch_router  # 新增
 from src.routers.stats import router as stats_router  # 新增
+from src.routers.uploads import router as uploads_router
+from src.routers.tags import router as tags_router
 
 __all__ = [
     "assets_router",
@@ -29,4 +31,6 @@ __all__ = [
     "vault_router",
     "batch_router",  # 新增
     "stats_router",  # 新增
+    "uploads_router",
+    "tags_router",
 ]
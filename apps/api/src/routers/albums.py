@@ -20,6 +20,7 @@ from src.services import storage_service
 
 from src.routers.auth import get_current_user
 from src.models.user import User
+from src.utils.tag_query import parse_tag_query
 
 router = APIRouter(prefix="/albums", tags=["相册管理"])
 
@@ -143,7 +144,10 @@ async def preview_smart_album(
     from src.services.album import album_service
     from src.routers.assets import asset_to_response
     
-    assets = await album_service.evaluate_smart_album(db, album_id, current_user.id)
+    try:
+        assets = await album_service.evaluate_smart_album(db, album_id, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "album_id": album_id,
         "matched_count": len(assets),
@@ -221,6 +225,12 @@ async def create_album(
 ):
     """创建新相册（支持手动/智能相册）"""
     album_type = data.album_type if data.album_type else AlbumType.MANUAL
+    tag_query = ((data.smart_rules or {}).get("tags") or {}).get("query")
+    if album_type == AlbumType.SMART and tag_query:
+        try:
+            parse_tag_query(tag_query)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
     album = Album(
         name=data.name,
@@ -3,27 +3,66 @@
 """
 from typing import List, Optional
 import io
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, delete, insert
 
 from datetime import datetime
+from src.config import settings
 from src.models import get_db, Asset, AssetVersion, AssetStatus, AssetType, Folder, CustomField
-from src.services.storage import calculate_file_hash
 from src.schemas import (
     AssetResponse, AssetListResponse, AssetUpdate, AssetSearchRequest,
     SimilarAssetResponse, FolderResponse, FolderTreeResponse, FolderCreate,
     CustomFieldResponse, CustomFieldCreate, UploadResponse, BatchUploadResponse,
     AssetEdit, AssetAIEdit, AssetVersionResponse,
+    UploadCheckRequest, UploadCheckResponse, MapClusterResponse,
 )
 from src.services import asset_service, storage_service, album_service
+from src.services.ingest import ingest_service, IngestItem, split_upload_path
+from src.services.blob import blob_service
+from src.services.queue import job_queue
+from src.services.embedding import embedding_service
+from src.services.search_cache import search_cache
 from src.models.album import album_assets
+from src.utils.pagination import fetch_page
 
 from src.routers.auth import get_current_user
 from src.models.user import User
 router = APIRouter(prefix="/assets", tags=["资产管理"])
 
 
+def should_stream_upload(file: UploadFile) -> bool:
+    """大文件（或大小未知）走流式上传，避免整体读入内存"""
+    return file.size is None or file.size > settings.upload_stream_threshold
+
+
+async def create_asset_from_upload(
+    db: AsyncSession,
+    file: UploadFile,
+    filename: str,
+    user_id: int,
+    folder_path: Optional[str] = None,
+) -> Asset:
+    """根据文件大小选择普通上传或流式上传"""
+    if should_stream_upload(file):
+        return await asset_service.create_asset_from_upload(
+            db=db,
+            upload=file,
+            filename=filename,
+            user_id=user_id,
+            folder_path=folder_path,
+        )
+    
+    file_data = await file.read()
+    return await asset_service.create_asset(
+        db=db,
+        file_data=file_data,
+        filename=filename,
+        user_id=user_id,
+        folder_path=folder_path,
+    )
+
+
 def asset_to_response(asset: Asset) -> AssetResponse:
     """转换资产为响应模型"""
     response = AssetResponse.model_validate(asset)
@@ -47,14 +86,13 @@ async def upload_asset(
     
     - 支持 png/jpg/mp4 等格式
     - 自动检测重复文件
+    - 大文件流式写入对象存储，不整体读入内存
     - 后台自动进行 AI 分析和向量化
     """
     try:
-        file_data = await file.read()
-        
-        asset = await asset_service.create_asset(
+        asset = await create_asset_from_upload(
             db=db,
-            file_data=file_data,
+            file=file,
             filename=file.filename,
             user_id=current_user.id,  # 新增
             folder_path=folder_path,
@@ -64,10 +102,7 @@ async def upload_asset(
             await album_service.add_assets_to_album(db, album_id, [asset.id])
 
         # 后台处理
-        background_tasks.add_task(
-            process_asset_background,
-            asset.id,
-        )
+        await schedule_asset_processing(background_tasks, asset.id)
         
         return UploadResponse(
             asset_id=asset.id,
@@ -82,6 +117,28 @@ async def upload_asset(
         raise HTTPException(status_code=500, detail=f"上传失败：{str(e)}")
 
 
+@router.post("/upload/check", response_model=UploadCheckResponse, summary="预上传去重检查")
+async def check_upload(
+    request: UploadCheckRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    根据客户端计算的 SHA-256 与文件大小检查哪些文件已存在
+    
+    - 客户端只需上传 missing 中的文件，避免传输重复文件
+    - 单次最多 1000 个
+    """
+    hashes = [item.hash.lower() for item in request.files]
+    existing = await asset_service.find_existing_files(
+        db, [(item.hash, item.size) for item in request.files], current_user.id
+    )
+    return UploadCheckResponse(
+        existing=[h for h in hashes if h in existing],
+        missing=[h for h in hashes if h not in existing],
+    )
+
+
 @router.post("/upload/batch", response_model=BatchUploadResponse, summary="批量上传资产")
 async def upload_assets_batch(
     background_tasks: BackgroundTasks,
@@ -94,68 +151,39 @@ async def upload_assets_batch(
     批量上传资产文件
     
     - 保留文件夹结构
-    - 自动检测重复文件
+    - 自动检测重复文件（含批次内重复）
+    - 多文件并行上传/生成缩略图，资产记录批量提交
     """
-    results = []
-    success = 0
-    failed = 0
-    
+    items = []
     for file in files:
-        try:
-            file_data = await file.read()
-            
-            # 处理文件夹路径
-            actual_folder = folder_path
-            if "/" in file.filename:
-                # 文件名包含路径
-                parts = file.filename.rsplit("/", 1)
-                if folder_path:
-                    actual_folder = f"{folder_path}/{parts[0]}"
-                else:
-                    actual_folder = parts[0]
-                filename = parts[1]
-            else:
-                filename = file.filename
-            
-            asset = await asset_service.create_asset(
-                db=db,
-                file_data=file_data,
-                filename=filename,
-                user_id=current_user.id,
-                folder_path=actual_folder,
-            )
-            
-            background_tasks.add_task(process_asset_background, asset.id)
-            
+        filename, actual_folder = split_upload_path(file.filename, folder_path)
+        items.append(IngestItem(file=file.file, filename=filename, folder_path=actual_folder))
+    
+    await ingest_service.ingest(db, items, user_id=current_user.id)
+    
+    results = []
+    for file, item in zip(files, items):
+        if item.asset:
+            await schedule_asset_processing(background_tasks, item.asset.id)
             results.append(UploadResponse(
-                asset_id=asset.id,
-                filename=asset.original_filename,
+                asset_id=item.asset.id,
+                filename=item.asset.original_filename,
                 status="pending",
                 message="上传成功",
             ))
-            success += 1
-            
-        except ValueError as e:
-            results.append(UploadResponse(
-                asset_id=0,
-                filename=file.filename,
-                status="failed",
-                message=str(e),
-            ))
-            failed += 1
-        except Exception as e:
+        else:
             results.append(UploadResponse(
                 asset_id=0,
                 filename=file.filename,
                 status="failed",
-                message=f"上传失败：{str(e)}",
+                message=item.error or "上传失败",
             ))
-            failed += 1
     
+    success = sum(1 for item in items if item.asset)
     return BatchUploadResponse(
         total=len(files),
         success=success,
-        failed=failed,
+        failed=len(files) - success,
         results=results,
     )
 
@@ -171,6 +199,12 @@ async def process_asset_background(asset_id: int):
             print(f"资产处理失败 {asset_id}: {e}")
 
 
+async def schedule_asset_processing(background_tasks: BackgroundTasks, asset_id: int):
+    """将资产处理投递到任务队列，队列不可用时在 API 进程内执行"""
+    if not await job_queue.submit("process_asset", {"asset_id": asset_id}):
+        background_tasks.add_task(process_asset_background, asset_id)
+
+
 @router.post("/search", response_model=AssetListResponse, summary="搜索资产")
 async def search_assets(
     request: AssetSearchRequest,
@@ -181,21 +215,34 @@ async def search_assets(
     搜索资产
     
     - 支持关键词搜索和 AI 语义搜索
-    - 支持多种过滤条件
+    - 支持多种过滤条件，tag_query 为标签布尔查询（AND/OR/NOT、括号、-排除）
+    - 结果按用户缓存，资产变更后自动失效
     """
-    assets, total = await asset_service.search_assets(
-        db, 
-        request,
-        current_user.id,  # 新增
-    )
+    cached, generation = await search_cache.get(current_user.id, request)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
     
-    return AssetListResponse(
-        items=[asset_to_response(a) for a in assets],
-        total=total,
+    try:
+        page = await asset_service.search_assets(
+            db, 
+            request,
+            current_user.id,  # 新增
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    response = AssetListResponse(
+        items=[asset_to_response(a) for a in page.items],
+        total=page.total,
         page=request.page,
         page_size=request.page_size,
-        has_more=(request.page * request.page_size) < total,
+        has_more=page.has_more,
+        next_cursor=page.next_cursor,
+        facets=page.facets,
     )
+    if generation is not None:
+        await search_cache.set(current_user.id, request, generation, response.model_dump_json())
+    return response
 
 
 @router.get("/processing", summary="获取正在处理的资产列表")
@@ -229,50 +276,73 @@ async def list_processing_assets(
 async def list_assets(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor（传入时忽略 page）"),
+    include_total: bool = Query(True, description="首页是否统计总数"),
     asset_type: Optional[AssetType] = None,
     folder_id: Optional[int] = None,
     status: Optional[AssetStatus] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """获取资产列表"""
+    """获取资产列表（按创建时间倒序，游标分页）"""
     from src.utils.security import VisibilityHelper
-    query = select(Asset).where(
-        Asset.user_id == current_user.id,
-        VisibilityHelper.active_assets()
-    )
-    count_query = select(func.count(Asset.id)).where(
+    conditions = [
         Asset.user_id == current_user.id,
-        VisibilityHelper.active_assets()
-    )
+        VisibilityHelper.active_assets(),
+    ]
     
     if asset_type:
-        query = query.where(Asset.asset_type == asset_type)
-        count_query = count_query.where(Asset.asset_type == asset_type)
+        conditions.append(Asset.asset_type == asset_type)
     
     if folder_id:
-        query = query.where(Asset.folder_id == folder_id)
-        count_query = count_query.where(Asset.folder_id == folder_id)
+        conditions.append(Asset.folder_id == folder_id)
     
     if status:
-        query = query.where(Asset.status == status)
-        count_query = count_query.where(Asset.status == status)
+        conditions.append(Asset.status == status)
     
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    # 按游标翻页时不重复统计总数
+    total = None
+    if include_total and not cursor:
+        total = await db.scalar(select(func.count(Asset.id)).where(*conditions))
     
-    offset = (page - 1) * page_size
-    query = query.order_by(Asset.created_at.desc()).offset(offset).limit(page_size)
-    
-    result = await db.execute(query)
-    assets = result.scalars().all()
+    try:
+        result = await fetch_page(
+            db, select(Asset).where(*conditions), Asset.created_at, page_size, cursor=cursor, page=page,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return AssetListResponse(
-        items=[asset_to_response(a) for a in assets],
+        items=[asset_to_response(a) for a in result.items],
         total=total,
         page=page,
         page_size=page_size,
-        has_more=(page * page_size) < total,
+        has_more=result.has_more,
+        next_cursor=result.next_cursor,
+    )
+
+
+@router.get("/map/clusters", response_model=MapClusterResponse, summary="获取地图聚类")
+async def list_map_clusters(
+    south: float = Query(-90, ge=-90, le=90),
+    west: float = Query(-180, ge=-180, le=180),
+    north: float = Query(90, ge=-90, le=90),
+    east: float = Query(180, ge=-180, le=180),
+    zoom: int = Query(2, ge=0, le=22, description="地图缩放级别，决定聚类网格大小"),
+    limit: int = Query(300, ge=1, le=1000, description="最多返回的聚类数"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    按视野和缩放级别聚合有位置信息的资产
+    
+    - 每个 geohash 网格返回资产数、平均位置和代表资产缩略图
+    - west > east 表示视野跨越 180° 经线
+    """
+    if south > north:
+        raise HTTPException(status_code=400, detail="south 不能大于 north")
+    return await asset_service.map_clusters(
+        db, current_user.id, south, west, north, east, zoom, limit,
     )
 
 
@@ -281,7 +351,7 @@ async def list_map_assets(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """获取所有具有经纬度信息的资产，用于地图展示"""
+    """获取所有具有经纬度信息的资产（资产较多时使用 /map/clusters 按视野聚合）"""
     from src.utils.security import VisibilityHelper
     query = select(Asset).where(
         Asset.user_id == current_user.id,
@@ -384,9 +454,9 @@ async def edit_asset(
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         new_filename = f"edited_{timestamp}_{asset.original_filename}"
-        new_path = f"assets/{new_filename}"
         
-        await storage_service.upload_bytes(edited_data, new_path, "image/jpeg")
+        blob = await blob_service.store_bytes(db, edited_data, "image/jpeg")
+        new_path = blob.file_path
         
         # 缩略图
         thumbnail_data = await storage_service.generate_thumbnail(edited_data)
@@ -406,7 +476,7 @@ async def edit_asset(
             file_size=len(edited_data),
             mime_type="image/jpeg",
             asset_type=AssetType.IMAGE,
-            file_hash=calculate_file_hash(edited_data),
+            file_hash=blob.hash,
             width=new_width,
             height=new_height,
             title=f"{asset.title or asset.filename} (副本)",
@@ -434,7 +504,7 @@ async def edit_asset(
             await db.execute(insert(album_assets).values(album_id=aid, asset_id=new_asset.id))
         await db.commit()
         
-        background_tasks.add_task(process_asset_background, new_asset.id)
+        await schedule_asset_processing(background_tasks, new_asset.id)
         return asset_to_response(new_asset)
     
     else:
@@ -456,6 +526,7 @@ async def edit_asset(
                 note="Original"
             )
             db.add(v1)
+            await blob_service.add_ref(db, asset.file_path)
             await db.commit()
             versions = [v1]
             
@@ -471,14 +542,17 @@ async def edit_asset(
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         ext = asset.original_filename.split('.')[-1] if '.' in asset.original_filename else "jpg"
         new_filename = f"{asset.id}_v{next_ver}_{timestamp}.{ext}"
-        new_path = f"assets/{new_filename}"
         
-        await storage_service.upload_bytes(edited_data, new_path, "image/jpeg")
+        # 新文件同时被资产和新版本引用
+        blob = await blob_service.store_bytes(db, edited_data, "image/jpeg", refs=2)
+        new_path = blob.file_path
         
-        # 5. 更新 Asset 指向新文件
+        # 5. 更新 Asset 指向新文件（旧文件仍被历史版本引用）
+        old_path = asset.file_path
         asset.file_path = new_path
         asset.file_size = len(edited_data)
-        asset.file_hash = calculate_file_hash(edited_data)
+        asset.file_hash = blob.hash
+        await blob_service.release_and_delete(db, old_path)
         # 重新生成缩略图
         thumbnail_data = await storage_service.generate_thumbnail(edited_data)
         thumbnail_path = f"thumbnails/{new_filename}"
@@ -507,7 +581,7 @@ async def edit_asset(
         
         # 7. 触发重新分析 (Vector, OCR etc)
         # TODO: 也许不需要全量重新分析，但向量需要更新
-        background_tasks.add_task(process_asset_background, asset.id)
+        await schedule_asset_processing(background_tasks, asset.id)
         
         return asset_to_response(asset)
 
@@ -553,23 +627,25 @@ async def restore_asset_version(
     if not version or version.asset_id != asset_id:
         raise HTTPException(status_code=404, detail="版本记录不存在")
     
-    # 执行恢复
+    # 执行恢复（资产改为引用该版本的文件）
+    old_path = asset.file_path
+    await blob_service.add_ref(db, version.file_path)
     asset.file_path = version.file_path
     asset.file_size = version.file_size
     asset.file_hash = version.file_hash
+    await blob_service.release_and_delete(db, old_path)
     
     # 重新生成缩略图
     image_data = await storage_service.download_file(version.file_path)
     thumbnail_data = await storage_service.generate_thumbnail(image_data)
-    ext = version.file_path.split('.')[-1]
-    thumbnail_path = f"thumbnails/{asset.id}_restored_{version.id}.{ext}"
+    thumbnail_path = f"thumbnails/{asset.id}_restored_{version.id}.jpg"
     await storage_service.upload_bytes(thumbnail_data, thumbnail_path, "image/jpeg")
     
     asset.thumbnail_path = thumbnail_path
     await db.commit()
     await db.refresh(asset)
     
-    background_tasks.add_task(process_asset_background, asset.id)
+    await schedule_asset_processing(background_tasks, asset.id)
     return asset_to_response(asset)
 
 
@@ -655,8 +731,8 @@ async def ai_edit_asset(
             new_filename += ".jpg"
             
         if data.save_as_new:
-            new_path = f"assets/{new_filename}"
-            await storage_service.upload_bytes(edited_data, new_path, "image/jpeg")
+            blob = await blob_service.store_bytes(db, edited_data, "image/jpeg")
+            new_path = blob.file_path
             
             thumbnail_data = await storage_service.generate_thumbnail(edited_data)
             thumbnail_path = f"thumbnails/{new_filename}"
@@ -675,7 +751,7 @@ async def ai_edit_asset(
                 file_size=len(edited_data),
                 mime_type="image/jpeg",
                 asset_type=AssetType.IMAGE,
-                file_hash=calculate_file_hash(edited_data),
+                file_hash=blob.hash,
                 width=new_width,
                 height=new_height,
                 title=f"{asset.title or asset.filename} (AI 增强)",
@@ -703,7 +779,7 @@ async def ai_edit_asset(
                 await db.execute(insert(album_assets).values(album_id=aid, asset_id=new_asset.id))
             await db.commit()
             
-            background_tasks.add_task(process_asset_background, new_asset.id)
+            await schedule_asset_processing(background_tasks, new_asset.id)
             return asset_to_response(new_asset)
         else:
             # 版本控制模式
@@ -722,16 +798,20 @@ async def ai_edit_asset(
                     note="Original"
                 )
                 db.add(v1)
+                await blob_service.add_ref(db, asset.file_path)
                 await db.commit()
                 versions = [v1]
 
-            new_path = f"assets/{new_filename}"
-            await storage_service.upload_bytes(edited_data, new_path, "image/jpeg")
+            # 新文件同时被资产和新版本引用
+            blob = await blob_service.store_bytes(db, edited_data, "image/jpeg", refs=2)
+            new_path = blob.file_path
             
-            # 更新当前 asset
+            # 更新当前 asset（旧文件仍被历史版本引用）
+            old_path = asset.file_path
             asset.file_path = new_path
             asset.file_size = len(edited_data)
-            asset.file_hash = calculate_file_hash(edited_data)
+            asset.file_hash = blob.hash
+            await blob_service.release_and_delete(db, old_path)
             
             # 重新生成缩略图
             thumbnail_data = await storage_service.generate_thumbnail(edited_data)
@@ -760,7 +840,7 @@ async def ai_edit_asset(
             
             await db.commit()
             await db.refresh(asset)
-            background_tasks.add_task(process_asset_background, asset.id)
+            await schedule_asset_processing(background_tasks, asset.id)
             return asset_to_response(asset)
             
     except Exception as e:
@@ -792,6 +872,7 @@ async def delete_asset(
         # 软删除
         asset.deleted_at = datetime.utcnow()
         await db.commit()
+        await embedding_service.sync_assets(db, [asset])
         return {"message": "资产已移至回收站"}
 
 
@@ -815,6 +896,7 @@ async def restore_asset(
         
     asset.deleted_at = None
     await db.commit()
+    await embedding_service.sync_assets(db, [asset])
     return {"message": "资产已恢复"}
 
 
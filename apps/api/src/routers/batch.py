@@ -17,6 +17,7 @@ from src.schemas.batch import (
 from src.routers.auth import get_current_user
 from src.services.storage import storage_service
 from src.services.vector import vector_service
+from src.services.embedding import embedding_service
 
 
 router = APIRouter(prefix="/batch", tags=["批量操作"])
@@ -58,6 +59,7 @@ async def batch_delete_assets(
             failed_ids.append(asset.id)
     
     await db.commit()
+    await embedding_service.sync_assets(db, assets)
     
     # 找出不属于用户的ID
     found_ids = {a.id for a in assets}
@@ -243,6 +245,8 @@ async def batch_restore_assets(
     
     await db.commit()
     
+    await embedding_service.sync_assets(db, assets)
+    
     found_ids = {a.id for a in assets}
     not_found_ids = set(request.asset_ids) - found_ids
     failed_ids.extend(list(not_found_ids))
@@ -234,26 +234,27 @@ async def get_storage_file(
     from src.utils.security import VisibilityHelper
     
     # 效验路径权限
-    # 查找该路径对应的资产，并检查可见性
+    # 查找引用该路径的资产（内容寻址存储下同一文件可能被多个资产共享）
     asset_result = await db.execute(
-        select(Asset).where(
+        select(Asset.file_path, Asset.mime_type, Asset.deleted_at, Asset.is_private).where(
             or_(Asset.file_path == path, Asset.thumbnail_path == path)
         )
     )
-    asset = asset_result.scalar_one_or_none()
+    refs = asset_result.all()
     
-    # 如果资产存在，检查其可见性
-    if asset:
-        if asset.deleted_at is not None or asset.is_private:
-            # 此处应配合 Vault Token 逻辑。目前简单起见，拒绝非公开访问
-            raise HTTPException(status_code=403, detail="无权访问受限或已删除的资产文件")
+    # 只有当所有引用的资产都受限时才拒绝访问
+    if refs and all(r.deleted_at is not None or r.is_private for r in refs):
+        # 此处应配合 Vault Token 逻辑。目前简单起见，拒绝非公开访问
+        raise HTTPException(status_code=403, detail="无权访问受限或已删除的资产文件")
     
     try:
         file_data = await storage_service.download_file(path)
         
-        # 根据路径猜测 MIME 类型
-        import mimetypes
-        content_type, _ = mimetypes.guess_type(path)
+        # blob 路径不含扩展名，优先使用资产记录的 MIME 类型，否则根据路径猜测
+        content_type = next((r.mime_type for r in refs if r.file_path == path), None)
+        if not content_type:
+            import mimetypes
+            content_type, _ = mimetypes.guess_type(path)
         if not content_type:
             content_type = "application/octet-stream"
         
@@ -13,6 +13,7 @@ from src.schemas.mcp import MCPTool, MCPToolsResponse, MCPCallRequest, MCPCallRe
 from src.schemas.asset import AssetSearchRequest
 from src.services.asset import asset_service
 from src.services.storage import storage_service
+from src.services.embedding import embedding_service
 from src.routers.assets import asset_to_response
 from src.services.stats import stats_service
 from src.utils.security import get_current_user
@@ -323,9 +324,9 @@ async def call_tool(
                 folder_id=args.get("folder_id"),
                 tags=args.get("tags")
             )
-            assets, total = await asset_service.search_assets(db, search_req, current_user_id=current_user.id)
-            items = [asset_to_response(a) for a in assets]
-            return MCPCallResponse(content=[{"type": "text", "text": f"找到 {total} 个匹配项"}, {"type": "json", "data": items}])
+            page = await asset_service.search_assets(db, search_req, current_user_id=current_user.id)
+            items = [asset_to_response(a) for a in page.items]
+            return MCPCallResponse(content=[{"type": "text", "text": f"找到 {page.total} 个匹配项"}, {"type": "json", "data": items}])
 
         elif name == "list_assets":
             from src.schemas.asset import AssetListResponse
@@ -606,6 +607,7 @@ async def call_tool(
             if asset and asset.user_id == current_user.id:
                 asset.deleted_at = None
                 await db.commit()
+                await embedding_service.sync_assets(db, [asset])
                 return MCPCallResponse(content=[{"type": "text", "text": "资产已恢复"}])
             return MCPCallResponse(content=[{"type": "text", "text": "资产不存在"}], is_error=True)
 
@@ -624,6 +626,7 @@ async def call_tool(
             if asset and asset.user_id == current_user.id:
                 asset.is_private = True
                 await db.commit()
+                await embedding_service.sync_assets(db, [asset])
                 return MCPCallResponse(content=[{"type": "text", "text": "资产已移入保险库"}])
             return MCPCallResponse(content=[{"type": "text", "text": "资产不存在"}], is_error=True)
 
@@ -685,11 +688,12 @@ async def mcp_search_old(
 ):
     """向下兼容的旧接口"""
     request = AssetSearchRequest(query=query, ai_search=True, page=page, page_size=page_size)
-    assets, total = await asset_service.search_assets(db, request, current_user_id=current_user.id)
+    result = await asset_service.search_assets(db, request, current_user_id=current_user.id)
     return {
-        "items": [asset_to_response(a) for a in assets],
-        "total": total,
+        "items": [asset_to_response(a) for a in result.items],
+        "total": result.total,
         "page": page,
         "page_size": page_size,
-        "has_more": (page * page_size) < total
+        "has_more": result.has_more,
+        "next_cursor": result.next_cursor,
     }
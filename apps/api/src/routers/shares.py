@@ -351,6 +351,7 @@ async def get_portal_assets(
     password: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor（传入时忽略 page）"),
     query: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
@@ -374,38 +375,36 @@ async def get_portal_assets(
             raise HTTPException(status_code=401, detail="密码错误")
     
     # 获取集合资产
-    from sqlalchemy import or_
-    
     from src.utils.security import VisibilityHelper
     assets_query = select(Asset).join(collection_assets).where(
         collection_assets.c.collection_id == portal.collection_id,
         VisibilityHelper.active_assets()
     )
     
-    # 搜索
-    if query and portal.searchable:
-        search_term = f"%{query}%"
-        assets_query = assets_query.where(
-            or_(
-                Asset.title.ilike(search_term),
-                Asset.description.ilike(search_term),
-                Asset.original_filename.ilike(search_term),
-            )
-        )
+    # 搜索（按相关度排序），否则按创建时间倒序
+    sort_column, keyset = Asset.created_at, True
+    if query and query.strip() and portal.searchable:
+        from src.utils.search import keyword_filter, keyword_rank
+        assets_query = assets_query.where(keyword_filter(query))
+        sort_column, keyset = keyword_rank(query), False
     
     # 分页
-    offset = (page - 1) * page_size
-    assets_query = assets_query.offset(offset).limit(page_size)
-    
-    assets_result = await db.execute(assets_query)
-    assets = assets_result.scalars().all()
+    from src.utils.pagination import fetch_page
+    try:
+        result = await fetch_page(
+            db, assets_query, sort_column, page_size, cursor=cursor, page=page, keyset=keyset,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     from src.routers.assets import asset_to_response
     
     return {
-        "items": [asset_to_response(a) for a in assets],
+        "items": [asset_to_response(a) for a in result.items],
         "page": page,
         "page_size": page_size,
+        "has_more": result.has_more,
+        "next_cursor": result.next_cursor,
         "allow_download": portal.allow_download,
     }
 
@@ -0,0 +1,34 @@
+"""
+标签相关 API 路由
+"""
+from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import get_db
+from src.models.user import User
+from src.routers.auth import get_current_user
+from src.services.tag import tag_service
+
+router = APIRouter(prefix="/tags", tags=["标签"])
+
+
+@router.get("", summary="获取热门标签")
+async def list_top_tags(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> List[Dict[str, Any]]:
+    """按关联资产数降序返回标签"""
+    return await tag_service.top_tags(db, current_user.id, limit)
+
+
+@router.get("/autocomplete", summary="标签自动补全")
+async def autocomplete_tags(
+    q: str = Query("", max_length=100, description="已输入的标签文本"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> List[Dict[str, Any]]:
+    """前缀匹配优先，其次为包含输入的标签，各自按关联资产数排序"""
+    return await tag_service.autocomplete(db, current_user.id, q, limit)
@@ -1,8 +1,9 @@
 """
 后台任务相关 API 路由
 """
+import asyncio
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
@@ -10,6 +11,8 @@ from sqlalchemy import select, func
 from src.models import get_db, Task, TaskType, TaskStatus, Asset, Album, Collection, Share, SystemConfig, User
 from src.schemas import TaskResponse, TaskListResponse, TaskStatusResponse, TriggerScanRequest, SystemStatsResponse
 from src.routers.auth import get_current_user
+from src.config import settings
+from src.services.queue import job_queue
 
 router = APIRouter(prefix="/tasks", tags=["后台任务"])
 
@@ -108,29 +111,50 @@ async def trigger_task(
     task_type_map = {
         "album_suggestion": TaskType.GENERATE_ALBUM,
         "reindex": TaskType.REINDEX_VECTORS,
+        "scan_folder": TaskType.SCAN_FOLDER,
     }
     
     task_type = task_type_map.get(data.scan_type)
     if not task_type:
         raise HTTPException(status_code=400, detail="不支持的任务类型")
     
+    params = {"triggered_by": "manual"}
+    if task_type == TaskType.SCAN_FOLDER:
+        # 服务端导入可读取服务器文件，仅限管理员
+        if not current_user.is_superuser:
+            raise HTTPException(status_code=403, detail="仅管理员可以导入服务器文件")
+        from src.services.importer import parse_import_source
+        try:
+            parse_import_source(data.path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        params.update(path=data.path, folder_path=data.folder_path)
+    elif task_type == TaskType.REINDEX_VECTORS:
+        params["force"] = data.force
+    
     # 创建任务
     task = Task(
         task_type=task_type,
         status=TaskStatus.PENDING,
         user_id=current_user.id,
-        # params={"triggered_by": "manual"},
+        params=params,
     )
     db.add(task)
     await db.commit()
     await db.refresh(task)
     
     # 后台执行
-    background_tasks.add_task(execute_task_background, task.id)
+    await schedule_task(background_tasks, task.id)
     
     return TaskResponse.model_validate(task)
 
 
+async def schedule_task(background_tasks: BackgroundTasks, task_id: int):
+    """将任务投递到任务队列，队列不可用时在 API 进程内执行"""
+    if not await job_queue.submit("execute_task", {"task_id": task_id}):
+        background_tasks.add_task(execute_task_background, task_id)
+
+
 async def execute_task_background(task_id: int):
     """后台执行任务"""
     from src.models.database import async_session_maker
@@ -149,6 +173,8 @@ async def execute_task_background(task_id: int):
                 await generate_album_suggestions(db, task)
             elif task.task_type == TaskType.REINDEX_VECTORS:
                 await reindex_vectors(db, task)
+            elif task.task_type == TaskType.SCAN_FOLDER:
+                await scan_folder(db, task)
             
             task.status = TaskStatus.COMPLETED
             task.completed_at = datetime.utcnow()
@@ -257,54 +283,88 @@ async def generate_album_suggestions(db: AsyncSession, task: Task):
 
 
 async def reindex_vectors(db: AsyncSession, task: Task):
-    """重建向量索引"""
+    """
+    重建向量索引（按批生成向量，每批一次 Qdrant 写入与一次提交）
+    
+    嵌入文本未变化的资产跳过，除非任务参数指定 force。
+    """
     from src.models import Asset, AssetStatus
-    from src.services import gemini_service, vector_service
+    from src.services.embedding import embedding_service
     
     # 获取所有就绪资产
     from src.utils.security import VisibilityHelper
-    result = await db.execute(
-        select(Asset).where(
-            Asset.user_id == task.user_id,
-            Asset.status == AssetStatus.READY, 
-            VisibilityHelper.active_assets()
-        )
-    )
-    assets = result.scalars().all()
+    conditions = [
+        Asset.user_id == task.user_id,
+        Asset.status == AssetStatus.READY, 
+        VisibilityHelper.active_assets(),
+    ]
+    total = await db.scalar(select(func.count(Asset.id)).where(*conditions))
     
-    task.total_items = len(assets)
+    task.total_items = total
     await db.commit()
-    
-    for i, asset in enumerate(assets):
-        # 生成向量
-        text_for_embedding = " ".join([
-            asset.title or "",
-            asset.description or "",
-            " ".join(asset.tags or []),
-            asset.ocr_text or "",
-            asset.original_filename,
-        ])
+    force = bool((task.params or {}).get("force"))
+    
+    # 按 ID 分批读取，避免一次加载全部资产
+    processed = reindexed = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Asset)
+            .where(*conditions, Asset.id > last_id)
+            .order_by(Asset.id)
+            .limit(settings.reindex_batch_size)
+        )
+        assets = result.scalars().all()
+        if not assets:
+            break
+        last_id = assets[-1].id
         
-        if text_for_embedding.strip():
-            vector = await gemini_service.generate_embedding(text_for_embedding)
-            
-            vector_id = await vector_service.upsert_vector(
-                asset_id=asset.id,
-                vector=vector,
-                payload={
-                    "title": asset.title,
-                    "tags": asset.tags,
-                    "asset_type": asset.asset_type.value,
-                    "folder_id": asset.folder_id,
-                },
-            )
-            asset.vector_id = vector_id
+        reindexed += await embedding_service.index_assets(db, assets, force=force, sync_unchanged=True)
+        processed += len(assets)
         
-        # task.processed_items = i + 1
-        task.progress = int((i + 1) / len(assets) * 100)
+        task.progress = int(processed / max(total, 1) * 100)
         await db.commit()
+        # 释放已处理的资产对象
+        db.expunge_all()
+        db.add(task)
     
-    task.result = {"reindexed_assets": len(assets)}
+    task.result = {"reindexed_assets": reindexed, "unchanged_assets": processed - reindexed}
+
+
+# 导入后的资产处理在任务之外进行，并发受上限约束
+_processing_tasks = set()
+_processing_semaphore: Optional[asyncio.Semaphore] = None
+
+
+async def process_imported_assets(asset_ids: List[int]):
+    """依次处理一批导入的资产"""
+    from src.routers.assets import process_asset_background
+    
+    global _processing_semaphore
+    if _processing_semaphore is None:
+        _processing_semaphore = asyncio.Semaphore(settings.ingest_concurrency)
+    
+    async def _process(asset_id: int):
+        async with _processing_semaphore:
+            await process_asset_background(asset_id)
+    
+    await asyncio.gather(*(_process(asset_id) for asset_id in asset_ids))
+
+
+async def schedule_imported_assets(asset_ids: List[int]):
+    """安排导入资产的后台处理，不阻塞导入进度"""
+    if await job_queue.submit_many("process_asset", [{"asset_id": i} for i in asset_ids]):
+        return
+    job = asyncio.create_task(process_imported_assets(asset_ids))
+    _processing_tasks.add(job)
+    job.add_done_callback(_processing_tasks.discard)
+
+
+async def scan_folder(db: AsyncSession, task: Task):
+    """服务端批量导入（本地目录或 S3 前缀）"""
+    from src.services.importer import import_service
+    
+    task.result = await import_service.scan_folder(db, task, on_imported=schedule_imported_assets)
 
 
 @router.get("/stats", response_model=SystemStatsResponse, summary="获取系统统计")
@@ -375,6 +435,28 @@ async def get_system_stats(
     )
 
 
+@router.get("/metrics", summary="获取运行指标")
+async def get_runtime_metrics(
+    current_user: User = Depends(get_current_user),
+):
+    """任务队列长度与查询向量/搜索结果缓存命中统计（仅管理员）"""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="仅管理员可以查看运行指标")
+    from redis.exceptions import RedisError
+    from src.services.query_cache import query_embedding_cache
+    from src.services.search_cache import search_cache
+    
+    try:
+        queue = await job_queue.stats()
+    except RedisError as e:
+        queue = {"error": str(e)}
+    return {
+        "queue": queue,
+        "query_embedding_cache": query_embedding_cache.metrics(),
+        "search_cache": search_cache.metrics(),
+    }
+
+
 @router.get("/{task_id}", response_model=TaskResponse, summary="获取任务详情")
 async def get_task(
     task_id: int,
@@ -413,6 +495,6 @@ async def retry_task(
     await db.refresh(task)
     
     # 后台执行
-    background_tasks.add_task(execute_task_background, task.id)
+    await schedule_task(background_tasks, task.id)
     
     return TaskResponse.model_validate(task)
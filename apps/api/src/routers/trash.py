@@ -1,7 +1,7 @@
 """
 回收站相关 API 路由
 """
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
@@ -12,6 +12,7 @@ from src.routers.assets import asset_to_response
 from src.services import asset_service
 from src.routers.auth import get_current_user
 from src.models.user import User
+from src.utils.pagination import fetch_page
 
 router = APIRouter(prefix="/trash", tags=["回收站"])
 
@@ -20,36 +21,39 @@ router = APIRouter(prefix="/trash", tags=["回收站"])
 async def list_trash_assets(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor（传入时忽略 page）"),
+    include_total: bool = Query(True, description="首页是否统计总数"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     from src.utils.security import VisibilityHelper
     """获取所有已删除的资产 (默认排除私密资产)"""
-    query = select(Asset).where(
-        Asset.user_id == current_user.id,
-        VisibilityHelper.trashed_assets(), 
-        Asset.is_private.is_(False)
-    )
-    count_query = select(func.count(Asset.id)).where(
+    conditions = [
         Asset.user_id == current_user.id,
         VisibilityHelper.trashed_assets(), 
         Asset.is_private.is_(False)
-    )
+    ]
     
-    # 获取总数
-    total = await db.scalar(count_query)
+    # 获取总数（按游标翻页时不重复统计）
+    total = None
+    if include_total and not cursor:
+        total = await db.scalar(select(func.count(Asset.id)).where(*conditions))
     
-    # 分页查询
-    query = query.order_by(Asset.deleted_at.desc()).offset((page - 1) * page_size).limit(page_size)
-    result = await db.execute(query)
-    assets = result.scalars().all()
+    # 分页查询（按删除时间倒序，键集分页）
+    try:
+        result = await fetch_page(
+            db, select(Asset).where(*conditions), Asset.deleted_at, page_size, cursor=cursor, page=page,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return AssetListResponse(
-        items=[asset_to_response(a) for a in assets],
+        items=[asset_to_response(a) for a in result.items],
         total=total,
         page=page,
         page_size=page_size,
-        has_more=(page * page_size) < total,
+        has_more=result.has_more,
+        next_cursor=result.next_cursor,
     )
 
 
@@ -0,0 +1,321 @@
+"""
+断点续传上传 API 路由
+
+客户端流程：
+1. POST /uploads/sessions 创建会话，获得 chunk_size / total_parts
+2. PUT /uploads/sessions/{id}/parts?offset=N 逐片上传（可重试、可乱序）
+3. 中断后 GET /uploads/sessions/{id} 查询缺失分片继续上传
+4. POST /uploads/sessions/{id}/complete 合并并创建资产
+"""
+import math
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import get_db, Album, UploadSession, UploadPart, UploadSessionStatus
+from src.models.user import User
+from src.schemas import (
+    UploadSessionCreate, UploadSessionResponse, UploadPartResponse, UploadResponse,
+)
+from src.services import asset_service, storage_service, album_service
+from src.services.storage import MIN_PART_SIZE
+from src.routers.auth import get_current_user
+from src.routers.assets import schedule_asset_processing
+
+router = APIRouter(prefix="/uploads", tags=["断点续传"])
+
+# S3 单个 Multipart Upload 最多 10000 个分片
+MAX_PARTS = 10000
+
+
+def compute_chunk_size(file_size: int) -> int:
+    """计算分片大小：不小于 S3 最小分片，且总分片数不超过上限"""
+    chunk_size = max(settings.upload_chunk_size, MIN_PART_SIZE)
+    return max(chunk_size, math.ceil(file_size / MAX_PARTS))
+
+
+async def get_session_or_404(
+    db: AsyncSession,
+    session_id: str,
+    user_id: int,
+    for_update: bool = False,
+) -> UploadSession:
+    """获取当前用户的上传会话"""
+    query = select(UploadSession).where(
+        UploadSession.id == session_id,
+        UploadSession.user_id == user_id,
+    )
+    if for_update:
+        query = query.with_for_update()
+    result = await db.execute(query)
+    session = result.scalar_one_or_none()
+    if not session:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    return session
+
+
+async def owns_album(db: AsyncSession, album_id: int, user_id: int) -> bool:
+    """相册存在且属于当前用户"""
+    result = await db.execute(
+        select(Album.id).where(Album.id == album_id, Album.user_id == user_id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+def ensure_active(session: UploadSession):
+    """校验会话仍可继续上传"""
+    if session.status != UploadSessionStatus.ACTIVE:
+        raise HTTPException(status_code=409, detail=f"上传会话已{session.status.value}")
+    if session.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=410, detail="上传会话已过期")
+
+
+async def get_received_parts(db: AsyncSession, session_id: str) -> List[UploadPart]:
+    """获取已接收分片（按序号排序）"""
+    result = await db.execute(
+        select(UploadPart)
+        .where(UploadPart.session_id == session_id)
+        .order_by(UploadPart.part_number)
+    )
+    return list(result.scalars().all())
+
+
+def build_session_response(session: UploadSession, parts: List[UploadPart]) -> UploadSessionResponse:
+    """构造会话状态响应"""
+    received = {p.part_number for p in parts}
+    return UploadSessionResponse(
+        id=session.id,
+        filename=session.filename,
+        file_size=session.file_size,
+        chunk_size=session.chunk_size,
+        total_parts=session.total_parts,
+        status=session.status,
+        received_bytes=sum(p.size for p in parts),
+        received_parts=sorted(received),
+        missing_parts=[n for n in range(1, session.total_parts + 1) if n not in received],
+        asset_id=session.asset_id,
+        expires_at=session.expires_at,
+    )
+
+
+@router.post("/sessions", response_model=UploadSessionResponse, summary="创建上传会话")
+async def create_upload_session(
+    data: UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    创建断点续传会话
+
+    - 服务端决定分片大小，客户端按 offset 上传
+    - 会话在 UPLOAD_SESSION_TTL_HOURS 后过期并由清理任务回收
+    """
+    try:
+        mime_type, _ = asset_service.validate_file_format(data.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if data.album_id and not await owns_album(db, data.album_id, current_user.id):
+        raise HTTPException(status_code=404, detail="相册不存在")
+
+    chunk_size = compute_chunk_size(data.file_size)
+    total_parts = math.ceil(data.file_size / chunk_size)
+
+    # 合并后按内容哈希转存为 blob，此处为临时路径
+    filename = os.path.basename(data.filename)
+    file_path = f"uploads/{uuid.uuid4().hex}_{filename}"
+    upload_id = await storage_service.create_multipart_upload(file_path, mime_type)
+
+    session = UploadSession(
+        filename=data.filename,
+        folder_path=data.folder_path,
+        album_id=data.album_id,
+        mime_type=mime_type,
+        file_size=data.file_size,
+        chunk_size=chunk_size,
+        total_parts=total_parts,
+        file_path=file_path,
+        upload_id=upload_id,
+        user_id=current_user.id,
+        expires_at=datetime.utcnow() + timedelta(hours=settings.upload_session_ttl_hours),
+    )
+    db.add(session)
+    await db.commit()
+    await db.refresh(session)
+
+    return build_session_response(session, [])
+
+
+@router.get("/sessions/{session_id}", response_model=UploadSessionResponse, summary="查询上传进度")
+async def get_upload_session(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """查询会话已接收/缺失的分片，用于断点续传"""
+    session = await get_session_or_404(db, session_id, current_user.id)
+    parts = await get_received_parts(db, session.id)
+    return build_session_response(session, parts)
+
+
+@router.put("/sessions/{session_id}/parts", response_model=UploadPartResponse, summary="上传分片")
+async def upload_session_part(
+    session_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="分片在文件中的起始偏移量"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    上传一个分片（请求体为原始字节）
+
+    - offset 必须与 chunk_size 对齐
+    - 重复上传同一分片会覆盖之前的 ETag（幂等）
+    """
+    session = await get_session_or_404(db, session_id, current_user.id)
+    ensure_active(session)
+
+    if offset % session.chunk_size != 0 or offset >= session.file_size:
+        raise HTTPException(status_code=400, detail="offset 未与分片大小对齐或超出文件大小")
+
+    part_number = offset // session.chunk_size + 1
+    expected = min(session.chunk_size, session.file_size - offset)
+
+    # 读取请求体，超出预期长度立即拒绝
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer.extend(chunk)
+        if len(buffer) > expected:
+            raise HTTPException(status_code=400, detail="分片大小超出预期")
+    if len(buffer) != expected:
+        raise HTTPException(status_code=400, detail=f"分片大小不匹配，期望 {expected} 字节")
+
+    part = await storage_service.upload_part(
+        session.file_path, session.upload_id, part_number, bytes(buffer)
+    )
+
+    stmt = pg_insert(UploadPart).values(
+        session_id=session.id,
+        part_number=part_number,
+        size=expected,
+        etag=part["ETag"],
+        created_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UploadPart.session_id, UploadPart.part_number],
+        set_={"size": stmt.excluded.size, "etag": stmt.excluded.etag, "created_at": stmt.excluded.created_at},
+    )
+    await db.execute(stmt)
+    session.updated_at = datetime.utcnow()
+    await db.commit()
+
+    parts = await get_received_parts(db, session.id)
+    received = {p.part_number for p in parts}
+    next_part = next((n for n in range(1, session.total_parts + 1) if n not in received), None)
+
+    return UploadPartResponse(
+        part_number=part_number,
+        size=expected,
+        received_bytes=sum(p.size for p in parts),
+        next_offset=(next_part - 1) * session.chunk_size if next_part else None,
+    )
+
+
+@router.post("/sessions/{session_id}/complete", response_model=UploadResponse, summary="完成上传")
+async def complete_upload_session(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    合并全部分片并创建资产，随后进入后台 AI 处理
+
+    可安全重试：会话已完成时返回已创建的资产
+    """
+    session = await get_session_or_404(db, session_id, current_user.id, for_update=True)
+    if session.status == UploadSessionStatus.COMPLETED and session.asset_id:
+        return UploadResponse(
+            asset_id=session.asset_id,
+            filename=session.filename,
+            status="completed",
+            message="上传已完成",
+        )
+    ensure_active(session)
+
+    parts = await get_received_parts(db, session.id)
+    if len(parts) != session.total_parts:
+        missing = session.total_parts - len(parts)
+        raise HTTPException(status_code=409, detail=f"尚有 {missing} 个分片未上传")
+
+    try:
+        await storage_service.complete_multipart_upload(
+            session.file_path,
+            session.upload_id,
+            [{"PartNumber": p.part_number, "ETag": p.etag} for p in parts],
+        )
+    except Exception as e:
+        # 上次请求已合并成功但未能提交（重试）：分片上传已不存在，对象已完整写入
+        if await storage_service.get_file_size(session.file_path) != session.file_size:
+            raise HTTPException(status_code=502, detail=f"分片合并失败：{str(e)}")
+
+    # 资产、相册关联与会话状态在同一事务中提交，会话行锁保持到提交为止：
+    # 提交失败时临时对象仍在，重试可以重新创建
+    try:
+        asset = await asset_service.create_asset_from_storage(
+            db=db,
+            file_path=session.file_path,
+            filename=os.path.basename(session.filename),
+            user_id=current_user.id,
+            folder_path=session.folder_path,
+            commit=False,
+        )
+    except ValueError as e:
+        await db.rollback()
+        session = await get_session_or_404(db, session_id, current_user.id, for_update=True)
+        if session.status == UploadSessionStatus.ACTIVE:
+            session.status = UploadSessionStatus.ABORTED
+            await db.commit()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    session.status = UploadSessionStatus.COMPLETED
+    session.asset_id = asset.id
+
+    # 相册可能在上传期间被删除，此时只创建资产
+    if session.album_id and await owns_album(db, session.album_id, current_user.id):
+        await album_service.add_assets_to_album(db, session.album_id, [asset.id])
+    else:
+        await db.commit()
+
+    await schedule_asset_processing(background_tasks, asset.id)
+
+    return UploadResponse(
+        asset_id=asset.id,
+        filename=asset.original_filename,
+        status="pending",
+        message="上传成功，正在后台处理",
+    )
+
+
+@router.delete("/sessions/{session_id}", summary="取消上传")
+async def abort_upload_session(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """取消上传会话并释放已上传的分片"""
+    session = await get_session_or_404(db, session_id, current_user.id, for_update=True)
+    if session.status != UploadSessionStatus.ACTIVE:
+        raise HTTPException(status_code=409, detail=f"上传会话已{session.status.value}")
+
+    await storage_service.abort_multipart_upload(session.file_path, session.upload_id)
+    session.status = UploadSessionStatus.ABORTED
+    await db.commit()
+
+    return {"message": "上传已取消"}
@@ -10,6 +10,8 @@ from sqlalchemy import select, func
 from src.models import get_db, Asset, User
 from src.schemas import AssetListResponse, AssetResponse
 from src.routers.assets import asset_to_response
+from src.services.embedding import embedding_service
+from src.utils.pagination import fetch_page
 from src.utils.security import verify_password, get_password_hash, create_access_token
 from src.routers.auth import get_current_user
 from src.config import settings
@@ -106,30 +108,34 @@ async def list_vault_assets(
     _authorized: bool = Depends(verify_vault_token),
     page: int = 1, 
     page_size: int = 50,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     db: AsyncSession = Depends(get_db),
 ):
     from src.utils.security import VisibilityHelper
-    query = select(Asset).where(
+    conditions = [
         Asset.user_id == _authorized["user_id"],
         VisibilityHelper.private_assets()
-    )
-    count_query = select(func.count(Asset.id)).where(
-        Asset.user_id == _authorized["user_id"],
-        VisibilityHelper.private_assets()
-    )
+    ]
     
-    total = await db.scalar(count_query)
+    total = None
+    if include_total and not cursor:
+        total = await db.scalar(select(func.count(Asset.id)).where(*conditions))
     
-    query = query.order_by(Asset.created_at.desc()).offset((page - 1) * page_size).limit(page_size)
-    result = await db.execute(query)
-    assets = result.scalars().all()
+    try:
+        result = await fetch_page(
+            db, select(Asset).where(*conditions), Asset.created_at, page_size, cursor=cursor, page=page,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return AssetListResponse(
-        items=[asset_to_response(a) for a in assets],
+        items=[asset_to_response(a) for a in result.items],
         total=total,
         page=page,
         page_size=page_size,
-        has_more=(page * page_size) < total,
+        has_more=result.has_more,
+        next_cursor=result.next_cursor,
     )
 
 
@@ -146,6 +152,7 @@ async def move_in_vault(
         
     asset.is_private = True
     await db.commit()
+    await embedding_service.sync_assets(db, [asset])
     return {"message": "已移入保险库"}
 
 
@@ -162,6 +169,7 @@ async def move_out_vault(
         
     asset.is_private = False
     await db.commit()
+    await embedding_service.sync_assets(db, [asset])
     return {"message": "已移出保险库"}
 
 
@@ -3,10 +3,11 @@ Pydantic 模型模块
 """
 from src.schemas.asset import (
     AssetBase, AssetCreate, AssetUpdate, AssetResponse, AssetListResponse,
-    AssetSearchRequest, SimilarAssetResponse, AssetEdit, AssetAIEdit, AssetVersionResponse,
+    AssetSearchRequest, SimilarAssetResponse, FacetBucket, MapCluster, MapClusterResponse, AssetEdit, AssetAIEdit, AssetVersionResponse,
     FolderBase, FolderCreate, FolderResponse, FolderTreeResponse,
     CustomFieldBase, CustomFieldCreate, CustomFieldResponse,
     UploadResponse, BatchUploadResponse,
+    UploadCheckItem, UploadCheckRequest, UploadCheckResponse,
 )
 from src.schemas.album import (
     AlbumBase, AlbumCreate, AlbumUpdate, AlbumResponse, AlbumDetailResponse, SuggestedAlbumResponse,
@@ -18,6 +19,9 @@ from src.schemas.album import (
 from src.schemas.task import (
     TaskResponse, TaskListResponse, TaskStatusResponse, TriggerScanRequest, SystemStatsResponse,
 )
+from src.schemas.upload import (
+    UploadSessionCreate, UploadSessionResponse, UploadPartResponse,
+)
 from src.schemas.user import (
     UserBase, UserCreate, UserUpdate, UserResponse, Token, TokenData,
 )
@@ -25,10 +29,11 @@ from src.schemas.user import (
 __all__ = [
     # Asset
     "AssetBase", "AssetCreate", "AssetUpdate", "AssetResponse", "AssetListResponse",
-    "AssetSearchRequest", "SimilarAssetResponse",
+    "AssetSearchRequest", "SimilarAssetResponse", "FacetBucket", "MapCluster", "MapClusterResponse",
     "FolderBase", "FolderCreate", "FolderResponse", "FolderTreeResponse",
     "CustomFieldBase", "CustomFieldCreate", "CustomFieldResponse",
     "UploadResponse", "BatchUploadResponse",
+    "UploadCheckItem", "UploadCheckRequest", "UploadCheckResponse",
     # Album
     "AlbumBase", "AlbumCreate", "AlbumUpdate", "AlbumResponse", "AlbumDetailResponse", "SuggestedAlbumResponse",
     "CollectionBase", "CollectionCreate", "CollectionUpdate", "CollectionResponse", "CollectionDetailResponse",
@@ -37,6 +42,8 @@ __all__ = [
     "DownloadPresetBase", "DownloadPresetCreate", "DownloadPresetResponse",
     # Task
     "TaskResponse", "TaskListResponse", "TaskStatusResponse", "TriggerScanRequest", "SystemStatsResponse",
+    # Upload
+    "UploadSessionCreate", "UploadSessionResponse", "UploadPartResponse",
     # User
     "UserBase", "UserCreate", "UserUpdate", "UserResponse", "Token", "TokenData",
     # Other
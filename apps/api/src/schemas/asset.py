@@ -6,6 +6,7 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 
 from src.models.asset import AssetType, AssetStatus
+from src.utils.tag_query import MAX_QUERY_LENGTH
 
 
 class AssetBase(BaseModel):
@@ -98,34 +99,66 @@ class AssetResponse(BaseModel):
         from_attributes = True
 
 
+class FacetBucket(BaseModel):
+    """分面统计项"""
+    value: str
+    label: Optional[str] = None  # 显示名称（文件夹名等）
+    count: int
+
+
+class MapCluster(BaseModel):
+    """地图聚类（一个 geohash 网格单元）"""
+    geohash: str
+    count: int
+    latitude: float  # 单元内资产的平均位置
+    longitude: float
+    asset_id: int  # 代表资产（优先有缩略图的最新资产）
+    thumbnail_url: Optional[str] = None
+
+
+class MapClusterResponse(BaseModel):
+    """地图聚类响应"""
+    precision: int  # 聚类使用的 geohash 位数
+    total: int  # 返回的聚类包含的资产总数
+    truncated: bool = False  # 视野内聚类数超过 limit，只返回资产最多的部分
+    clusters: List[MapCluster]
+
+
 class AssetListResponse(BaseModel):
     """资产列表响应"""
     items: List[AssetResponse]
-    total: int
+    total: Optional[int] = None  # 按游标翻页时不重复统计（为空）
     page: int
     page_size: int
     has_more: bool
+    next_cursor: Optional[str] = None  # 下一页游标，没有更多时为空
+    facets: Optional[Dict[str, List[FacetBucket]]] = None  # 搜索分面（include_facets 时返回）
 
 
 class AssetSearchRequest(BaseModel):
     """资产搜索请求"""
     query: Optional[str] = None
     ai_search: bool = False  # 是否使用 AI 语义搜索
+    hybrid_search: bool = False  # 关键词 + 语义混合检索（优先于 ai_search）
     
     # 过滤条件
     asset_types: Optional[List[AssetType]] = None
     folder_id: Optional[int] = None
-    tags: Optional[List[str]] = None
+    tags: Optional[List[str]] = None  # 须包含全部标签
+    tag_query: Optional[str] = Field(None, max_length=MAX_QUERY_LENGTH)  # 标签布尔查询，如 "风景 AND (猫 OR 狗) NOT 夜景"
     date_from: Optional[datetime] = None
     date_to: Optional[datetime] = None
     custom_fields: Optional[Dict[str, Any]] = None
     
-    # 分页
+    # 分页（传入 cursor 时忽略 page）
     page: int = 1
     page_size: int = 50
+    cursor: Optional[str] = None
+    include_total: bool = True  # 首页是否统计总数
+    include_facets: bool = False  # 是否返回当前结果集的分面统计（类型/标签/相机/拍摄年月/文件夹）
     
-    # 排序
-    sort_by: str = "created_at"
+    # 排序（relevance: 有关键词时按相关度，否则按创建时间）
+    sort_by: str = "relevance"
     sort_order: str = "desc"
 
 
@@ -219,3 +252,20 @@ class BatchUploadResponse(BaseModel):
     success: int
     failed: int
     results: List[UploadResponse]
+
+
+class UploadCheckItem(BaseModel):
+    """预上传检查项（客户端计算的 SHA-256）"""
+    hash: str = Field(..., min_length=64, max_length=64)
+    size: int = Field(..., ge=0)
+
+
+class UploadCheckRequest(BaseModel):
+    """预上传去重检查请求"""
+    files: List[UploadCheckItem] = Field(..., max_length=1000)
+
+
+class UploadCheckResponse(BaseModel):
+    """预上传去重检查响应"""
+    existing: List[str]  # 已存在，无需上传
+    missing: List[str]   # 需要上传
@@ -49,7 +49,10 @@ class TaskStatusResponse(BaseModel):
 
 class TriggerScanRequest(BaseModel):
     """触发扫描请求"""
-    scan_type: str = "album_suggestion"  # album_suggestion, reindex
+    scan_type: str = "album_suggestion"  # album_suggestion, reindex, scan_folder
+    path: Optional[str] = None  # scan_folder: 服务器本地目录或 s3://bucket/prefix
+    folder_path: Optional[str] = None  # scan_folder: 导入到的文件夹（默认为来源目录名）
+    force: bool = False  # reindex: 忽略嵌入文本哈希，重新写入全部向量
 
 
 class SystemStatsResponse(BaseModel):
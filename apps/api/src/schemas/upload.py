@@ -0,0 +1,39 @@
+"""
+断点续传上传相关 Pydantic 模型
+"""
+from datetime import datetime
+from typing import Optional, List
+from pydantic import BaseModel, Field
+
+from src.models.upload import UploadSessionStatus
+
+
+class UploadSessionCreate(BaseModel):
+    """创建上传会话请求"""
+    filename: str
+    file_size: int = Field(..., gt=0)
+    folder_path: Optional[str] = None
+    album_id: Optional[int] = None
+
+
+class UploadSessionResponse(BaseModel):
+    """上传会话状态响应"""
+    id: str
+    filename: str
+    file_size: int
+    chunk_size: int
+    total_parts: int
+    status: UploadSessionStatus
+    received_bytes: int = 0
+    received_parts: List[int] = Field(default_factory=list)
+    missing_parts: List[int] = Field(default_factory=list)
+    asset_id: Optional[int] = None
+    expires_at: datetime
+
+
+class UploadPartResponse(BaseModel):
+    """分片上传响应"""
+    part_number: int
+    size: int
+    received_bytes: int
+    next_offset: Optional[int] = None  # 下一个缺失分片的偏移量，全部收到时为 None
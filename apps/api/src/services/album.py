@@ -7,6 +7,7 @@ from sqlalchemy import select, func, desc, insert, Integer
 from sqlalchemy.orm import selectinload
 
 from src.models import Album, Asset, album_assets, AlbumType, AlbumStatus
+from src.utils.tag_query import tag_filter, tags_any, tags_none
 
 
 class AlbumService:
@@ -146,7 +147,12 @@ class AlbumService:
     async def evaluate_smart_album(
         self, db: AsyncSession, album_id: int, user_id: int
     ) -> List[Asset]:
-        """根据智能相册规则评估匹配的资产"""
+        """
+        根据智能相册规则评估匹配的资产
+
+        Raises:
+            ValueError: 标签查询语法错误
+        """
         album_result = await db.execute(
             select(Album).where(
                 Album.id == album_id,
@@ -165,13 +171,14 @@ class AlbumService:
             Asset.deleted_at.is_(None),
         )
 
-        # 标签规则
+        # 标签规则（include 任一、exclude 均不包含、query 布尔查询）
         if "tags" in rules:
             if rules["tags"].get("include"):
-                query = query.where(Asset.tags.overlap(rules["tags"]["include"]))
+                query = query.where(tags_any(rules["tags"]["include"]))
             if rules["tags"].get("exclude"):
-                for tag in rules["tags"]["exclude"]:
-                    query = query.where(~Asset.tags.contains([tag]))
+                query = query.where(tags_none(rules["tags"]["exclude"]))
+            if rules["tags"].get("query"):
+                query = query.where(tag_filter(rules["tags"]["query"]))
 
         # 日期范围
         if "date_range" in rules:
@@ -2,23 +2,38 @@
 资产处理服务
 """
 import io
+import asyncio
 import os
+import uuid
 import hashlib
 from datetime import datetime
-from typing import Optional, Dict, Any, List, BinaryIO
+from typing import Optional, Dict, Any, List, BinaryIO, Union
 import mimetypes
 
 from PIL import Image
 import exifread
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, func, or_, and_, cast, literal, literal_column, null, union_all, String
 from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError
 
-from src.models import Asset, AssetType, AssetStatus, Folder, CustomField
+from src.config import settings
+from src.models import Asset, AssetVersion, AssetType, AssetStatus, Folder, CustomField
+from src.models.database import delete_after_commit
 from src.services.storage import storage_service, calculate_file_hash
+from src.services.media import media_service
+from src.services.blob import blob_service
+from src.services.folder import folder_service
 from src.services.gemini import gemini_service
 from src.services.vector import vector_service
+from src.services.embedding import embedding_service
 from src.schemas.asset import AssetSearchRequest
+from src.utils.search import keyword_filter, keyword_rank, reciprocal_rank_fusion
+from src.utils.pagination import Page, fetch_page, page_offset, slice_page
+from src.utils.tag_query import tag_filter, tags_all
+from src.utils import geohash
 
 # 注册 HEIF 支持
 try:
@@ -27,6 +42,16 @@ try:
 except ImportError:
     pass
 
+# 同一用户的相同内容只保存一次（由 uq_assets_user_file_hash 唯一索引保证并发安全）
+DUPLICATE_ERROR = "文件已存在（重复上传）"
+DUPLICATE_INDEX = "uq_assets_user_file_hash"
+
+
+def is_duplicate_error(error: IntegrityError) -> bool:
+    """是否为 (user_id, file_hash) 唯一索引冲突"""
+    return DUPLICATE_INDEX in str(error.orig)
+
+
 # 支持的文件格式白名单
 SUPPORTED_FORMATS = {
     # 图片格式
@@ -47,6 +72,10 @@ for exts in SUPPORTED_FORMATS.values():
     SUPPORTED_EXTENSIONS.update(exts)
 
 
+# 非空且有索引的排序字段，可使用键集分页
+KEYSET_SORT_FIELDS = {"created_at", "updated_at", "file_size", "id"}
+
+
 class AssetService:
     """资产服务"""
     
@@ -115,14 +144,204 @@ class AssetService:
             return {}
     
     @staticmethod
-    def get_image_dimensions(image_data: bytes) -> tuple:
-        """获取图片尺寸"""
+    def get_image_dimensions(image_data: Union[bytes, BinaryIO]) -> tuple:
+        """获取图片尺寸（支持字节数据或已打开的文件对象，仅解析文件头）"""
         try:
-            img = Image.open(io.BytesIO(image_data))
+            source = image_data if hasattr(image_data, "read") else io.BytesIO(image_data)
+            img = Image.open(source)
             return img.size
         except Exception:
             return (0, 0)
     
+    @staticmethod
+    def validate_file_format(filename: str) -> tuple:
+        """
+        校验文件格式并检测类型
+        
+        Returns:
+            (mime_type, asset_type)
+        """
+        mime_type, _ = mimetypes.guess_type(filename)
+        if not mime_type:
+            mime_type = "application/octet-stream"
+        
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext not in SUPPORTED_EXTENSIONS:
+            supported_list = ', '.join(sorted(SUPPORTED_EXTENSIONS))
+            raise ValueError(
+                f"不支持的文件格式: {file_ext}。"
+                f"当前支持的格式: {supported_list}"
+            )
+        
+        return mime_type, AssetService.detect_asset_type(mime_type)
+    
+    @staticmethod
+    def build_exif_tags(asset_type: AssetType, exif_fields: Dict[str, Any], width: int, height: int) -> List[str]:
+        """根据 EXIF 信息自动生成标签"""
+        if asset_type == AssetType.VIDEO:
+            return ["视频"]
+        if asset_type != AssetType.IMAGE:
+            return []
+        
+        exif_tags = []
+        taken_at = exif_fields.get("taken_at")
+        if taken_at:
+            exif_tags.append(taken_at.strftime("%Y年"))
+            exif_tags.append(taken_at.strftime("%m月"))
+        if exif_fields.get("camera_model"):
+            exif_tags.append(exif_fields["camera_model"])
+        if width and height:
+            exif_tags.append(f"{width}x{height}")
+        if exif_fields.get("location"):
+            exif_tags.append("有地理信息")
+        return exif_tags
+    
+    async def check_duplicate(self, db: AsyncSession, file_hash: str, user_id: int) -> bool:
+        """检查该用户是否已拥有相同内容的文件"""
+        existing = await db.execute(
+            select(Asset.id).where(Asset.user_id == user_id, Asset.file_hash == file_hash).limit(1)
+        )
+        return existing.scalar_one_or_none() is not None
+    
+    async def find_existing_hashes(self, db: AsyncSession, file_hashes: List[str], user_id: int) -> set:
+        """批量查询该用户已存在的文件哈希（单次查询）"""
+        if not file_hashes:
+            return set()
+        result = await db.execute(
+            select(Asset.file_hash).where(
+                Asset.user_id == user_id,
+                Asset.file_hash.in_(set(file_hashes)),
+            )
+        )
+        return set(result.scalars().all())
+    
+    async def find_existing_files(self, db: AsyncSession, files: List[tuple], user_id: int) -> set:
+        """
+        批量检查该用户的文件是否已存在（哈希与大小同时匹配）
+        
+        Args:
+            db: 数据库会话
+            files: (file_hash, file_size) 列表
+            user_id: 所有者 ID
+            
+        Returns:
+            已存在的文件哈希集合
+        """
+        if not files:
+            return set()
+        wanted = {(file_hash.lower(), size) for file_hash, size in files}
+        result = await db.execute(
+            select(Asset.file_hash, Asset.file_size)
+            .where(
+                Asset.user_id == user_id,
+                Asset.file_hash.in_({file_hash for file_hash, _ in wanted}),
+            )
+        )
+        return {file_hash for file_hash, size in result.all() if (file_hash, size) in wanted}
+    
+    def build_asset_record(
+        self,
+        *,
+        filename: str,
+        safe_filename: str,
+        file_path: str,
+        file_size: int,
+        file_hash: str,
+        mime_type: str,
+        asset_type: AssetType,
+        user_id: int,
+        width: int = 0,
+        height: int = 0,
+        exif_data: Optional[Dict[str, Any]] = None,
+        thumbnail_path: Optional[str] = None,
+        folder_id: Optional[int] = None,
+        custom_fields: Optional[Dict[str, Any]] = None,
+    ) -> Asset:
+        """根据已上传文件的元数据构造资产对象（不写入数据库）"""
+        exif_data = dict(exif_data or {})
+        exif_fields = {
+            key: exif_data.pop(key, None)
+            for key in ("taken_at", "camera_model", "location", "latitude", "longitude")
+        }
+        exif_tags = self.build_exif_tags(asset_type, exif_fields, width, height)
+        
+        return Asset(
+            filename=safe_filename,
+            original_filename=filename,
+            file_path=file_path,
+            thumbnail_path=thumbnail_path,
+            file_size=file_size,
+            mime_type=mime_type,
+            asset_type=asset_type,
+            file_hash=file_hash,
+            width=width,
+            height=height,
+            exif_data=exif_data if exif_data else None,
+            custom_fields=custom_fields or {},
+            folder_id=folder_id,
+            tags=exif_tags,
+            status=AssetStatus.PENDING,
+            user_id=user_id,
+            **exif_fields,
+        )
+    
+    async def _save_asset_record(
+        self,
+        db: AsyncSession,
+        *,
+        folder_path: Optional[str] = None,
+        commit: bool = True,
+        **fields: Any,
+    ) -> Asset:
+        """
+        根据已上传文件的元数据创建资产记录
+        
+        commit=False 时只 flush，由调用方与其他变更在同一事务中提交
+        
+        Raises:
+            ValueError: 并发上传了相同内容（唯一索引冲突，事务已回滚）
+        """
+        # 处理文件夹
+        folder_id = None
+        if folder_path:
+            folder_id = await folder_service.resolve_folder(db, folder_path, fields["user_id"])
+        
+        asset = self.build_asset_record(folder_id=folder_id, **fields)
+        
+        db.add(asset)
+        try:
+            if commit:
+                await db.commit()
+            else:
+                await db.flush()
+        except IntegrityError as e:
+            await db.rollback()
+            if is_duplicate_error(e):
+                raise ValueError(DUPLICATE_ERROR) from e
+            raise
+        await db.refresh(asset)
+        
+        return asset
+    
+    async def _analyze_image(self, source: Union[bytes, BinaryIO], safe_filename: str) -> tuple:
+        """
+        单次解码分析图片并上传缩略图
+        
+        Returns:
+            (width, height, exif_data, thumbnail_path)
+        """
+        try:
+            result = await media_service.analyze(source)
+        except Exception as e:
+            print(f"图片解析失败: {e}")
+            return 0, 0, {}, None
+        
+        thumbnail_path = None
+        if result["thumbnail"]:
+            thumbnail_path = f"thumbnails/{safe_filename}.jpg"
+            await storage_service.upload_bytes(result["thumbnail"], thumbnail_path, "image/jpeg")
+        return result["width"], result["height"], result["exif"], thumbnail_path
+    
     async def create_asset(
         self,
         db: AsyncSession,
@@ -146,81 +365,32 @@ class AssetService:
             创建的资产
         """
         # 计算文件哈希
-        from fastapi.concurrency import run_in_threadpool
         file_hash = await run_in_threadpool(calculate_file_hash, file_data)
         
         # 检查重复
-        existing = await db.execute(
-            select(Asset).where(Asset.file_hash == file_hash)
-        )
-        if existing.scalar_one_or_none():
-            raise ValueError("文件已存在（重复上传）")
+        if await self.check_duplicate(db, file_hash, user_id):
+            raise ValueError(DUPLICATE_ERROR)
         
-        # 检测文件类型
-        mime_type, _ = mimetypes.guess_type(filename)
-        if not mime_type:
-            mime_type = "application/octet-stream"
+        # 检测并验证文件格式
+        mime_type, asset_type = self.validate_file_format(filename)
         
-        asset_type = self.detect_asset_type(mime_type)
-        
-        # 验证文件格式
-        file_ext = os.path.splitext(filename)[1].lower()
-        if file_ext not in SUPPORTED_EXTENSIONS:
-            supported_list = ', '.join(sorted(SUPPORTED_EXTENSIONS))
-            raise ValueError(
-                f"不支持的文件格式: {file_ext}。"
-                f"当前支持的格式: {supported_list}"
-            )
-        
-        # 生成存储路径
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_filename = f"{timestamp}_{file_hash[:8]}_{filename}"
-        file_path = f"assets/{safe_filename}"
         
-        # 上传原文件
-        await storage_service.upload_bytes(file_data, file_path, mime_type)
+        # 上传原文件（内容已存在时只增加引用）
+        blob = await blob_service.store_bytes(db, file_data, mime_type, file_hash=file_hash)
+        file_path = blob.file_path
         
         # 处理图片
         width, height = 0, 0
         thumbnail_path = None
         exif_data = {}
-        taken_at = None
-        camera_model = None
-        location = None
-        latitude = None
-        longitude = None
         
         if asset_type == AssetType.IMAGE:
-            width, height = self.get_image_dimensions(file_data)
-            exif_data = self.extract_exif(file_data)
-            taken_at = exif_data.pop("taken_at", None)
-            camera_model = exif_data.pop("camera_model", None)
-            location = exif_data.pop("location", None)
-            latitude = exif_data.pop("latitude", None)
-            longitude = exif_data.pop("longitude", None)
-            
-            # 自动生成 EXIF 标签
-            exif_tags = []
-            if taken_at:
-                exif_tags.append(taken_at.strftime("%Y年"))
-                exif_tags.append(taken_at.strftime("%m月"))
-            if camera_model:
-                exif_tags.append(camera_model)
-            if width and height:
-                exif_tags.append(f"{width}x{height}")
-            if location:
-                exif_tags.append("有地理信息")
-            
-            # 生成缩略图
-            try:
-                thumbnail_data = await storage_service.generate_thumbnail(file_data)
-                thumbnail_path = f"thumbnails/{safe_filename}.jpg"
-                await storage_service.upload_bytes(thumbnail_data, thumbnail_path, "image/jpeg")
-            except Exception as e:
-                print(f"图片缩略图生成失败: {e}")
+            # 单次解码得到尺寸/EXIF/缩略图
+            width, height, exif_data, thumbnail_path = await self._analyze_image(file_data, safe_filename)
         elif asset_type == AssetType.VIDEO:
             # 视频预处理
-            exif_tags = ["视频"]
             try:
                 thumbnail_data = await storage_service.generate_video_thumbnail(file_data)
                 if thumbnail_data:
@@ -228,45 +398,190 @@ class AssetService:
                     await storage_service.upload_bytes(thumbnail_data, thumbnail_path, "image/jpeg")
             except Exception as e:
                 print(f"视频缩略图生成失败: {e}")
-        else:
-            exif_tags = []
         
-        # 处理文件夹
-        folder_id = None
-        if folder_path:
-            folder = await self.get_or_create_folder(db, folder_path, user_id)
-            folder_id = folder.id
-        
-        # 创建资产记录
-        asset = Asset(
-            filename=safe_filename,
-            original_filename=filename,
+        return await self._save_asset_record(
+            db,
+            filename=filename,
+            safe_filename=safe_filename,
             file_path=file_path,
-            thumbnail_path=thumbnail_path,
             file_size=len(file_data),
+            file_hash=file_hash,
             mime_type=mime_type,
             asset_type=asset_type,
+            user_id=user_id,
+            width=width,
+            height=height,
+            exif_data=exif_data,
+            thumbnail_path=thumbnail_path,
+            folder_path=folder_path,
+            custom_fields=custom_fields,
+        )
+    
+    async def create_asset_from_upload(
+        self,
+        db: AsyncSession,
+        upload: UploadFile,
+        filename: str,
+        user_id: int,
+        folder_path: Optional[str] = None,
+        custom_fields: Optional[Dict[str, Any]] = None,
+    ) -> Asset:
+        """
+        流式创建资产（不在内存中缓冲整个文件）
+        
+        按 settings.upload_chunk_size 分块读取上传文件，边增量计算 SHA-256
+        边写入 S3 分片上传，图片元数据与缩略图直接从落盘的临时文件解析；
+        超过 upload_stream_threshold 的图片仅读取文件头探测尺寸/EXIF，缩略图
+        延迟到后台处理阶段生成。单次上传的内存峰值受分片大小约束，适用于大视频等文件。
+        
+        Args:
+            db: 数据库会话
+            upload: 上传文件（已由框架落盘的临时文件）
+            filename: 文件名
+            folder_path: 文件夹路径
+            custom_fields: 自定义字段
+            
+        Returns:
+            创建的资产
+        """
+        mime_type, asset_type = self.validate_file_format(filename)
+        
+        hasher = hashlib.sha256()
+        
+        async def _read_chunks():
+            await upload.seek(0)
+            while True:
+                chunk = await upload.read(settings.upload_chunk_size)
+                if not chunk:
+                    break
+                await run_in_threadpool(hasher.update, chunk)
+                yield chunk
+        
+        # 哈希在上传完成后才可知，先写入临时路径再转为 blob
+        temp_path = f"uploads/{uuid.uuid4().hex}_{filename}"
+        file_size = await storage_service.upload_stream(_read_chunks(), temp_path, mime_type)
+        file_hash = hasher.hexdigest()
+        
+        if await self.check_duplicate(db, file_hash, user_id):
+            await storage_service.delete_file(temp_path)
+            raise ValueError(DUPLICATE_ERROR)
+        
+        blob = await blob_service.promote(db, temp_path, file_hash, file_size, mime_type)
+        file_path = blob.file_path
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_filename = f"{timestamp}_{file_hash[:8]}_{filename}"
+        
+        width, height = 0, 0
+        thumbnail_path = None
+        exif_data = {}
+        
+        if asset_type == AssetType.IMAGE:
+            await upload.seek(0)
+            if file_size <= settings.upload_stream_threshold:
+                width, height, exif_data, thumbnail_path = await self._analyze_image(upload.file, safe_filename)
+            else:
+                head = await upload.read(settings.upload_probe_bytes)
+                width, height = self.get_image_dimensions(head)
+                exif_data = self.extract_exif(head)
+        elif asset_type == AssetType.VIDEO:
+            try:
+                await upload.seek(0)
+                thumbnail_data = await storage_service.generate_video_thumbnail(upload.file)
+                if thumbnail_data:
+                    thumbnail_path = f"thumbnails/{safe_filename}.jpg"
+                    await storage_service.upload_bytes(thumbnail_data, thumbnail_path, "image/jpeg")
+            except Exception as e:
+                print(f"视频缩略图生成失败: {e}")
+        
+        return await self._save_asset_record(
+            db,
+            filename=filename,
+            safe_filename=safe_filename,
+            file_path=file_path,
+            file_size=file_size,
             file_hash=file_hash,
+            mime_type=mime_type,
+            asset_type=asset_type,
+            user_id=user_id,
             width=width,
             height=height,
-            exif_data=exif_data if exif_data else None,
-            taken_at=taken_at,
-            camera_model=camera_model,
-            location=location,
-            latitude=latitude,
-            longitude=longitude,
-            custom_fields=custom_fields or {},
-            folder_id=folder_id,
-            tags=exif_tags,
-            status=AssetStatus.PENDING,
-            user_id=user_id,  # 新增
+            exif_data=exif_data,
+            thumbnail_path=thumbnail_path,
+            folder_path=folder_path,
+            custom_fields=custom_fields,
         )
+    
+    async def create_asset_from_storage(
+        self,
+        db: AsyncSession,
+        file_path: str,
+        filename: str,
+        user_id: int,
+        folder_path: Optional[str] = None,
+        custom_fields: Optional[Dict[str, Any]] = None,
+        commit: bool = True,
+    ) -> Asset:
+        """
+        为已写入对象存储的文件创建资产（用于分片上传会话合并后）
         
-        db.add(asset)
-        await db.commit()
-        await db.refresh(asset)
+        哈希通过流式读取对象计算，随后临时对象转为 blob；大文件仅下载
+        文件头用于 EXIF/尺寸探测，缩略图延迟到后台处理阶段生成。
         
-        return asset
+        Args:
+            db: 数据库会话
+            file_path: 临时对象存储路径
+            filename: 文件名
+            folder_path: 文件夹路径
+            custom_fields: 自定义字段
+            commit: 为 False 时不提交，临时对象在调用方提交后才删除
+            
+        Returns:
+            创建的资产
+        """
+        mime_type, asset_type = self.validate_file_format(filename)
+        
+        file_hash, file_size = await storage_service.hash_file(file_path)
+        if await self.check_duplicate(db, file_hash, user_id):
+            await storage_service.delete_file(file_path)
+            raise ValueError(DUPLICATE_ERROR)
+        
+        blob = await blob_service.promote(db, file_path, file_hash, file_size, mime_type)
+        file_path = blob.file_path
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_filename = f"{timestamp}_{file_hash[:8]}_{filename}"
+        width, height = 0, 0
+        thumbnail_path = None
+        exif_data = {}
+        
+        if asset_type == AssetType.IMAGE and file_size > 0:
+            if file_size <= settings.upload_stream_threshold:
+                file_data = await storage_service.download_file(file_path)
+                width, height, exif_data, thumbnail_path = await self._analyze_image(file_data, safe_filename)
+            else:
+                head = await storage_service.download_range(
+                    file_path, 0, min(settings.upload_probe_bytes, file_size)
+                )
+                width, height = self.get_image_dimensions(head)
+                exif_data = self.extract_exif(head)
+        
+        return await self._save_asset_record(
+            db,
+            filename=filename,
+            safe_filename=safe_filename,
+            file_path=file_path,
+            file_size=file_size,
+            file_hash=file_hash,
+            mime_type=mime_type,
+            asset_type=asset_type,
+            user_id=user_id,
+            width=width,
+            height=height,
+            exif_data=exif_data,
+            thumbnail_path=thumbnail_path,
+            folder_path=folder_path,
+            custom_fields=custom_fields,
+            commit=commit,
+        )
     
     async def process_asset(self, db: AsyncSession, asset_id: int):
         """
@@ -285,69 +600,23 @@ class AssetService:
             asset.processing_step = "downloading"
             await db.commit()
             
-            # 下载文件
-            file_data = await storage_service.download_file(asset.file_path)
-            
-            # Step: AI Analysis
-            asset.processing_step = "ai_analysis"
-            await db.commit()
-            
-            # AI 分析
-            if asset.asset_type == AssetType.IMAGE:
-                analysis = await gemini_service.analyze_image(file_data, asset.mime_type)
-                
-                asset.title = analysis.get("title", "")
-                asset.description = analysis.get("description", "")
-                asset.tags = analysis.get("tags", [])
-                asset.ocr_text = analysis.get("ocr_text", "")
-            elif asset.asset_type == AssetType.VIDEO:
-                # 视频分析需要临时文件路径
-                import tempfile
-                with tempfile.NamedTemporaryFile(suffix=os.path.splitext(asset.original_filename)[1], delete=False) as tmp:
-                    tmp.write(file_data)
-                    tmp_path = tmp.name
-                
-                try:
-                    analysis = await gemini_service.analyze_video(tmp_path)
-                    asset.title = analysis.get("title", "")
-                    asset.description = analysis.get("description", "")
-                    asset.tags = analysis.get("tags", [])
-                finally:
-                    if os.path.exists(tmp_path):
-                        os.remove(tmp_path)
+            # 下载到临时文件（超过 TEMPFILE_SPOOL_SIZE 后落盘），不将整个对象读入内存
+            file_data = await run_in_threadpool(storage_service.download_to_tempfile, asset.file_path)
+            try:
+                await self._process_downloaded(db, asset, file_data)
+            finally:
+                file_data.close()
             
             # Step: Vector Embedding
             asset.processing_step = "vector"
             await db.commit()
             
-            # 生成向量嵌入
-            text_for_embedding = " ".join([
-                asset.title or "",
-                asset.description or "",
-                " ".join(asset.tags or []),
-                asset.ocr_text or "",
-                asset.original_filename,
-            ])
-            
-            if text_for_embedding.strip():
-                vector = await gemini_service.generate_embedding(text_for_embedding)
-                
-                # 存储向量
-                vector_id = await vector_service.upsert_vector(
-                    asset_id=asset.id,
-                    vector=vector,
-                    payload={
-                        "title": asset.title,
-                        "tags": asset.tags,
-                        "asset_type": asset.asset_type.value,
-                        "folder_id": asset.folder_id,
-                    },
-                )
-                asset.vector_id = vector_id
+            # 生成并存储向量嵌入（向量元数据记录就绪状态，用于检索过滤）
+            asset.status = AssetStatus.READY
+            await embedding_service.index_assets(db, [asset], sync_unchanged=True)
             
             # Step: Completed
             asset.processing_step = "completed"
-            asset.status = AssetStatus.READY
             await db.commit()
             
         except Exception as e:
@@ -357,154 +626,419 @@ class AssetService:
             await db.commit()
             raise
     
-    async def get_or_create_folder(self, db: AsyncSession, path: str, user_id: int) -> Folder:
-        """获取或创建文件夹"""
-        # 规范化路径
-        path = path.strip("/")
-        parts = path.split("/")
+    async def _process_downloaded(self, db: AsyncSession, asset: Asset, file_data: BinaryIO):
+        """缩略图补生成与 AI 分析（file_data 为已下载的临时文件）"""
+        # Step: Thumbnail (流式/分片上传的大文件在此补生成缩略图)
+        if not asset.thumbnail_path:
+            asset.processing_step = "thumbnail"
+            await db.commit()
+            try:
+                file_data.seek(0)
+                if asset.asset_type == AssetType.IMAGE:
+                    thumbnail_data = (await media_service.analyze(file_data))["thumbnail"]
+                elif asset.asset_type == AssetType.VIDEO:
+                    thumbnail_data = await storage_service.generate_video_thumbnail(file_data)
+                else:
+                    thumbnail_data = b""
+                if thumbnail_data:
+                    thumbnail_path = f"thumbnails/{asset.filename}.jpg"
+                    await storage_service.upload_bytes(thumbnail_data, thumbnail_path, "image/jpeg")
+                    asset.thumbnail_path = thumbnail_path
+            except Exception as e:
+                print(f"缩略图生成失败 {asset.id}: {e}")
         
-        current_path = ""
-        parent_id = None
-        folder = None
+        # Step: AI Analysis
+        asset.processing_step = "ai_analysis"
+        await db.commit()
         
-        for part in parts:
-            current_path = f"{current_path}/{part}" if current_path else part
-            
-            result = await db.execute(
-                select(Folder).where(Folder.path == current_path, Folder.user_id == user_id)
-            )
-            folder = result.scalar_one_or_none()
+        # AI 分析
+        file_data.seek(0)
+        if asset.asset_type == AssetType.IMAGE:
+            # 发送缩小后的图片，标签/描述质量不受影响
+            image_data, image_mime = await media_service.prepare_for_analysis(file_data, asset.mime_type)
+            analysis = await gemini_service.analyze_image(image_data, image_mime)
             
-            if not folder:
-                folder = Folder(
-                    name=part,
-                    parent_id=parent_id,
-                    path=current_path,
-                    user_id=user_id,
-                )
-                db.add(folder)
-                await db.commit()
-                await db.refresh(folder)
+            asset.title = analysis.get("title", "")
+            asset.description = analysis.get("description", "")
+            asset.tags = analysis.get("tags", [])
+            asset.ocr_text = analysis.get("ocr_text", "")
+        elif asset.asset_type == AssetType.VIDEO:
+            # 视频分析需要临时文件路径
+            import shutil
+            import tempfile
+            with tempfile.NamedTemporaryFile(suffix=os.path.splitext(asset.original_filename)[1], delete=False) as tmp:
+                await run_in_threadpool(shutil.copyfileobj, file_data, tmp, settings.upload_chunk_size)
+                tmp_path = tmp.name
             
-            parent_id = folder.id
+            try:
+                analysis = await gemini_service.analyze_video(tmp_path)
+                asset.title = analysis.get("title", "")
+                asset.description = analysis.get("description", "")
+                asset.tags = analysis.get("tags", [])
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    
+    async def get_or_create_folder(self, db: AsyncSession, path: str, user_id: int) -> Folder:
+        """获取或创建文件夹（含所有上级目录）"""
+        folder_id = await folder_service.resolve_folder(db, path, user_id)
+        return await db.get(Folder, folder_id)
+    
+    def _search_conditions(self, request: AssetSearchRequest, current_user_id: int) -> list:
+        """搜索的结构化过滤条件（归属、可见性、类型、文件夹、标签、日期）"""
+        from src.utils.security import VisibilityHelper
+        conditions = [
+            Asset.status == AssetStatus.READY,
+            Asset.user_id == current_user_id,  # 核心过滤
+            VisibilityHelper.active_assets(),
+        ]
+        if request.asset_types:
+            conditions.append(Asset.asset_type.in_(request.asset_types))
+        if request.folder_id:
+            conditions.append(Asset.folder_id == request.folder_id)
+        if request.tags:
+            conditions.append(tags_all(request.tags))
+        if request.tag_query:
+            conditions.append(tag_filter(request.tag_query))
+        if request.date_from:
+            conditions.append(Asset.created_at >= request.date_from)
+        if request.date_to:
+            conditions.append(Asset.created_at <= request.date_to)
+        return conditions
+    
+    async def _vector_candidates(
+        self,
+        query_text: str,
+        current_user_id: int,
+        limit: int,
+        score_threshold: Optional[float] = None,
+        asset_types: Optional[List[AssetType]] = None,
+    ) -> List[int]:
+        """
+        生成查询向量并从向量库检索候选资产 ID（相似度降序）
         
-        return folder
+        租户、可见性与资产类型在 Qdrant 内过滤，只取回 asset_id 字段。
+        """
+        query_vector = await gemini_service.generate_query_embedding(query_text)
+        results = await vector_service.search_similar(
+            vector=query_vector,
+            limit=limit,
+            score_threshold=score_threshold,
+            user_id=current_user_id,
+            asset_types=[t.value for t in asset_types] if asset_types else None,
+            payload_fields=["asset_id"],
+        )
+        return [r["asset_id"] for r in results]
+    
+    async def _filter_candidates(
+        self,
+        db: AsyncSession,
+        ranked_ids: List[int],
+        conditions: list,
+        trusted: Optional[set] = None,
+    ) -> List[int]:
+        """
+        用结构化过滤条件校验候选 ID，保持原有顺序（单次按主键查询，只取 ID）
+        
+        Args:
+            trusted: 已满足过滤条件、无需再校验的 ID
+        """
+        trusted = trusted or set()
+        pending = set(ranked_ids) - trusted
+        if not pending:
+            return ranked_ids
+        result = await db.execute(select(Asset.id).where(*conditions, Asset.id.in_(pending)))
+        allowed = trusted | set(result.scalars().all())
+        return [asset_id for asset_id in ranked_ids if asset_id in allowed]
+    
+    async def _load_page(self, db: AsyncSession, ranked_ids: List[int], request: AssetSearchRequest) -> Page:
+        """对排好序的候选 ID 分页（偏移游标），只加载当前页的资产"""
+        offset = page_offset(request.cursor, request.page, request.page_size)
+        page = slice_page(ranked_ids, offset, request.page_size, total=len(ranked_ids))
+        if request.include_facets:
+            page.facets = await self.search_facets(db, [Asset.id.in_(ranked_ids)])
+        if not page.items:
+            return page
+        
+        result = await db.execute(select(Asset).where(Asset.id.in_(page.items)))
+        assets = {a.id: a for a in result.scalars().all()}
+        page.items = [assets[i] for i in page.items if i in assets]
+        return page
+    
+    async def _hybrid_search(
+        self,
+        db: AsyncSession,
+        request: AssetSearchRequest,
+        conditions: list,
+        keyword: str,
+        current_user_id: int,
+    ) -> Page:
+        """
+        混合检索：关键词与向量检索并发执行，按倒数排序融合 (RRF) 合并
+        
+        结构化过滤在数据库中统一执行一次：关键词候选查询本身带过滤条件，
+        仅由向量召回的候选再用同一组条件校验。
+        """
+        limit = settings.hybrid_search_candidates
+        keyword_query = (
+            select(Asset.id)
+            .where(*conditions, keyword_filter(keyword))
+            .order_by(keyword_rank(keyword).desc(), Asset.id.desc())
+            .limit(limit)
+        )
+        
+        # 向量检索不使用数据库会话，与关键词查询并发
+        vector_task = asyncio.create_task(self._vector_candidates(
+            keyword, current_user_id, limit,
+            score_threshold=settings.hybrid_min_score,
+            asset_types=request.asset_types,
+        ))
+        try:
+            keyword_ids = list((await db.execute(keyword_query)).scalars().all())
+        except Exception:
+            vector_task.cancel()
+            raise
+        try:
+            vector_ids = await vector_task
+        except Exception as e:
+            # 向量检索不可用时退化为关键词检索
+            print(f"混合检索的向量部分失败: {e}")
+            vector_ids = []
+        
+        vector_ids = await self._filter_candidates(db, vector_ids, conditions, trusted=set(keyword_ids))
+        fused = [asset_id for asset_id, _ in reciprocal_rank_fusion(keyword_ids, vector_ids)]
+        return await self._load_page(db, fused, request)
     
     async def search_assets(
         self,
         db: AsyncSession,
         request: AssetSearchRequest,
         current_user_id: int,  # 新增：当前用户 ID
-    ) -> tuple:
+    ) -> Page:
         """
         搜索资产
         
+        - 关键词检索：全文索引 + 三元组索引，按相关度或指定字段排序
+        - AI 语义检索 (ai_search)：向量相似度
+        - 混合检索 (hybrid_search)：两者按倒数排序融合
+        
         Args:
             db: 数据库会话
             request: 搜索请求
             
         Returns:
-            (资产列表, 总数)
+            Page（按游标翻页时 total 为空）
+            
+        Raises:
+            ValueError: 分页游标无效
         """
-        from src.utils.security import VisibilityHelper
-        query = select(Asset).where(
-            Asset.status == AssetStatus.READY,
-            Asset.user_id == current_user_id,  # 核心过滤
-            VisibilityHelper.active_assets()
+        conditions = self._search_conditions(request, current_user_id)
+        keyword = (request.query or "").strip()
+        
+        if keyword and request.hybrid_search:
+            return await self._hybrid_search(db, request, conditions, keyword, current_user_id)
+        
+        # AI 搜索逻辑
+        if keyword and request.ai_search:
+            # 1. 从向量库检索候选 ID（相似度降序，数量有上限；租户、可见性、类型在 Qdrant 内过滤）
+            ranked_ids = await self._vector_candidates(
+                keyword,
+                current_user_id,
+                limit=settings.ai_search_max_candidates,
+                score_threshold=settings.ai_search_min_score,
+                asset_types=request.asset_types,
+            )
+            
+            # 2. 文件夹/标签/日期等条件在数据库中校验，保持相似度顺序
+            ranked_ids = await self._filter_candidates(db, ranked_ids, conditions)
+            
+            # 3. 分页：总数为过滤后的候选数，翻页时候选集不变，结果稳定
+            return await self._load_page(db, ranked_ids, request)
+        
+        # 文本搜索（全文索引 + 三元组索引）
+        if keyword:
+            conditions.append(keyword_filter(keyword))
+        
+        # 获取总数（按游标翻页时不重复统计）
+        total = None
+        if request.include_total and not request.cursor:
+            total = await db.scalar(select(func.count(Asset.id)).where(*conditions))
+        
+        # 常规搜索：非空列按键集分页，相关度等计算值按偏移分页
+        if request.sort_by == "relevance" and keyword:
+            sort_column, keyset = keyword_rank(keyword), False
+        elif request.sort_by in KEYSET_SORT_FIELDS:
+            sort_column, keyset = getattr(Asset, request.sort_by), True
+        else:
+            sort_column = getattr(Asset, request.sort_by, Asset.created_at)
+            keyset = sort_column is Asset.created_at
+        
+        page = await fetch_page(
+            db,
+            select(Asset).where(*conditions),
+            sort_column,
+            request.page_size,
+            cursor=request.cursor,
+            page=request.page,
+            descending=request.sort_order == "desc",
+            keyset=keyset,
         )
-        count_query = select(func.count(Asset.id)).where(
-            Asset.status == AssetStatus.READY,
-            Asset.user_id == current_user_id,  # 核心过滤
-            VisibilityHelper.active_assets()
+        page.total = total
+        if request.include_facets:
+            page.facets = await self.search_facets(db, conditions)
+        return page
+    
+    async def search_facets(self, db: AsyncSession, conditions: list) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        结果集的分面统计（单条 SQL）
+        
+        过滤后的资产作为 CTE，各分面分别 GROUP BY 并取前 SEARCH_FACET_LIMIT 项，
+        以 UNION ALL 合并后一次返回，代价只与过滤后的结果集大小相关。
+        
+        Returns:
+            {分面名: [{"value", "label", "count"}, ...]}，分面为 asset_type / tag /
+            camera_model / year / month（拍摄时间）/ folder
+        """
+        filtered = (
+            select(Asset.asset_type, Asset.tags, Asset.camera_model, Asset.taken_at, Asset.folder_id)
+            .where(*conditions)
+            .cte("filtered")
         )
+        tag_rows = select(func.unnest(filtered.c.tags).label("tag")).subquery("tag_rows")
+        # 日期格式直接写入 SQL，保证 SELECT 与 GROUP BY 中是同一表达式
+        year = func.to_char(filtered.c.taken_at, literal_column("'YYYY'"))
+        month = func.to_char(filtered.c.taken_at, literal_column("'YYYY-MM'"))
+        # (分面名, 数据来源, 分组值, 显示名称)
+        facets = [
+            ("asset_type", filtered, filtered.c.asset_type, None),
+            ("tag", tag_rows, tag_rows.c.tag, None),
+            ("camera_model", filtered, filtered.c.camera_model, None),
+            ("year", filtered, year, None),
+            ("month", filtered, month, None),
+            ("folder", filtered.outerjoin(Folder, Folder.id == filtered.c.folder_id), filtered.c.folder_id, Folder.name),
+        ]
         
-        # 文本搜索
-        if request.query and not request.ai_search:
-            search_term = f"%{request.query}%"
-            text_filter = or_(
-                Asset.title.ilike(search_term),
-                Asset.description.ilike(search_term),
-                Asset.original_filename.ilike(search_term),
-                Asset.ocr_text.ilike(search_term),
-                Asset.tags.any(request.query),
+        parts = []
+        for name, source, value, label in facets:
+            group_by = [value] if label is None else [value, label]
+            grouped = (
+                select(
+                    literal(name).label("facet"),
+                    cast(value, String).label("value"),
+                    (cast(null(), String) if label is None else label).label("label"),
+                    func.count().label("count"),
+                )
+                .select_from(source)
+                .where(value.isnot(None))
+                .group_by(*group_by)
+                .order_by(func.count().desc())
+                .limit(settings.search_facet_limit)
+                .subquery()
             )
-            query = query.where(text_filter)
-            count_query = count_query.where(text_filter)
+            parts.append(select(grouped))
         
-        # 类型过滤
-        if request.asset_types:
-            query = query.where(Asset.asset_type.in_(request.asset_types))
-            count_query = count_query.where(Asset.asset_type.in_(request.asset_types))
+        result = await db.execute(union_all(*parts))
         
-        # 文件夹过滤
-        if request.folder_id:
-            query = query.where(Asset.folder_id == request.folder_id)
-            count_query = count_query.where(Asset.folder_id == request.folder_id)
+        buckets: Dict[str, List[Dict[str, Any]]] = {name: [] for name, *_ in facets}
+        for facet, value, label, count in result.all():
+            if facet == "asset_type" and value.upper() in AssetType.__members__:
+                # 非原生枚举列保存成员名（初始化脚本的默认值为取值），统一为取值
+                value = AssetType[value.upper()].value
+            buckets[facet].append({"value": value, "label": label, "count": count})
+        for items in buckets.values():
+            items.sort(key=lambda b: -b["count"])
+        return buckets
+    
+    async def map_clusters(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        zoom: int,
+        limit: int,
+    ) -> Dict[str, Any]:
+        """
+        地图视野内的资产聚类
         
-        # 标签过滤
-        if request.tags:
-            for tag in request.tags:
-                query = query.where(Asset.tags.any(tag))
-                count_query = count_query.where(Asset.tags.any(tag))
+        按 geohash 前缀分组（网格大小随缩放级别变化），每个网格返回资产数、
+        平均位置和一个代表资产，响应大小只取决于视野和 limit，与资产总数无关。
+        视野先转为 geohash 前缀范围（走 idx_assets_user_geohash），再按经纬度精确过滤。
         
-        # 日期过滤
-        if request.date_from:
-            query = query.where(Asset.created_at >= request.date_from)
-            count_query = count_query.where(Asset.created_at >= request.date_from)
-        if request.date_to:
-            query = query.where(Asset.created_at <= request.date_to)
-            count_query = count_query.where(Asset.created_at <= request.date_to)
+        Args:
+            south, west, north, east: 视野边界（west > east 表示跨越 180° 经线）
+            zoom: 地图缩放级别
+            limit: 最多返回的聚类数
+        """
+        from src.utils.security import VisibilityHelper
+        
+        precision = geohash.precision_for_zoom(zoom)
+        conditions = [
+            Asset.user_id == user_id,
+            Asset.status == AssetStatus.READY,
+            VisibilityHelper.active_assets(),
+            Asset.geohash.isnot(None),
+            Asset.latitude.between(south, north),
+            Asset.longitude.between(west, east) if west <= east
+            else or_(Asset.longitude >= west, Asset.longitude <= east),
+        ]
+        prefixes = geohash.covering_prefixes(south, west, north, east, precision)
+        if prefixes:
+            # '{' 是 ASCII 中紧随 'z' 的字符，[p, p + '{') 即所有以 p 开头的 geohash
+            conditions.append(or_(*[
+                and_(Asset.geohash >= prefix, Asset.geohash < prefix + "{") for prefix in prefixes
+            ]))
         
-        # 获取总数
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
+        # 精度以字面量写入，使 SELECT 与 GROUP BY 中的表达式一致
+        cell = func.left(Asset.geohash, literal_column(str(precision))).label("cell")
+        count = func.count().label("count")
+        result = await db.execute(
+            select(
+                cell,
+                count,
+                func.avg(Asset.latitude),
+                func.avg(Asset.longitude),
+                func.max(Asset.id).filter(Asset.thumbnail_path.isnot(None)),
+                func.max(Asset.id),
+            )
+            .where(*conditions)
+            .group_by(cell)
+            .order_by(count.desc(), cell)
+            .limit(limit + 1)
+        )
+        rows = result.all()
+        truncated = len(rows) > limit
+        rows = rows[:limit]
         
-        # AI 搜索逻辑
-        if request.query and request.ai_search:
-            # 1. 生成查询向量
-            query_vector = await gemini_service.generate_query_embedding(request.query)
-            
-            # 2. 从向量库检索候选 ID (检索范围可以稍微大一些以便后续过滤)
-            vector_results = await vector_service.search_similar(
-                vector=query_vector,
-                limit=request.page_size * 5, # 扩大候选集以应对后续过滤
-                score_threshold=0.65, # 相似度阈值过滤
+        representative = [thumb_id or any_id for _, _, _, _, thumb_id, any_id in rows]
+        thumbnails = {}
+        if representative:
+            thumb_result = await db.execute(
+                select(Asset.id, Asset.thumbnail_path).where(Asset.id.in_(representative))
             )
-            
-            if not vector_results:
-                return [], 0
-            
-            asset_ids = [r["asset_id"] for r in vector_results]
-            id_to_score = {r["asset_id"]: r["score"] for r in vector_results}
-            
-            # 3. 在已有过滤条件的基础上增加 ID 过滤
-            query = query.where(Asset.id.in_(asset_ids))
-            
-            # 4. 执行查询
-            result = await db.execute(query)
-            assets = result.scalars().all()
-            
-            # 5. 按向量相似度重新排序 (DB 的 in_ 不保证顺序)
-            assets = sorted(assets, key=lambda a: id_to_score.get(a.id, 0), reverse=True)
-            
-            # 6. 更新总数 (向量搜索时的总数受限于候选集)
-            total = len(assets)
-        else:
-            # 常规搜索：增加排序与分页
-            order_column = getattr(Asset, request.sort_by, Asset.created_at)
-            if request.sort_order == "desc":
-                query = query.order_by(order_column.desc())
-            else:
-                query = query.order_by(order_column.asc())
-            
-            # 分页
-            offset = (request.page - 1) * request.page_size
-            query = query.offset(offset).limit(request.page_size)
-            
-            result = await db.execute(query)
-            assets = result.scalars().all()
+            thumbnails = {asset_id: path for asset_id, path in thumb_result.all()}
         
-        return assets, total
+        clusters = [
+            {
+                "geohash": cell_hash,
+                "count": cell_count,
+                "latitude": float(lat),
+                "longitude": float(lon),
+                "asset_id": asset_id,
+                "thumbnail_url": (
+                    storage_service.get_public_url(thumbnails[asset_id]) if thumbnails.get(asset_id) else None
+                ),
+            }
+            for (cell_hash, cell_count, lat, lon, _, _), asset_id in zip(rows, representative)
+        ]
+        return {
+            "precision": precision,
+            "total": sum(c["count"] for c in clusters),
+            "truncated": truncated,
+            "clusters": clusters,
+        }
     
     async def get_similar_assets(
         self,
@@ -525,7 +1059,7 @@ class AssetService:
         Returns:
             [(资产, 相似度), ...]
         """
-        vector_results = await vector_service.search_by_asset_id(asset_id, limit)
+        vector_results = await vector_service.search_by_asset_id(asset_id, limit, user_id=user_id)
         
         if not vector_results:
             return []
@@ -557,11 +1091,16 @@ class AssetService:
             asset: 资产对象
             commit: 是否立即提交事务
         """
-        # 1. 删除文件
-        if asset.file_path:
-            await storage_service.delete_file(asset.file_path)
+        # 1. 释放文件引用（共享内容仅在无其他资产/版本引用时删除）
+        result = await db.execute(
+            select(AssetVersion.file_path).where(AssetVersion.asset_id == asset.id)
+        )
+        file_paths = [asset.file_path, *result.scalars().all()]
+        await db.delete(asset)
+        for file_path in file_paths:
+            await blob_service.release_and_delete(db, file_path)
         if asset.thumbnail_path:
-            await storage_service.delete_file(asset.thumbnail_path)
+            delete_after_commit(db, asset.thumbnail_path)
             
         # 2. 删除向量
         if asset.vector_id:
@@ -570,8 +1109,7 @@ class AssetService:
             except Exception as e:
                 print(f"向量删除失败: {e}")
                 
-        # 3. 删除数据库记录
-        await db.delete(asset)
+        # 3. 提交删除
         if commit:
             await db.commit()
 
@@ -0,0 +1,238 @@
+"""
+内容寻址存储服务
+
+文件按 SHA-256 存放在 blobs/ab/cd/<hash>，相同内容只保存一份。
+资产 (assets.file_path) 与资产版本 (asset_versions.file_path) 每引用一次
+blob 计一次引用。
+
+引用计数与调用方的资产记录在同一事务中修改，本服务不自行提交（touch_existing、
+abandon 除外）。并发约定：
+- 增减引用都通过 UPDATE / INSERT ... ON CONFLICT 修改 blob 行，持有行锁直到事务结束
+- 引用归零时只保留计数为 0 的记录，不在事务内删除对象；由 Worker 清理任务在宽限期
+  (BLOB_GC_GRACE_HOURS) 后锁定记录 (FOR UPDATE SKIP LOCKED)、删除对象和记录
+- 首个持有者（加锁后计数等于本次增加的引用数）负责确认对象存在，缺失时上传，
+  因此复用刚被清理的记录也不会指向已删除的对象
+"""
+from datetime import datetime
+from typing import Optional, List, BinaryIO, Iterable
+
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import Asset, AssetVersion, Blob
+from src.models.database import delete_after_commit
+from src.services.storage import storage_service, calculate_file_hash
+
+BLOB_PREFIX = "blobs/"
+
+
+def blob_path(file_hash: str) -> str:
+    """按哈希前缀分片的对象存储路径"""
+    return f"{BLOB_PREFIX}{file_hash[:2]}/{file_hash[2:4]}/{file_hash}"
+
+
+def is_blob_path(file_path: Optional[str]) -> bool:
+    return bool(file_path) and file_path.startswith(BLOB_PREFIX)
+
+
+class BlobService:
+    """内容寻址存储服务"""
+
+    async def touch_existing(self, db: AsyncSession, file_hashes: Iterable[str]) -> set:
+        """
+        批量查询仍被引用的 blob 哈希，供上传前跳过已存储的内容（用于批量导入）
+
+        引用已归零的记录（对象可能正在被清理）视为不存在，由调用方重新上传；
+        同时刷新这些记录的 updated_at 并立即提交，使其在宽限期内不会被清理，
+        正在进行的清理则先完成（行锁），之后的上传不会被删除。
+        """
+        file_hashes = set(file_hashes)
+        if not file_hashes:
+            return set()
+        touched = await db.execute(
+            update(Blob)
+            .where(Blob.hash.in_(file_hashes), Blob.ref_count <= 0)
+            .values(updated_at=datetime.utcnow())
+        )
+        if touched.rowcount:
+            await db.commit()
+        result = await db.execute(
+            select(Blob.hash).where(Blob.hash.in_(file_hashes), Blob.ref_count > 0)
+        )
+        return set(result.scalars().all())
+
+    async def _acquire(
+        self,
+        db: AsyncSession,
+        file_hash: str,
+        file_size: int,
+        mime_type: str,
+        refs: int = 1,
+    ) -> Blob:
+        """登记 blob 并增加引用计数（已存在则只加计数），持有行锁直到事务结束"""
+        stmt = pg_insert(Blob).values(
+            hash=file_hash,
+            file_path=blob_path(file_hash),
+            file_size=file_size,
+            mime_type=mime_type,
+            ref_count=refs,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Blob.hash],
+            set_={"ref_count": Blob.ref_count + refs, "updated_at": datetime.utcnow()},
+        ).returning(Blob)
+        result = await db.execute(stmt, execution_options={"populate_existing": True})
+        return result.scalar_one()
+
+    async def _needs_object(self, blob: Blob, refs: int) -> bool:
+        """首个持有者确认对象是否缺失（新记录，或复用了引用归零、对象可能已清理的记录）"""
+        return blob.ref_count == refs and not await storage_service.file_exists(blob.file_path)
+
+    async def store_bytes(
+        self,
+        db: AsyncSession,
+        data: bytes,
+        mime_type: str,
+        file_hash: Optional[str] = None,
+        refs: int = 1,
+    ) -> Blob:
+        """
+        保存字节数据并增加引用
+
+        Args:
+            db: 数据库会话
+            data: 文件数据
+            mime_type: MIME 类型
+            file_hash: 已计算的哈希（可选）
+            refs: 增加的引用数（例如同时被资产和版本引用时为 2）
+        """
+        file_hash = file_hash or calculate_file_hash(data)
+        blob = await self._acquire(db, file_hash, len(data), mime_type, refs)
+        if await self._needs_object(blob, refs):
+            await storage_service.upload_bytes(data, blob.file_path, mime_type)
+        return blob
+
+    async def store_fileobj(
+        self,
+        db: AsyncSession,
+        file_obj: BinaryIO,
+        file_hash: str,
+        file_size: int,
+        mime_type: str,
+    ) -> Blob:
+        """保存已计算哈希的文件对象并增加引用（内容已存在时不上传）"""
+        blob = await self._acquire(db, file_hash, file_size, mime_type)
+        if await self._needs_object(blob, 1):
+            await storage_service.upload_file(file_obj, blob.file_path, mime_type)
+        return blob
+
+    async def promote(
+        self,
+        db: AsyncSession,
+        temp_path: str,
+        file_hash: str,
+        file_size: int,
+        mime_type: str,
+    ) -> Blob:
+        """
+        将临时路径下的对象转为 blob（用于流式上传/分片上传，上传完成才知道哈希）
+
+        内容已存在时直接丢弃临时对象，否则在服务端复制到 blob 路径。
+        临时对象在事务提交后才删除，提交失败时调用方可以重试。
+        """
+        blob = await self._acquire(db, file_hash, file_size, mime_type)
+        if await self._needs_object(blob, 1):
+            await storage_service.copy_file(temp_path, blob.file_path)
+        delete_after_commit(db, temp_path)
+        return blob
+
+    async def acquire_many(self, db: AsyncSession, files: List[tuple]) -> None:
+        """
+        批量增加引用（对象已由调用方上传，已存储的内容须经 touch_existing 确认）
+
+        Args:
+            files: (file_hash, file_size, mime_type) 列表，同一哈希可重复出现
+        """
+        refs = {}
+        for file_hash, file_size, mime_type in files:
+            count = refs.get(file_hash, (file_size, mime_type, 0))[2]
+            refs[file_hash] = (file_size, mime_type, count + 1)
+        for file_hash, (file_size, mime_type, count) in refs.items():
+            await self._acquire(db, file_hash, file_size, mime_type, count)
+
+    async def add_ref(self, db: AsyncSession, file_path: str) -> None:
+        """为已存在的 blob 增加一次引用（例如新版本/副本复用原文件）"""
+        if is_blob_path(file_path):
+            await db.execute(
+                update(Blob)
+                .where(Blob.file_path == file_path)
+                .values(ref_count=Blob.ref_count + 1)
+            )
+
+    async def release(self, db: AsyncSession, file_path: Optional[str]) -> bool:
+        """
+        释放一次引用
+
+        对 blob 路径递减计数（归零后记录保留，由清理任务删除）；对历史遗留的
+        assets/ 路径，检查是否仍被其他资产或版本引用。
+
+        Returns:
+            物理文件是否已无引用
+        """
+        if not file_path:
+            return False
+
+        if is_blob_path(file_path):
+            result = await db.execute(
+                update(Blob)
+                .where(Blob.file_path == file_path)
+                .values(ref_count=Blob.ref_count - 1, updated_at=datetime.utcnow())
+                .returning(Blob.ref_count)
+            )
+            remaining = result.scalar_one_or_none()
+            return remaining is not None and remaining <= 0
+
+        # 遗留路径：调用方应先删除/更新当前引用行再调用
+        await db.flush()
+        asset_refs = await db.scalar(
+            select(func.count(Asset.id)).where(Asset.file_path == file_path)
+        )
+        version_refs = await db.scalar(
+            select(func.count(AssetVersion.id)).where(AssetVersion.file_path == file_path)
+        )
+        return not asset_refs and not version_refs
+
+    async def release_and_delete(self, db: AsyncSession, file_path: Optional[str]) -> bool:
+        """
+        释放引用，无引用时删除物理文件
+
+        blob 对象由清理任务在宽限期后删除；遗留路径在事务提交后删除。
+        """
+        if not await self.release(db, file_path):
+            return False
+        if not is_blob_path(file_path):
+            delete_after_commit(db, file_path)
+        return True
+
+    async def abandon(self, db: AsyncSession, file_hash: str, file_size: int, mime_type: str) -> None:
+        """
+        登记已上传但未能入库的对象（用于入库失败后的清理）
+
+        不直接删除：其他请求可能刚上传了相同内容、尚未提交引用。
+        没有记录时写入计数为 0 的记录并提交，由清理任务在宽限期后删除。
+        """
+        await db.execute(
+            pg_insert(Blob).values(
+                hash=file_hash,
+                file_path=blob_path(file_hash),
+                file_size=file_size,
+                mime_type=mime_type,
+                ref_count=0,
+            ).on_conflict_do_nothing(index_elements=[Blob.hash])
+        )
+        await db.commit()
+
+
+# 单例
+blob_service = BlobService()
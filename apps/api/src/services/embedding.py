@@ -0,0 +1,215 @@
+"""
+资产向量索引服务
+
+将资产的标题/描述/标签/OCR/文件名拼接为嵌入文本，按批生成向量，
+每批一次 Qdrant 写入、一次数据库提交。
+
+嵌入文本连同模型、维度一起取哈希：资产的 embedding_hash 未变化时跳过，
+相同文本的向量从 embedding_cache 表复用，只有新文本才调用嵌入接口。
+"""
+import hashlib
+from typing import List, Dict, Any, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import Asset, AssetStatus, EmbeddingCache
+from src.services.gemini import gemini_service, EMBEDDING_MODEL
+from src.services.vector import vector_service
+
+
+def embedding_text(asset: Asset) -> str:
+    """资产的向量嵌入输入文本"""
+    return " ".join([
+        asset.title or "",
+        asset.description or "",
+        " ".join(asset.tags or []),
+        asset.ocr_text or "",
+        asset.original_filename,
+    ])
+
+
+def embedding_model_tag() -> str:
+    """当前嵌入模型与维度（变化时全部缓存失效）"""
+    return f"{EMBEDDING_MODEL}@{settings.embedding_dimension}"
+
+
+def embedding_key(text: str) -> str:
+    """嵌入缓存键：模型 + 维度 + 文本的 SHA-256"""
+    return hashlib.sha256(f"{embedding_model_tag()}\n{text}".encode("utf-8")).hexdigest()
+
+
+def vector_payload(asset: Asset) -> Dict[str, Any]:
+    """写入 Qdrant 的资产元数据（包含检索时使用的租户与可见性过滤字段）"""
+    return {
+        "title": asset.title,
+        "tags": asset.tags,
+        "asset_type": asset.asset_type.value,
+        "folder_id": asset.folder_id,
+        "user_id": asset.user_id,
+        "is_private": bool(asset.is_private),
+        "deleted": asset.deleted_at is not None,
+        "status": asset.status.value,
+    }
+
+
+class EmbeddingService:
+    """资产向量索引服务"""
+
+    async def _cached_vectors(self, db: AsyncSession, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """批量查询缓存的向量（单次查询）"""
+        keys = set(keys)
+        if not keys:
+            return {}
+        result = await db.execute(
+            select(EmbeddingCache.hash, EmbeddingCache.vector).where(EmbeddingCache.hash.in_(keys))
+        )
+        return {key: vector for key, vector in result.all()}
+
+    async def _embed(self, db: AsyncSession, texts: Dict[str, str]) -> Dict[str, List[float]]:
+        """
+        获取文本向量：先查缓存，未命中的文本批量生成并写入缓存
+
+        Args:
+            texts: 缓存键 → 文本（相同文本只生成一次）
+
+        Returns:
+            缓存键 → 向量（生成失败的文本不包含在内）
+        """
+        vectors = await self._cached_vectors(db, texts.keys())
+        missing = [key for key in texts if key not in vectors]
+        if not missing:
+            return vectors
+
+        generated = await gemini_service.generate_embeddings([texts[key] for key in missing])
+        rows = []
+        for key, vector in zip(missing, generated):
+            # 零向量表示生成失败，不缓存
+            if any(vector):
+                vectors[key] = vector
+                rows.append({"hash": key, "model": embedding_model_tag(), "vector": vector})
+        if rows:
+            await db.execute(pg_insert(EmbeddingCache).values(rows).on_conflict_do_nothing())
+        return vectors
+
+    async def index_assets(
+        self,
+        db: AsyncSession,
+        assets: List[Asset],
+        force: bool = False,
+        sync_unchanged: bool = False,
+    ) -> int:
+        """
+        为一批资产生成并写入向量
+
+        嵌入文本未变化且已有向量的资产直接跳过（force 时仍重新写入 Qdrant，
+        向量取自缓存）。生成失败的资产保留原向量不变。新向量写入并提交后再删除
+        被替换的历史向量，避免提交失败时资产指向已删除的向量。
+
+        Args:
+            db: 数据库会话
+            assets: 资产列表
+            force: 忽略 embedding_hash，重新写入全部资产的向量
+            sync_unchanged: 对跳过的资产仍更新向量元数据（不重新生成向量）
+
+        Returns:
+            写入向量的资产数
+        """
+        pending, unchanged = [], []
+        for asset in assets:
+            text = embedding_text(asset)
+            if not text.strip():
+                continue
+            key = embedding_key(text)
+            if not force and asset.vector_id and asset.embedding_hash == key:
+                unchanged.append(asset)
+                continue
+            pending.append((asset, key, text))
+
+        if sync_unchanged and unchanged:
+            await vector_service.set_payloads([(a.vector_id, vector_payload(a)) for a in unchanged])
+        if not pending:
+            return 0
+
+        vectors = await self._embed(db, {key: text for _, key, text in pending})
+
+        indexed, items = [], []
+        for asset, key, _ in pending:
+            vector = vectors.get(key)
+            if vector is None:
+                continue
+            indexed.append((asset, key))
+            items.append((asset.id, list(vector), vector_payload(asset)))
+
+        vector_ids = await vector_service.upsert_vectors(items)
+        # 向量 ID 由资产 ID 决定，只有历史遗留的随机 ID 需要删除
+        stale = [
+            asset.vector_id
+            for (asset, _), vector_id in zip(indexed, vector_ids)
+            if asset.vector_id and asset.vector_id != vector_id
+        ]
+        for (asset, key), vector_id in zip(indexed, vector_ids):
+            asset.vector_id = vector_id
+            asset.embedding_hash = key
+        await db.commit()
+
+        try:
+            await vector_service.delete_vectors(stale)
+        except Exception as e:
+            print(f"旧向量删除失败 ({len(stale)} 个): {e}")
+
+        return len(indexed)
+
+    async def backfill_payloads(self, db: AsyncSession, batch_size: int = 256) -> int:
+        """
+        为缺少检索过滤字段的历史向量补写元数据（启动时执行，幂等）
+
+        检索按 user_id / is_private / deleted / status 过滤，早于这些字段写入的向量
+        在回填前不会出现在语义检索结果中。资产已不存在的向量留给向量清理任务删除。
+
+        Returns:
+            更新的向量数
+        """
+        updated, offset = 0, None
+        while True:
+            points, offset = await vector_service.scroll_missing_field("user_id", batch_size, offset)
+            asset_ids = {asset_id for _, asset_id in points if asset_id is not None}
+            if asset_ids:
+                result = await db.execute(select(Asset).where(Asset.id.in_(asset_ids)))
+                assets = {asset.id: asset for asset in result.scalars().all()}
+                items = [
+                    (vector_id, vector_payload(assets[asset_id]))
+                    for vector_id, asset_id in points
+                    if asset_id in assets
+                ]
+                await vector_service.set_payloads(items)
+                updated += len(items)
+            if offset is None:
+                return updated
+
+    async def sync_assets(self, db: AsyncSession, assets: List[Asset]):
+        """
+        资产可见性变化后（回收站、保险库、恢复）同步向量元数据
+
+        已被清理任务删除向量的资产（vector_id 为空）重新写入向量，
+        文本未变化时向量直接取自缓存，不调用嵌入接口。
+        同步失败只记录日志，不影响调用方的操作结果。
+        """
+        try:
+            await vector_service.set_payloads(
+                [(a.vector_id, vector_payload(a)) for a in assets if a.vector_id]
+            )
+            missing = [
+                a for a in assets
+                if not a.vector_id and a.status == AssetStatus.READY and a.deleted_at is None
+            ]
+            if missing:
+                await self.index_assets(db, missing)
+        except Exception as e:
+            print(f"向量元数据同步失败: {e}")
+
+
+# 单例
+embedding_service = EmbeddingService()
@@ -0,0 +1,159 @@
+"""
+文件夹路径解析服务
+
+批量将文件夹路径解析为 ID：缺失的文件夹（含所有上级）通过一次
+INSERT ... ON CONFLICT (user_id, path) 创建，结果写入进程内按用户划分的
+路径 → ID 缓存。文件夹被修改或删除时（ORM 事件）清除对应用户的缓存。
+"""
+from collections import OrderedDict
+from typing import Optional, Dict, Iterable, List
+
+from sqlalchemy import select, update, event, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.config import settings
+from src.models import Folder
+
+
+def normalize_folder_path(path: Optional[str]) -> str:
+    """规范化文件夹路径（去除首尾及重复的 /）"""
+    return "/".join(part for part in (path or "").split("/") if part)
+
+
+def expand_folder_paths(paths: Iterable[str]) -> List[str]:
+    """展开为包含全部上级目录的路径列表（按层级排序）"""
+    expanded = set()
+    for path in paths:
+        parts = normalize_folder_path(path).split("/")
+        for depth in range(1, len(parts) + 1):
+            if parts[depth - 1]:
+                expanded.add("/".join(parts[:depth]))
+    return sorted(expanded, key=lambda p: (p.count("/"), p))
+
+
+class FolderCache:
+    """按用户划分的文件夹路径 → ID 缓存（LRU 淘汰用户）"""
+
+    def __init__(self, max_users: int = 256, max_paths: int = 10000):
+        self.max_users = max_users
+        self.max_paths = max_paths
+        self._users: "OrderedDict[int, Dict[str, int]]" = OrderedDict()
+
+    def get_many(self, user_id: int, paths: Iterable[str]) -> Dict[str, int]:
+        cached = self._users.get(user_id)
+        if cached is None:
+            return {}
+        self._users.move_to_end(user_id)
+        return {path: cached[path] for path in paths if path in cached}
+
+    def set_many(self, user_id: int, mapping: Dict[str, int]):
+        cached = self._users.setdefault(user_id, {})
+        if len(cached) + len(mapping) > self.max_paths:
+            cached.clear()
+        cached.update(mapping)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int] = None):
+        if user_id is None:
+            self._users.clear()
+        else:
+            self._users.pop(user_id, None)
+
+
+class FolderService:
+    """文件夹服务"""
+
+    def __init__(self):
+        self.cache = FolderCache(max_paths=settings.folder_cache_size)
+
+    async def _select_ids(self, db: AsyncSession, user_id: int, paths: List[str]) -> Dict[str, int]:
+        result = await db.execute(
+            select(Folder.path, Folder.id).where(Folder.user_id == user_id, Folder.path.in_(paths))
+        )
+        return {path: folder_id for path, folder_id in result.all()}
+
+    async def resolve_folders(
+        self,
+        db: AsyncSession,
+        paths: Iterable[str],
+        user_id: int,
+    ) -> Dict[str, int]:
+        """
+        批量解析（并按需创建）文件夹路径
+
+        Args:
+            db: 数据库会话
+            paths: 文件夹路径（可重复，可含前后 /）
+            user_id: 所有者 ID
+
+        Returns:
+            规范化路径 → 文件夹 ID（包含所有上级目录）
+
+        新建的文件夹只写入当前事务，提交由调用方负责。
+        """
+        wanted = expand_folder_paths(p for p in paths if normalize_folder_path(p))
+        if not wanted:
+            return {}
+
+        ids = self.cache.get_many(user_id, wanted)
+        missing = [p for p in wanted if p not in ids]
+        if not missing:
+            return ids
+
+        found = await self._select_ids(db, user_id, missing)
+        ids.update(found)
+        missing = [p for p in missing if p not in found]
+        # 只缓存已存在的文件夹；本事务新建的 ID 可能随回滚失效
+        self.cache.set_many(user_id, ids)
+
+        if missing:
+            # 一次插入全部缺失的文件夹，并发创建的同路径由唯一约束去重
+            await db.execute(
+                pg_insert(Folder)
+                .values([
+                    {"name": path.rsplit("/", 1)[-1], "path": path, "user_id": user_id, "parent_id": None}
+                    for path in missing
+                ])
+                .on_conflict_do_nothing(index_elements=[Folder.user_id, Folder.path])
+            )
+            # 一次更新回填 parent_id（按路径前缀匹配上级目录）
+            parent = aliased(Folder)
+            await db.execute(
+                update(Folder)
+                .where(
+                    Folder.user_id == user_id,
+                    Folder.path.in_([p for p in missing if "/" in p]),
+                    Folder.parent_id.is_(None),
+                    parent.user_id == user_id,
+                    parent.path == func.substring(Folder.path, r"^(.*)/[^/]+$"),
+                )
+                .values(parent_id=parent.id)
+                .execution_options(synchronize_session=False)
+            )
+            await db.flush()
+            ids.update(await self._select_ids(db, user_id, missing))
+
+        return ids
+
+    async def resolve_folder(self, db: AsyncSession, path: str, user_id: int) -> Optional[int]:
+        """解析单个文件夹路径，返回文件夹 ID"""
+        path = normalize_folder_path(path)
+        if not path:
+            return None
+        ids = await self.resolve_folders(db, [path], user_id)
+        return ids.get(path)
+
+
+# 单例
+folder_service = FolderService()
+
+
+@event.listens_for(Folder, "after_update")
+@event.listens_for(Folder, "after_delete")
+def _invalidate_folder_cache(mapper, connection, target: Folder):
+    """文件夹被修改/删除时清除该用户的路径缓存"""
+    folder_service.cache.invalidate(target.user_id)
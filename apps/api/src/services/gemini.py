@@ -1,12 +1,60 @@
 """
 Gemini AI 服务
+
+google-genai 客户端是同步的，所有远程调用都经由 GeminiService._call 在线程池中执行，
+不阻塞事件循环；同时受进程级并发上限与令牌桶限速约束，429/5xx 按抖动退避重试。
 """
+import asyncio
 import json
 import base64
-from typing import List, Dict, Any, Optional
+import random
+import time
+from functools import partial
+from typing import List, Dict, Any, Optional, Callable
 import numpy as np
+import httpx
+from fastapi.concurrency import run_in_threadpool
 
 from src.config import settings
+from src.services.query_cache import query_embedding_cache
+
+# 向量嵌入模型
+EMBEDDING_MODEL = "gemini-embedding-001"
+# 单次 embed_content 请求最多包含的文本数
+EMBED_BATCH_LIMIT = 100
+
+
+class TokenBucket:
+    """令牌桶限速器（按每分钟请求数匀速补充，允许 capacity 个突发请求）"""
+
+    def __init__(self, rate_per_minute: float, capacity: int):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """获取一个令牌，令牌不足时等待（rate 为 0 表示不限速）"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """限流 (429)、服务端错误 (5xx) 与网络错误可重试"""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    return isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError))
 
 
 class GeminiService:
@@ -15,6 +63,8 @@ class GeminiService:
     def __init__(self):
         self.api_key = settings.gemini_api_key
         self._client = None
+        self.semaphore = asyncio.Semaphore(settings.gemini_concurrency)
+        self.rate_limiter = TokenBucket(settings.gemini_requests_per_minute, settings.gemini_concurrency)
     
     @property
     def client(self):
@@ -30,6 +80,31 @@ class GeminiService:
                 return None
         return self._client
     
+    async def _call(self, func: Callable, *args, **kwargs):
+        """
+        执行同步 SDK 调用
+        
+        - 在线程池中执行，不阻塞事件循环
+        - 进程内同时进行的调用不超过 GEMINI_CONCURRENCY
+        - 按 GEMINI_REQUESTS_PER_MINUTE 限速
+        - 429/5xx/网络错误按指数退避 (带随机抖动) 重试
+        """
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            async with self.semaphore:
+                try:
+                    return await run_in_threadpool(partial(func, *args, **kwargs))
+                except Exception as e:
+                    if attempt >= settings.gemini_max_retries or not is_retryable_error(e):
+                        raise
+                    error = e
+            delay = min(settings.gemini_retry_backoff * 2 ** attempt, settings.gemini_retry_backoff_max)
+            delay *= random.uniform(0.5, 1.5)
+            attempt += 1
+            print(f"Gemini 调用失败，{delay:.1f} 秒后重试 ({attempt}/{settings.gemini_max_retries}): {error}")
+            await asyncio.sleep(delay)
+    
     async def analyze_image(self, image_data: bytes, mime_type: str = "image/jpeg") -> Dict[str, Any]:
         """
         分析图片，生成标题、描述、标签
@@ -65,7 +140,8 @@ class GeminiService:
 4. 只返回 JSON，不要其他内容"""
         
         try:
-            response = self.client.models.generate_content(
+            response = await self._call(
+                self.client.models.generate_content,
                 model="gemini-2.5-flash",
                 contents=[
                     types.Content(
@@ -135,9 +211,10 @@ class GeminiService:
 
         try:
             # 上传视频文件
-            video_file = self.client.files.upload(file=video_path)
+            video_file = await self._call(self.client.files.upload, file=video_path)
             
-            response = self.client.models.generate_content(
+            response = await self._call(
+                self.client.models.generate_content,
                 model="gemini-2.5-flash",
                 contents=[video_file, prompt]
             )
@@ -162,37 +239,66 @@ class GeminiService:
                 "transcript": ""
             }
     
-    async def generate_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
+    async def _embed_batch(self, texts: List[str], task_type: str) -> np.ndarray:
+        """单次 embed_content 调用生成一批向量，返回归一化后的矩阵"""
+        from google.genai import types
+        
+        result = await self._call(
+            self.client.models.embed_content,
+            model=EMBEDDING_MODEL,
+            contents=texts,
+            config=types.EmbedContentConfig(
+                output_dimensionality=settings.embedding_dimension,
+                task_type=task_type,
+            ),
+        )
+        matrix = np.array([e.values for e in result.embeddings], dtype=np.float32)
+        # 按行归一化（一次向量化运算）
+        return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+    
+    async def generate_embeddings(
+        self,
+        texts: List[str],
+        task_type: str = "RETRIEVAL_DOCUMENT",
+    ) -> List[List[float]]:
         """
-        生成文本向量嵌入
+        批量生成文本向量嵌入
+        
+        每 EMBED_BATCH_LIMIT 条文本合并为一次请求；某一批失败时该批返回零向量，
+        与 generate_embedding 的失败约定一致。
+        
+        Returns:
+            与 texts 一一对应的向量
         """
+        if not texts:
+            return []
         if not self.client:
-            return [0.0] * settings.embedding_dimension
-
-        from google.genai import types
+            return [[0.0] * settings.embedding_dimension for _ in texts]
         
-        try:
-            result = self.client.models.embed_content(
-                model="gemini-embedding-001",
-                contents=text,
-                config=types.EmbedContentConfig(
-                    output_dimensionality=settings.embedding_dimension,
-                    task_type=task_type,
-                ),
-            )
-            
-            vec = np.array(result.embeddings[0].values, dtype=np.float32)
-            # 归一化
-            vec = vec / (np.linalg.norm(vec) + 1e-12)
-            return vec.tolist()
-            
-        except Exception as e:
-            print(f"Gemini 嵌入生成失败: {e}")
-            return [0.0] * settings.embedding_dimension
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), EMBED_BATCH_LIMIT):
+            chunk = texts[start:start + EMBED_BATCH_LIMIT]
+            try:
+                vectors.extend((await self._embed_batch(chunk, task_type)).tolist())
+            except Exception as e:
+                print(f"Gemini 批量嵌入生成失败 ({len(chunk)} 条): {e}")
+                vectors.extend([0.0] * settings.embedding_dimension for _ in chunk)
+        return vectors
+    
+    async def generate_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
+        """
+        生成文本向量嵌入
+        """
+        return (await self.generate_embeddings([text], task_type))[0]
     
     async def generate_query_embedding(self, query: str) -> List[float]:
-        """生成查询向量"""
-        return await self.generate_embedding(query, task_type="RETRIEVAL_QUERY")
+        """生成查询向量（经查询向量缓存，重复查询与翻页不再调用接口）"""
+        return await query_embedding_cache.get_or_create(
+            query,
+            "RETRIEVAL_QUERY",
+            EMBEDDING_MODEL,
+            lambda: self.generate_embedding(query, task_type="RETRIEVAL_QUERY"),
+        )
     
     async def suggest_albums(
         self,
@@ -233,9 +339,10 @@ class GeminiService:
 5. 只返回 JSON，不要其他内容"""
 
         try:
-            response = self.client.models.generate_content(
+            response = await self._call(
+                self.client.models.generate_content,
                 model="gemini-2.5-flash",
-                contents=prompt
+                contents=prompt,
             )
             
             text = response.text.strip()
@@ -278,9 +385,10 @@ class GeminiService:
 只返回 JSON，不要其他内容"""
 
         try:
-            response = self.client.models.generate_content(
+            response = await self._call(
+                self.client.models.generate_content,
                 model="gemini-2.5-flash",
-                contents=prompt
+                contents=prompt,
             )
             
             text = response.text.strip()
@@ -356,7 +464,7 @@ class GeminiService:
             )
 
             # 发送当前消息
-            response = chat.send_message(messages[-1]["content"])
+            response = await self._call(chat.send_message, messages[-1]["content"])
             
             # 处理工具调用循环
             all_tool_results = []
@@ -389,7 +497,7 @@ class GeminiService:
                         ))
                 
                 # 将工具结果发送回模型获取最终回复
-                response = chat.send_message(tool_results)
+                response = await self._call(chat.send_message, tool_results)
 
             # 获取最终文本响应
             final_text = response.text if response.text else ""
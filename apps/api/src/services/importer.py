@@ -0,0 +1,192 @@
+"""
+服务端批量导入服务
+
+扫描挂载的本地目录或已有的 S3 存储桶前缀，按批次送入导入流水线 (IngestService)：
+- 文件在并发上限内才打开/下载，内存占用只与批次大小相关
+- 已导入过的内容按哈希跳过，目录结构映射为文件夹
+- 每批入库后更新 tasks 表中的进度与计数，任务重试时已导入的文件会被跳过
+"""
+import os
+from dataclasses import dataclass
+from functools import partial
+from typing import Optional, List, Callable, Awaitable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import Task
+from src.services.storage import storage_service
+from src.services.asset import SUPPORTED_EXTENSIONS
+from src.services.ingest import ingest_service, IngestItem, split_upload_path
+from src.services.folder import normalize_folder_path
+
+S3_SCHEME = "s3://"
+
+# 任务结果中最多保留的失败明细条数
+MAX_REPORTED_ERRORS = 20
+
+
+@dataclass
+class ImportSource:
+    """解析后的导入来源"""
+    kind: str  # local / s3
+    root: str  # 本地目录或对象前缀
+    bucket: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        """来源目录名，作为默认的目标文件夹"""
+        return os.path.basename(self.root.rstrip("/")) or (self.bucket or "")
+
+
+def parse_import_source(path: str) -> ImportSource:
+    """
+    解析导入路径
+
+    - s3://bucket/prefix: 使用当前存储配置访问的存储桶前缀
+    - 本地绝对路径: 必须位于 IMPORT_ROOTS 配置的目录之内
+
+    Raises:
+        ValueError: 路径无效或不允许访问
+    """
+    path = (path or "").strip()
+    if not path:
+        raise ValueError("请指定导入路径")
+
+    if path.startswith(S3_SCHEME):
+        bucket, _, prefix = path[len(S3_SCHEME):].partition("/")
+        if not bucket:
+            raise ValueError("S3 路径缺少存储桶名称")
+        return ImportSource(kind="s3", root=prefix, bucket=bucket)
+
+    root = os.path.realpath(path)
+    allowed = [os.path.realpath(r.strip()) for r in settings.import_roots.split(",") if r.strip()]
+    if not any(root == a or root.startswith(a + os.sep) for a in allowed):
+        raise ValueError("导入目录不在允许的范围内 (IMPORT_ROOTS)")
+    if not os.path.isdir(root):
+        raise ValueError(f"导入目录不存在: {path}")
+    return ImportSource(kind="local", root=root)
+
+
+def is_importable(name: str) -> bool:
+    """跳过隐藏文件和不支持的格式"""
+    return not name.startswith(".") and os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def walk_local(root: str) -> List[str]:
+    """遍历本地目录，返回相对路径列表 (在线程中执行)"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in filenames:
+            full_path = os.path.join(dirpath, name)
+            # 不跟随符号链接，避免读取导入目录之外的文件
+            if is_importable(name) and not os.path.islink(full_path):
+                files.append(os.path.relpath(full_path, root))
+    files.sort()
+    return files
+
+
+class ImportService:
+    """服务端批量导入服务"""
+
+    async def list_files(self, source: ImportSource) -> List[str]:
+        """列出来源下可导入的文件（相对路径）"""
+        if source.kind == "local":
+            return await run_in_threadpool(walk_local, source.root)
+
+        prefix = source.root
+        objects = await storage_service.list_objects(prefix, bucket=source.bucket)
+        files = []
+        for key, _ in objects:
+            relative = key[len(prefix):].lstrip("/")
+            if relative and not key.endswith("/") and is_importable(os.path.basename(relative)):
+                files.append(relative)
+        files.sort()
+        return files
+
+    def _opener(self, source: ImportSource, relative: str) -> Callable:
+        """构造延迟打开文件的函数"""
+        if source.kind == "local":
+            return partial(open, os.path.join(source.root, relative), "rb")
+        key = f"{source.root.rstrip('/')}/{relative}" if source.root else relative
+        return partial(storage_service.download_to_tempfile, key, source.bucket)
+
+    async def _report(self, db: AsyncSession, task: Task, **values):
+        """更新任务进度（直接执行 UPDATE，不依赖会话中任务对象的状态）"""
+        await db.execute(update(Task).where(Task.id == task.id).values(**values))
+        await db.commit()
+
+    async def scan_folder(
+        self,
+        db: AsyncSession,
+        task: Task,
+        on_imported: Optional[Callable[[List[int]], Awaitable[None]]] = None,
+    ) -> dict:
+        """
+        执行 SCAN_FOLDER 任务
+
+        Args:
+            db: 数据库会话
+            task: 任务，params 包含 path 与可选的 folder_path
+            on_imported: 每批导入成功后的回调（接收新资产 ID，用于安排后台处理）
+
+        Returns:
+            导入统计
+        """
+        params = task.params or {}
+        task_id, user_id = task.id, task.user_id
+        source = parse_import_source(params.get("path", ""))
+        target = normalize_folder_path(params.get("folder_path") or source.name)
+
+        files = await self.list_files(source)
+        total = len(files)
+        await self._report(db, task, total_items=total, progress=0)
+
+        stats = {"imported": 0, "skipped": 0, "failed": 0, "errors": []}
+        batch_size = max(settings.import_batch_size, 1)
+
+        for start in range(0, total, batch_size):
+            items = []
+            for relative in files[start:start + batch_size]:
+                filename, folder_path = split_upload_path(relative, target or None)
+                items.append(IngestItem(
+                    file=None,
+                    filename=filename,
+                    folder_path=folder_path,
+                    opener=self._opener(source, relative),
+                ))
+
+            await ingest_service.ingest(db, items, user_id=user_id)
+
+            imported_ids = []
+            for relative, item in zip(files[start:start + batch_size], items):
+                if item.asset:
+                    imported_ids.append(item.asset.id)
+                elif item.duplicate:
+                    stats["skipped"] += 1
+                else:
+                    stats["failed"] += 1
+                    if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                        stats["errors"].append({"path": relative, "error": item.error})
+            stats["imported"] += len(imported_ids)
+
+            done = min(start + batch_size, total)
+            await self._report(
+                db, task,
+                progress=int(done / total * 100),
+                result={**stats, "processed": done},
+            )
+            print(f"导入任务 {task_id}: {done}/{total}")
+
+            if imported_ids and on_imported:
+                await on_imported(imported_ids)
+
+        await db.refresh(task)
+        return {**stats, "processed": total}
+
+
+# 单例
+import_service = ImportService()
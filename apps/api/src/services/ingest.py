@@ -0,0 +1,286 @@
+"""
+批量导入服务
+
+将批量上传拆分为流水线阶段，在文件之间重叠网络上传、CPU 计算和数据库写入：
+1. 并行流式计算哈希 + 格式校验
+2. 单次查询批量去重（已存储的相同内容不再上传）
+3. 并行上传原文件、探测 EXIF、生成缩略图（受并发上限约束）
+4. 一次性解析/创建全部文件夹，一次性提交全部资产记录
+"""
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any, List, BinaryIO, Callable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import Asset, AssetType
+from src.services.storage import storage_service
+from src.services.asset import asset_service, is_duplicate_error, DUPLICATE_ERROR
+from src.services.media import media_service
+from src.services.blob import blob_service, blob_path
+from src.services.folder import folder_service, normalize_folder_path
+
+
+@dataclass
+class IngestItem:
+    """单个待导入文件的流水线状态"""
+    file: Optional[BinaryIO]
+    filename: str
+    folder_path: Optional[str] = None
+    # 延迟打开文件（服务端导入时在并发上限内才打开/下载，用完即关闭）
+    opener: Optional[Callable[[], BinaryIO]] = None
+
+    mime_type: str = ""
+    asset_type: Optional[AssetType] = None
+    file_hash: str = ""
+    file_size: int = 0
+    safe_filename: str = ""
+    file_path: str = ""
+    thumbnail_path: Optional[str] = None
+    width: int = 0
+    height: int = 0
+    exif_data: Dict[str, Any] = field(default_factory=dict)
+
+    blob_exists: bool = False
+    duplicate: bool = False
+
+    asset: Optional[Asset] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def hash_fileobj(file_obj: BinaryIO, chunk_size: int) -> tuple:
+    """分块计算文件对象的 SHA-256 (在线程中执行)"""
+    file_obj.seek(0)
+    hasher = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            break
+        hasher.update(chunk)
+        size += len(chunk)
+    file_obj.seek(0)
+    return hasher.hexdigest(), size
+
+
+def read_fileobj(file_obj: BinaryIO) -> bytes:
+    """读取完整文件内容 (在线程中执行)"""
+    file_obj.seek(0)
+    data = file_obj.read()
+    file_obj.seek(0)
+    return data
+
+
+class IngestService:
+    """批量导入服务"""
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.concurrency = concurrency or settings.ingest_concurrency
+
+    async def _gather_bounded(self, func, items: List[IngestItem]):
+        """在并发上限内对每个文件执行阶段函数，单个失败不影响其他文件"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _run(item: IngestItem):
+            if not item.ok:
+                return
+            async with semaphore:
+                try:
+                    await func(item)
+                except ValueError as e:
+                    item.error = str(e)
+                except Exception as e:
+                    item.error = f"上传失败：{str(e)}"
+
+        await asyncio.gather(*(_run(item) for item in items))
+
+    async def _hash(self, item: IngestItem):
+        """阶段 1: 校验格式并流式计算哈希"""
+        item.mime_type, item.asset_type = asset_service.validate_file_format(item.filename)
+        if item.file is None and item.opener:
+            item.file = await run_in_threadpool(item.opener)
+        item.file_hash, item.file_size = await run_in_threadpool(
+            hash_fileobj, item.file, settings.upload_chunk_size
+        )
+
+    async def _stage(self, item: IngestItem):
+        """阶段 3: 上传原文件（内容已存储时跳过）、探测元数据、生成缩略图"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        item.safe_filename = f"{timestamp}_{item.file_hash[:8]}_{item.filename}"
+        item.file_path = blob_path(item.file_hash)
+
+        file_obj = item.file
+        if not item.blob_exists:
+            await run_in_threadpool(file_obj.seek, 0)
+            # upload_fileobj 会对大文件自动分片，不需要整体读入内存
+            await storage_service.upload_file(file_obj, item.file_path, item.mime_type)
+
+        try:
+            if item.asset_type == AssetType.IMAGE:
+                # 常规尺寸图片读入内存后交给进程池，超大文件在线程中按需读取
+                if item.file_size <= settings.upload_stream_threshold:
+                    source = await run_in_threadpool(read_fileobj, file_obj)
+                else:
+                    await run_in_threadpool(file_obj.seek, 0)
+                    source = file_obj
+                result = await media_service.analyze(source)
+                item.width, item.height = result["width"], result["height"]
+                item.exif_data = result["exif"]
+                thumbnail_data = result["thumbnail"]
+            elif item.asset_type == AssetType.VIDEO:
+                await run_in_threadpool(file_obj.seek, 0)
+                thumbnail_data = await storage_service.generate_video_thumbnail(file_obj)
+            else:
+                thumbnail_data = b""
+
+            if thumbnail_data:
+                item.thumbnail_path = f"thumbnails/{item.safe_filename}.jpg"
+                await storage_service.upload_bytes(thumbnail_data, item.thumbnail_path, "image/jpeg")
+        except Exception as e:
+            # 解析/缩略图失败不影响导入，后台处理阶段会补生成
+            print(f"图片解析失败 ({item.filename}): {e}")
+
+    @staticmethod
+    def _close_opened(items: List[IngestItem]):
+        """关闭由 opener 打开的文件（上传文件由框架负责关闭）"""
+        for item in items:
+            if item.opener and item.file is not None:
+                item.file.close()
+                item.file = None
+
+    async def _discard(self, db: AsyncSession, item: IngestItem):
+        """删除已上传但未能入库的对象"""
+        if item.thumbnail_path:
+            await storage_service.delete_file(item.thumbnail_path)
+        if not item.blob_exists:
+            await blob_service.abandon(db, item.file_hash, item.file_size, item.mime_type)
+
+    def _build(self, item: IngestItem, user_id: int, folder_ids: Dict[str, int]) -> Asset:
+        return asset_service.build_asset_record(
+            filename=item.filename,
+            safe_filename=item.safe_filename,
+            file_path=item.file_path,
+            file_size=item.file_size,
+            file_hash=item.file_hash,
+            mime_type=item.mime_type,
+            asset_type=item.asset_type,
+            user_id=user_id,
+            width=item.width,
+            height=item.height,
+            exif_data=item.exif_data,
+            thumbnail_path=item.thumbnail_path,
+            folder_id=folder_ids.get(normalize_folder_path(item.folder_path)),
+        )
+
+    async def _prepare(self, db: AsyncSession, items: List[IngestItem], user_id: int):
+        """阶段 1-3: 哈希、去重、上传"""
+        # 1. 并行计算哈希
+        await self._gather_bounded(self._hash, items)
+
+        # 2. 批量去重（包含批次内部重复）
+        hashed = [item for item in items if item.ok]
+        hashes = [item.file_hash for item in hashed]
+        existing = await asset_service.find_existing_hashes(db, hashes, user_id)
+        seen = set(existing)
+        for item in hashed:
+            if item.file_hash in seen:
+                item.duplicate = True
+                item.error = DUPLICATE_ERROR
+            else:
+                seen.add(item.file_hash)
+
+        # 其他用户已上传过（且仍被引用）的相同内容无需再次传输
+        stored = await blob_service.touch_existing(db, hashes)
+        for item in hashed:
+            item.blob_exists = item.file_hash in stored
+
+        # 3. 并行上传与缩略图生成
+        await self._gather_bounded(self._stage, items)
+
+    async def ingest(
+        self,
+        db: AsyncSession,
+        items: List[IngestItem],
+        user_id: int,
+    ) -> List[IngestItem]:
+        """
+        批量导入文件
+
+        Args:
+            db: 数据库会话
+            items: 待导入文件
+            user_id: 所有者 ID
+
+        Returns:
+            原顺序的导入结果，成功项带有 asset，失败项带有 error
+        """
+        try:
+            await self._prepare(db, items, user_id)
+        finally:
+            await run_in_threadpool(self._close_opened, items)
+
+        staged = [item for item in items if item.ok]
+        if not staged:
+            return items
+
+        try:
+            # 4. 一次性解析全部文件夹路径
+            folder_ids = await folder_service.resolve_folders(
+                db, [item.folder_path for item in staged if item.folder_path], user_id
+            )
+
+            # 5. 批量登记 blob 引用并写入资产，单次提交
+            await blob_service.acquire_many(
+                db, [(item.file_hash, item.file_size, item.mime_type) for item in staged]
+            )
+            for item in staged:
+                item.asset = self._build(item, user_id, folder_ids)
+            db.add_all([item.asset for item in staged])
+            await db.commit()
+        except IntegrityError:
+            # 回退为逐条写入，定位失败项（新建的文件夹随回滚撤销，需逐条重新解析）
+            await db.rollback()
+            for item in staged:
+                folder_ids = await folder_service.resolve_folders(
+                    db, [item.folder_path] if item.folder_path else [], user_id
+                )
+                await blob_service.acquire_many(db, [(item.file_hash, item.file_size, item.mime_type)])
+                item.asset = self._build(item, user_id, folder_ids)
+                db.add(item.asset)
+                try:
+                    await db.commit()
+                except IntegrityError as e:
+                    await db.rollback()
+                    item.asset = None
+                    item.error = DUPLICATE_ERROR if is_duplicate_error(e) else f"上传失败：{str(e.orig)}"
+                    await self._discard(db, item)
+        except Exception:
+            # 其他错误（连接中断等）：整批未入库，清理已上传的缩略图与 blob 后抛出
+            await db.rollback()
+            for item in staged:
+                item.asset = None
+                await self._discard(db, item)
+            raise
+
+        return items
+
+
+def split_upload_path(filename: str, folder_path: Optional[str] = None) -> tuple:
+    """拆分带目录的上传文件名，返回 (文件名, 文件夹路径)"""
+    if "/" not in filename:
+        return filename, folder_path
+    directory, name = filename.rsplit("/", 1)
+    return name, f"{folder_path}/{directory}" if folder_path else directory
+
+
+# 单例
+ingest_service = IngestService()
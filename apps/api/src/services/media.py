@@ -0,0 +1,238 @@
+"""
+图片分析服务
+
+一次解码同时得到尺寸、EXIF、方向和缩略图，避免对同一张图片多次打开/解析。
+LANCZOS 缩放与 HEIF 解码会长时间持有 GIL，因此字节数据在进程池中处理，
+不阻塞事件循环也不与其他请求争抢同一个解释器。
+"""
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional, Dict, Any, BinaryIO, Union
+
+from PIL import Image, ImageOps
+from fastapi.concurrency import run_in_threadpool
+
+from src.config import settings
+
+# 注册 HEIF 支持（进程池子进程导入本模块时同样会注册）
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+# EXIF 标签 ID
+TAG_MAKE = 271
+TAG_MODEL = 272
+TAG_ORIENTATION = 274
+TAG_EXPOSURE_TIME = 33434
+TAG_ISO_SPEED = 34855
+TAG_DATETIME_ORIGINAL = 36867
+TAG_FOCAL_LENGTH = 37386
+IFD_EXIF = 0x8769
+IFD_GPS = 0x8825
+
+# 方向为 5-8 时宽高互换
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def _parse_gps(gps: Dict[int, Any]) -> Dict[str, Any]:
+    """解析 GPS IFD 为十进制经纬度"""
+    lat, lon = gps.get(2), gps.get(4)
+    if not lat or not lon:
+        return {}
+    try:
+        lat_deg = float(lat[0]) + float(lat[1]) / 60 + float(lat[2]) / 3600
+        lon_deg = float(lon[0]) + float(lon[1]) / 60 + float(lon[2]) / 3600
+        if str(gps.get(1, "N")).upper().startswith("S"):
+            lat_deg = -lat_deg
+        if str(gps.get(3, "E")).upper().startswith("W"):
+            lon_deg = -lon_deg
+        return {
+            "location": f"{lat_deg:.6f}, {lon_deg:.6f}",
+            "latitude": lat_deg,
+            "longitude": lon_deg,
+        }
+    except Exception:
+        return {}
+
+
+def _parse_exif(img: Image.Image) -> tuple:
+    """从已打开的图片读取 EXIF，返回 (exif_data, orientation)"""
+    exif = img.getexif()
+    if not exif:
+        return {}, 1
+
+    exif_ifd = exif.get_ifd(IFD_EXIF)
+    exif_data: Dict[str, Any] = {}
+
+    date_str = exif_ifd.get(TAG_DATETIME_ORIGINAL)
+    if date_str:
+        try:
+            exif_data["taken_at"] = datetime.strptime(str(date_str).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+        except ValueError:
+            pass
+
+    if exif.get(TAG_MODEL):
+        exif_data["camera_model"] = str(exif[TAG_MODEL]).strip("\x00 ")
+
+    exif_data.update(_parse_gps(exif.get_ifd(IFD_GPS)))
+
+    # 其他信息（键名与 AssetService.extract_exif 保持一致）
+    for key, value in (
+        ("image_make", exif.get(TAG_MAKE)),
+        ("exif_isospeedratings", exif_ifd.get(TAG_ISO_SPEED)),
+        ("exif_focallength", exif_ifd.get(TAG_FOCAL_LENGTH)),
+        ("exif_exposuretime", exif_ifd.get(TAG_EXPOSURE_TIME)),
+    ):
+        if value is not None:
+            exif_data[key] = str(value).strip("\x00 ")
+
+    return exif_data, exif.get(TAG_ORIENTATION, 1)
+
+
+def analyze_image(
+    source: Union[bytes, BinaryIO],
+    max_size: tuple = (400, 400),
+    quality: int = 85,
+) -> Dict[str, Any]:
+    """
+    单次解码分析图片（模块级函数，可在进程池中执行）
+
+    Args:
+        source: 图片字节数据或已打开的文件对象
+        max_size: 缩略图最大尺寸
+        quality: 缩略图 JPEG 质量
+
+    Returns:
+        {"width", "height", "orientation", "exif", "thumbnail"}，
+        缩略图生成失败时 thumbnail 为 None
+    """
+    if not hasattr(source, "read"):
+        source = io.BytesIO(source)
+    img = Image.open(source)
+
+    exif_data, orientation = _parse_exif(img)
+    width, height = img.size
+    if orientation in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    thumbnail = None
+    try:
+        # JPEG 可直接按缩小比例解码，避免整图解码进内存
+        img.draft("RGB", max_size)
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        img.save(output, format="JPEG", quality=quality, optimize=True)
+        thumbnail = output.getvalue()
+    except Exception as e:
+        print(f"图片缩略图生成失败: {e}")
+
+    return {
+        "width": width,
+        "height": height,
+        "orientation": orientation,
+        "exif": exif_data,
+        "thumbnail": thumbnail,
+    }
+
+
+# 无需重新编码即可直接发送给模型的格式
+ANALYSIS_PASSTHROUGH_FORMATS = {"JPEG", "PNG", "WEBP"}
+ANALYSIS_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def encode_analysis_image(
+    data: Union[bytes, BinaryIO],
+    max_side: int,
+    image_format: str = "jpeg",
+    quality: int = 85,
+) -> Optional[bytes]:
+    """
+    生成用于 AI 分析的缩小图片（模块级函数，可在进程池中执行）
+
+    Returns:
+        重新编码后的图片；原图尺寸已在上限内且格式可直接发送时返回 None
+    """
+    img = Image.open(data if hasattr(data, "read") else io.BytesIO(data))
+    if max(img.size) <= max_side and img.format in ANALYSIS_PASSTHROUGH_FORMATS:
+        return None
+
+    img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    img.save(output, format=image_format.upper(), quality=quality)
+    return output.getvalue()
+
+
+class MediaService:
+    """图片分析服务"""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """延迟创建进程池"""
+        if self._executor is None:
+            workers = settings.media_process_workers or os.cpu_count() or 1
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        return self._executor
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def analyze(self, source: Union[bytes, BinaryIO]) -> Dict[str, Any]:
+        """
+        分析图片
+
+        字节数据提交到进程池；文件对象（如上传临时文件）无法跨进程传递，
+        在线程池中按需读取，避免为大文件整体读入内存。
+        """
+        if hasattr(source, "read"):
+            return await run_in_threadpool(analyze_image, source)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, analyze_image, source)
+
+    async def prepare_for_analysis(self, data: Union[bytes, BinaryIO], mime_type: str) -> tuple:
+        """
+        将图片缩小到 AI 分析分辨率 (AI_ANALYSIS_MAX_SIDE)
+
+        与 analyze 相同，文件对象在线程池中按需读取。
+
+        Returns:
+            (图片数据, MIME 类型)；无需缩小或处理失败时返回原图
+        """
+        image_format = settings.ai_analysis_format.lower()
+        if settings.ai_analysis_max_side > 0 and image_format in ANALYSIS_MIME_TYPES:
+            args = (data, settings.ai_analysis_max_side, image_format, settings.ai_analysis_quality)
+            try:
+                if hasattr(data, "read"):
+                    encoded = await run_in_threadpool(encode_analysis_image, *args)
+                else:
+                    loop = asyncio.get_running_loop()
+                    encoded = await loop.run_in_executor(self.executor, encode_analysis_image, *args)
+                if encoded is not None:
+                    return encoded, ANALYSIS_MIME_TYPES[image_format]
+            except Exception as e:
+                print(f"分析图片生成失败，使用原图: {e}")
+        if hasattr(data, "read"):
+            data.seek(0)
+            data = await run_in_threadpool(data.read)
+        return data, mime_type
+
+
+# 单例
+media_service = MediaService()
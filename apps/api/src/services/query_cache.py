@@ -0,0 +1,156 @@
+"""
+查询向量缓存
+
+AI 搜索、混合搜索和 MCP 检索工具都要为查询文本生成向量，同一查询（包括翻页）
+会重复调用远程嵌入接口。两级缓存：
+- 进程内 LRU（容量 + TTL），命中时没有网络开销
+- Redis（API 副本与消费者之间共享，重启后仍有效）；Redis 不可用时暂时只用进程内缓存
+
+缓存键为 规范化查询文本 + 任务类型 + 模型 + 维度 的哈希；生成失败的零向量不缓存。
+"""
+import base64
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from redis.exceptions import RedisError
+
+from src.config import settings
+from src.utils.redis import get_redis
+
+REDIS_KEY_PREFIX = "zmage:qemb:"
+
+# Redis 出错后暂停访问的时间 (秒)，避免每次查询都等待连接超时
+REDIS_RETRY_INTERVAL = 30
+
+
+def normalize_query(text: str) -> str:
+    """规范化查询文本：全角/半角统一、合并空白、忽略大小写"""
+    return " ".join(unicodedata.normalize("NFKC", text).split()).casefold()
+
+
+class LRUCache:
+    """带过期时间的进程内 LRU 缓存（仅在事件循环线程中访问，无需加锁）"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: List[float]):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class QueryEmbeddingCache:
+    """查询向量两级缓存"""
+
+    def __init__(self):
+        self.local = LRUCache(settings.query_embedding_cache_size, settings.query_embedding_cache_ttl)
+        self.counters: Dict[str, int] = {"local_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+        self._redis_retry_at = 0.0
+
+    def key(self, text: str, task_type: str, model: str) -> str:
+        raw = f"{model}@{settings.embedding_dimension}\n{task_type}\n{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _redis_available(self) -> bool:
+        return settings.query_embedding_redis_ttl > 0 and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, error: Exception):
+        self.counters["redis_errors"] += 1
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+        print(f"查询向量缓存 Redis 访问失败，{REDIS_RETRY_INTERVAL} 秒内只使用进程内缓存: {error}")
+
+    async def _redis_get(self, key: str) -> Optional[List[float]]:
+        if not self._redis_available():
+            return None
+        try:
+            data = await get_redis().get(REDIS_KEY_PREFIX + key)
+        except RedisError as e:
+            self._redis_failed(e)
+            return None
+        if not data:
+            return None
+        return np.frombuffer(base64.b64decode(data), dtype=np.float32).tolist()
+
+    async def _redis_set(self, key: str, vector: List[float]):
+        if not self._redis_available():
+            return
+        # float32 二进制 + base64（连接使用 decode_responses），约为 JSON 的三分之一
+        data = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+        try:
+            await get_redis().set(REDIS_KEY_PREFIX + key, data, ex=settings.query_embedding_redis_ttl)
+        except RedisError as e:
+            self._redis_failed(e)
+
+    async def get_or_create(
+        self,
+        text: str,
+        task_type: str,
+        model: str,
+        factory: Callable[[], Awaitable[List[float]]],
+    ) -> List[float]:
+        """
+        读取缓存的查询向量，未命中时调用 factory 生成并写入两级缓存
+
+        Args:
+            text: 查询文本
+            task_type: 嵌入任务类型
+            model: 嵌入模型
+            factory: 生成向量的协程函数
+        """
+        key = self.key(text, task_type, model)
+
+        vector = self.local.get(key)
+        if vector is not None:
+            self.counters["local_hits"] += 1
+            return vector
+
+        vector = await self._redis_get(key)
+        if vector is not None:
+            self.counters["redis_hits"] += 1
+            self.local.set(key, vector)
+            return vector
+
+        self.counters["misses"] += 1
+        vector = await factory()
+        if any(vector):
+            self.local.set(key, vector)
+            await self._redis_set(key, vector)
+        return vector
+
+    def metrics(self) -> Dict[str, float]:
+        """命中统计（进程级，自启动起累计）"""
+        lookups = sum(self.counters[k] for k in ("local_hits", "redis_hits", "misses"))
+        hits = self.counters["local_hits"] + self.counters["redis_hits"]
+        return {
+            **self.counters,
+            "local_size": len(self.local),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# 单例
+query_embedding_cache = QueryEmbeddingCache()
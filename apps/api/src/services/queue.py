@@ -0,0 +1,276 @@
+"""
+Redis 持久化任务队列
+
+至少一次投递：消费者取出任务时原子地将其移入 inflight 有序集合（分值为可见性
+截止时间），处理成功后确认删除；执行中的消费者定期延长截止时间，消费者崩溃或
+失联后由回收器将超时任务重新投递。失败任务按指数退避重试，超过最大次数进入死信队列。
+
+Redis 键（前缀 zmage:queue:<name>）：
+- :ready     LIST  待执行任务 ID (LPUSH 入队，RPOP 出队)
+- :delayed   ZSET  等待重试的任务 ID → 可执行时间
+- :inflight  ZSET  执行中的任务 ID → 可见性截止时间
+- :jobs      HASH  任务 ID → 任务 JSON
+- :dead      LIST  死信任务 JSON
+"""
+import json
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any, List
+
+from redis.exceptions import RedisError
+
+from src.config import settings
+from src.utils.redis import get_redis
+
+# 死信队列保留条数
+MAX_DEAD_JOBS = 10000
+
+# 入队（同一任务 ID 已在队列中时忽略）
+ENQUEUE_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# 取出任务：先将到期的重试任务移回待执行队列，再出队并登记可见性截止时间
+RESERVE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, id in ipairs(due) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('LPUSH', KEYS[1], id)
+end
+while true do
+    local id = redis.call('RPOP', KEYS[1])
+    if not id then
+        return nil
+    end
+    local body = redis.call('HGET', KEYS[4], id)
+    if body then
+        local job = cjson.decode(body)
+        job['attempts'] = (job['attempts'] or 0) + 1
+        body = cjson.encode(job)
+        redis.call('HSET', KEYS[4], id, body)
+        redis.call('ZADD', KEYS[3], ARGV[2], id)
+        return body
+    end
+end
+"""
+
+# 失败处理：未超过最大次数则延迟重试，否则移入死信队列
+FAIL_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return -1
+end
+local body = redis.call('HGET', KEYS[3], ARGV[1])
+if not body then
+    return -1
+end
+local job = cjson.decode(body)
+job['last_error'] = ARGV[5]
+if job['attempts'] >= job['max_attempts'] then
+    job['failed_at'] = tonumber(ARGV[2])
+    redis.call('HDEL', KEYS[3], ARGV[1])
+    redis.call('LPUSH', KEYS[4], cjson.encode(job))
+    redis.call('LTRIM', KEYS[4], 0, tonumber(ARGV[6]) - 1)
+    return 0
+end
+local delay = math.min(tonumber(ARGV[3]) * 2 ^ (job['attempts'] - 1), tonumber(ARGV[4]))
+redis.call('HSET', KEYS[3], ARGV[1], cjson.encode(job))
+redis.call('ZADD', KEYS[2], tonumber(ARGV[2]) + delay, ARGV[1])
+return 1
+"""
+
+
+@dataclass
+class Job:
+    """队列任务"""
+    id: str
+    type: str
+    args: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+    max_attempts: int = 5
+    enqueued_at: float = 0.0
+    last_error: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, body: str) -> "Job":
+        data = json.loads(body)
+        # Lua cjson 会把空字典编码为空数组
+        args = data.get("args") or {}
+        return cls(
+            id=data["id"],
+            type=data["type"],
+            args=args if isinstance(args, dict) else {},
+            attempts=int(data.get("attempts", 0)),
+            max_attempts=int(data.get("max_attempts", 1)),
+            enqueued_at=float(data.get("enqueued_at", 0)),
+            last_error=data.get("last_error"),
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+
+class JobQueue:
+    """Redis 持久化任务队列"""
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self.prefix = f"zmage:queue:{name}"
+        self._scripts = {}
+
+    def _key(self, suffix: str) -> str:
+        return f"{self.prefix}:{suffix}"
+
+    def _script(self, source: str):
+        """注册 Lua 脚本（EVALSHA，脚本缓存丢失时自动重新加载）"""
+        if source not in self._scripts:
+            self._scripts[source] = get_redis().register_script(source)
+        return self._scripts[source]
+
+    async def enqueue(
+        self,
+        job_type: str,
+        args: Optional[Dict[str, Any]] = None,
+        job_id: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        投递任务
+
+        Args:
+            job_type: 任务类型（对应消费者中的处理函数）
+            args: 任务参数（需可 JSON 序列化）
+            job_id: 任务 ID，指定时同一 ID 未完成前不会重复入队
+            max_attempts: 最大执行次数
+
+        Returns:
+            任务 ID，重复投递时返回 None
+        """
+        job = Job(
+            id=job_id or uuid.uuid4().hex,
+            type=job_type,
+            args=args or {},
+            max_attempts=max_attempts or settings.queue_max_attempts,
+            enqueued_at=time.time(),
+        )
+        added = await self._script(ENQUEUE_SCRIPT)(
+            keys=[self._key("jobs"), self._key("ready")],
+            args=[job.id, job.to_json()],
+        )
+        return job.id if added else None
+
+    async def enqueue_many(self, job_type: str, args_list: List[Dict[str, Any]]) -> int:
+        """批量投递同类任务（单次往返）"""
+        if not args_list:
+            return 0
+        now = time.time()
+        jobs = [
+            Job(
+                id=uuid.uuid4().hex,
+                type=job_type,
+                args=args,
+                max_attempts=settings.queue_max_attempts,
+                enqueued_at=now,
+            )
+            for args in args_list
+        ]
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hset(self._key("jobs"), mapping={job.id: job.to_json() for job in jobs})
+            pipe.lpush(self._key("ready"), *[job.id for job in jobs])
+            await pipe.execute()
+        return len(jobs)
+
+    async def reserve(self) -> Optional[Job]:
+        """取出一个任务，没有可执行任务时返回 None"""
+        now = time.time()
+        body = await self._script(RESERVE_SCRIPT)(
+            keys=[self._key("ready"), self._key("delayed"), self._key("inflight"), self._key("jobs")],
+            args=[now, now + settings.queue_visibility_timeout],
+        )
+        return Job.from_json(body) if body else None
+
+    async def extend(self, job: Job):
+        """延长执行中任务的可见性截止时间（心跳）"""
+        await get_redis().zadd(
+            self._key("inflight"),
+            {job.id: time.time() + settings.queue_visibility_timeout},
+            xx=True,
+        )
+
+    async def ack(self, job: Job):
+        """确认任务完成"""
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.zrem(self._key("inflight"), job.id)
+            pipe.hdel(self._key("jobs"), job.id)
+            await pipe.execute()
+
+    async def fail(self, job: Job, error: str) -> bool:
+        """
+        标记任务失败
+
+        Returns:
+            是否会重试（False 表示已进入死信队列或任务已不归当前消费者所有）
+        """
+        result = await self._script(FAIL_SCRIPT)(
+            keys=[self._key("inflight"), self._key("delayed"), self._key("jobs"), self._key("dead")],
+            args=[
+                job.id,
+                time.time(),
+                settings.queue_retry_backoff,
+                settings.queue_retry_backoff_max,
+                error[:1000],
+                MAX_DEAD_JOBS,
+            ],
+        )
+        return result == 1
+
+    async def reap(self) -> int:
+        """重新投递可见性超时的任务（消费者崩溃或失联），返回处理的任务数"""
+        expired = await get_redis().zrangebyscore(self._key("inflight"), "-inf", time.time())
+        for job_id in expired:
+            await self.fail(Job(id=job_id, type=""), "可见性超时，消费者未确认")
+        return len(expired)
+
+    async def stats(self) -> Dict[str, int]:
+        """队列长度统计"""
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.llen(self._key("ready"))
+            pipe.zcard(self._key("delayed"))
+            pipe.zcard(self._key("inflight"))
+            pipe.llen(self._key("dead"))
+            ready, delayed, inflight, dead = await pipe.execute()
+        return {"ready": ready, "delayed": delayed, "inflight": inflight, "dead": dead}
+
+    async def submit(self, job_type: str, args: Dict[str, Any]) -> bool:
+        """
+        投递任务，队列未启用或 Redis 不可用时返回 False
+
+        调用方据此回退为在 API 进程内执行。
+        """
+        if not settings.task_queue_enabled:
+            return False
+        try:
+            await self.enqueue(job_type, args)
+            return True
+        except RedisError as e:
+            print(f"任务入队失败，改为进程内执行 ({job_type}): {e}")
+            return False
+
+    async def submit_many(self, job_type: str, args_list: List[Dict[str, Any]]) -> bool:
+        """批量投递任务，失败时返回 False"""
+        if not settings.task_queue_enabled:
+            return False
+        try:
+            await self.enqueue_many(job_type, args_list)
+            return True
+        except RedisError as e:
+            print(f"任务入队失败，改为进程内执行 ({job_type}): {e}")
+            return False
+
+
+# 单例
+job_queue = JobQueue()
@@ -0,0 +1,107 @@
+"""
+搜索结果缓存
+
+POST /assets/search 的响应按 用户 + 规范化请求 缓存在 Redis 中。每个用户有一个资产库
+版本号 (zmage:libgen:<user_id>)，写入资产的事务提交后递增（见 models.database.AppSession）；
+缓存条目记录生成时的版本号，版本号变化即视为失效。单次写入的失效代价是一次 INCR，
+旧条目按 TTL 自然过期。命中时直接返回序列化好的响应，不访问 PostgreSQL 与 Qdrant。
+"""
+import hashlib
+import json
+from typing import Iterable, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from src.config import settings
+from src.schemas.asset import AssetSearchRequest
+from src.services.query_cache import normalize_query
+from src.utils.redis import get_redis
+
+GENERATION_KEY = "zmage:libgen:{}"
+ENTRY_KEY = "zmage:search:{}:{}"
+
+
+def request_key(request: AssetSearchRequest) -> str:
+    """规范化搜索请求的哈希（查询文本规范化，多值过滤条件排序）"""
+    data = request.model_dump(mode="json")
+    data["query"] = normalize_query(request.query or "")
+    for field in ("asset_types", "tags"):
+        if data.get(field):
+            data[field] = sorted(data[field])
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """按用户资产库版本号失效的搜索结果缓存"""
+
+    def __init__(self):
+        self.counters = {"hits": 0, "misses": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.search_cache_ttl > 0
+
+    async def get(self, user_id: int, request: AssetSearchRequest) -> Tuple[Optional[str], Optional[str]]:
+        """
+        读取缓存的响应
+
+        Returns:
+            (响应 JSON, 当前版本号)；未命中时响应为 None，缓存不可用时版本号也为 None
+        """
+        if not self.enabled:
+            return None, None
+        try:
+            generation, entry = await get_redis().mget(
+                GENERATION_KEY.format(user_id),
+                ENTRY_KEY.format(user_id, request_key(request)),
+            )
+        except RedisError as e:
+            self.counters["errors"] += 1
+            print(f"搜索缓存读取失败: {e}")
+            return None, None
+
+        generation = generation or "0"
+        if entry:
+            entry_generation, _, body = entry.partition(":")
+            if entry_generation == generation:
+                self.counters["hits"] += 1
+                return body, generation
+        self.counters["misses"] += 1
+        return None, generation
+
+    async def set(self, user_id: int, request: AssetSearchRequest, generation: str, body: str):
+        """写入响应（generation 为查询开始前读取的版本号，期间有写入时条目立即失效）"""
+        try:
+            await get_redis().set(
+                ENTRY_KEY.format(user_id, request_key(request)),
+                f"{generation}:{body}",
+                ex=settings.search_cache_ttl,
+            )
+        except RedisError as e:
+            self.counters["errors"] += 1
+            print(f"搜索缓存写入失败: {e}")
+
+    async def invalidate(self, user_ids: Iterable[int]):
+        """递增用户的资产库版本号"""
+        if not self.enabled:
+            return
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.incr(GENERATION_KEY.format(user_id))
+                await pipe.execute()
+        except RedisError as e:
+            self.counters["errors"] += 1
+            print(f"搜索缓存失效失败: {e}")
+
+    def metrics(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+# 单例
+search_cache = SearchCache()
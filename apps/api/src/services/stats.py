@@ -4,7 +4,7 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, text
+from sqlalchemy import select, func, desc
 from src.models import Asset, Album, User, AssetType, AssetStatus
 
 class StatsService:
@@ -76,21 +76,8 @@ class StatsService:
         }
 
     async def get_top_tags(self, db: AsyncSession, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-        """获取使用频率最高的标签"""
-        # PostgreSQL 特有的 unnest 函数用于展开数组字段进行聚合
-        query = text("""
-            SELECT tag, count(*) as count
-            FROM (
-                SELECT unnest(tags) as tag
-                FROM assets
-                WHERE user_id = :user_id AND deleted_at IS NULL
-            ) sub
-            GROUP BY tag
-            ORDER BY count DESC
-            LIMIT :limit
-        """)
-        
-        result = await db.execute(query, {"user_id": user_id, "limit": limit})
-        return [{"tag": row[0], "count": row[1]} for row in result.all()]
+        """获取使用频率最高的标签（读取增量维护的标签字典）"""
+        from src.services.tag import tag_service
+        return await tag_service.top_tags(db, user_id, limit)
 
 stats_service = StatsService()
@@ -4,7 +4,8 @@ MinIO 存储服务
 import io
 import os
 import hashlib
-from typing import Optional, BinaryIO
+import tempfile
+from typing import Optional, BinaryIO, AsyncIterator, Dict, Any, List, Union
 from datetime import timedelta
 from fastapi.concurrency import run_in_threadpool
 
@@ -14,6 +15,12 @@ from PIL import Image
 
 from src.config import settings
 
+# S3 分片上传要求除最后一片外每片不小于 5MB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# 下载到临时文件时留在内存中的上限，超过后写入磁盘
+TEMPFILE_SPOOL_SIZE = 1024 * 1024
+
 
 class StorageService:
     """MinIO 存储服务"""
@@ -75,6 +82,113 @@ class StorageService:
         file_obj = io.BytesIO(data)
         return await self.upload_file(file_obj, file_path, content_type)
     
+    async def create_multipart_upload(
+        self,
+        file_path: str,
+        content_type: str = "application/octet-stream",
+    ) -> str:
+        """创建分片上传，返回 UploadId"""
+        response = await run_in_threadpool(
+            self.client.create_multipart_upload,
+            Bucket=self.bucket,
+            Key=file_path,
+            ContentType=content_type,
+        )
+        return response["UploadId"]
+    
+    async def upload_part(
+        self,
+        file_path: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+    ) -> Dict[str, Any]:
+        """上传单个分片，返回用于合并的分片描述"""
+        response = await run_in_threadpool(
+            self.client.upload_part,
+            Bucket=self.bucket,
+            Key=file_path,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+    
+    async def complete_multipart_upload(
+        self,
+        file_path: str,
+        upload_id: str,
+        parts: List[Dict[str, Any]],
+    ):
+        """合并分片"""
+        await run_in_threadpool(
+            self.client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=file_path,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": sorted(parts, key=lambda p: p["PartNumber"])},
+        )
+    
+    async def abort_multipart_upload(self, file_path: str, upload_id: str) -> bool:
+        """取消分片上传并释放已上传的分片"""
+        try:
+            await run_in_threadpool(
+                self.client.abort_multipart_upload,
+                Bucket=self.bucket,
+                Key=file_path,
+                UploadId=upload_id,
+            )
+            return True
+        except Exception:
+            return False
+    
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_path: str,
+        content_type: str = "application/octet-stream",
+        part_size: Optional[int] = None,
+    ) -> int:
+        """
+        流式分片上传
+        
+        逐块消费数据并以 S3 Multipart Upload 写入，内存占用受分片大小约束，
+        不会缓冲整个文件。失败时自动取消分片上传。
+        
+        Args:
+            chunks: 异步数据块迭代器
+            file_path: 存储路径
+            content_type: 文件类型
+            part_size: 分片大小，默认取 settings.upload_chunk_size
+            
+        Returns:
+            上传的总字节数
+        """
+        part_size = max(part_size or settings.upload_chunk_size, MIN_PART_SIZE)
+        upload_id = await self.create_multipart_upload(file_path, content_type)
+        
+        parts = []
+        buffer = bytearray()
+        total = 0
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                total += len(chunk)
+                if len(buffer) >= part_size:
+                    parts.append(await self.upload_part(file_path, upload_id, len(parts) + 1, bytes(buffer)))
+                    buffer.clear()
+            
+            # 最后一片允许小于 5MB；空文件也需要至少一个分片
+            if buffer or not parts:
+                parts.append(await self.upload_part(file_path, upload_id, len(parts) + 1, bytes(buffer)))
+            
+            await self.complete_multipart_upload(file_path, upload_id, parts)
+        except BaseException:
+            await self.abort_multipart_upload(file_path, upload_id)
+            raise
+        
+        return total
+    
     async def download_file(self, file_path: str) -> bytes:
         """下载文件"""
         response = await run_in_threadpool(
@@ -82,6 +196,36 @@ class StorageService:
         )
         return await run_in_threadpool(response["Body"].read)
     
+    async def download_range(self, file_path: str, start: int, length: int) -> bytes:
+        """下载文件的指定字节区间"""
+        response = await run_in_threadpool(
+            self.client.get_object,
+            Bucket=self.bucket,
+            Key=file_path,
+            Range=f"bytes={start}-{start + length - 1}",
+        )
+        return await run_in_threadpool(response["Body"].read)
+    
+    async def hash_file(self, file_path: str, chunk_size: Optional[int] = None) -> tuple:
+        """
+        流式计算已存储文件的 SHA256 哈希
+        
+        Returns:
+            (哈希, 字节数)
+        """
+        chunk_size = chunk_size or settings.upload_chunk_size
+        
+        def _hash():
+            response = self.client.get_object(Bucket=self.bucket, Key=file_path)
+            hasher = hashlib.sha256()
+            size = 0
+            for chunk in response["Body"].iter_chunks(chunk_size):
+                hasher.update(chunk)
+                size += len(chunk)
+            return hasher.hexdigest(), size
+        
+        return await run_in_threadpool(_hash)
+    
     async def delete_file(self, file_path: str) -> bool:
         """删除文件"""
         try:
@@ -92,6 +236,55 @@ class StorageService:
         except Exception:
             return False
     
+    async def copy_file(self, source_path: str, dest_path: str) -> str:
+        """在存储桶内复制文件（服务端复制，大文件自动分片）"""
+        await run_in_threadpool(
+            self.client.copy,
+            {"Bucket": self.bucket, "Key": source_path},
+            self.bucket,
+            dest_path,
+        )
+        return dest_path
+    
+    async def list_objects(self, prefix: str, bucket: Optional[str] = None) -> List[tuple]:
+        """
+        列出前缀下的全部对象（自动翻页）
+
+        Returns:
+            (对象键, 字节数) 列表
+        """
+        def _list():
+            paginator = self.client.get_paginator("list_objects_v2")
+            objects = []
+            for page in paginator.paginate(Bucket=bucket or self.bucket, Prefix=prefix):
+                for obj in page.get("Contents", []):
+                    objects.append((obj["Key"], obj["Size"]))
+            return objects
+
+        return await run_in_threadpool(_list)
+
+    def download_to_tempfile(self, file_path: str, bucket: Optional[str] = None) -> BinaryIO:
+        """
+        下载对象到临时文件（同步方法，在线程中调用）
+
+        超过 TEMPFILE_SPOOL_SIZE 后落盘：批量导入时整批文件从计算哈希到上传期间
+        都保持打开，按流式阈值留在内存会使一批占用数 GB。
+        """
+        temp = tempfile.SpooledTemporaryFile(max_size=TEMPFILE_SPOOL_SIZE)
+        self.client.download_fileobj(bucket or self.bucket, file_path, temp)
+        temp.seek(0)
+        return temp
+
+    async def get_file_size(self, file_path: str) -> Optional[int]:
+        """获取对象大小，对象不存在时返回 None"""
+        try:
+            response = await run_in_threadpool(
+                self.client.head_object, Bucket=self.bucket, Key=file_path
+            )
+            return response["ContentLength"]
+        except Exception:
+            return None
+    
     async def file_exists(self, file_path: str) -> bool:
         """检查文件是否存在"""
         try:
@@ -127,13 +320,16 @@ class StorageService:
     
     async def generate_thumbnail(
         self,
-        image_data: bytes,
+        image_data: Union[bytes, BinaryIO],
         max_size: tuple = (400, 400),
         quality: int = 85,
     ) -> bytes:
-        """生成缩略图"""
+        """生成缩略图（支持字节数据或已打开的文件对象）"""
         def _generate():
-            img = Image.open(io.BytesIO(image_data))
+            source = image_data if hasattr(image_data, "read") else io.BytesIO(image_data)
+            img = Image.open(source)
+            # JPEG 可直接按缩小比例解码，避免整图解码进内存
+            img.draft("RGB", max_size)
             if img.mode in ("RGBA", "P"):
                 img = img.convert("RGB")
             img.thumbnail(max_size, Image.Resampling.LANCZOS)
@@ -145,16 +341,20 @@ class StorageService:
     
     async def generate_video_thumbnail(
         self,
-        video_data: bytes,
+        video_data: Union[bytes, BinaryIO],
         max_size: tuple = (400, 400),
     ) -> bytes:
-        """从视频生成缩略图"""
+        """从视频生成缩略图（支持字节数据或已打开的文件对象）"""
         def _generate():
             import cv2
-            # 将字节数据写入临时文件（部分 OpenCV 版本不支持直接从字节流读取视频）
+            import shutil
+            # 将数据写入临时文件（部分 OpenCV 版本不支持直接从字节流读取视频）
             import tempfile
             with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-                tmp.write(video_data)
+                if hasattr(video_data, "read"):
+                    shutil.copyfileobj(video_data, tmp, settings.upload_chunk_size)
+                else:
+                    tmp.write(video_data)
                 tmp_path = tmp.name
                 
             try:
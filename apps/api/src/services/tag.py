@@ -0,0 +1,84 @@
+"""
+标签字典服务
+
+查询 asset_tags 字典表（由数据库触发器增量维护），不再展开全部资产的 tags 数组：
+- 自动补全：先按前缀匹配（C 排序规则的范围查询，走 (user_id, lower(tag)) 索引），
+  不足时再用三元组索引补充包含输入的标签
+- 热门标签：按 (user_id, asset_count) 索引取前 N 项
+"""
+from typing import List, Dict, Any
+
+from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import AssetTag
+
+# 前缀范围查询的上界后缀（最大的 Unicode 码位）
+PREFIX_UPPER_BOUND = chr(0x10FFFF)
+
+
+def tag_prefix_filter(prefix: str):
+    """lower(tag) 以 prefix 开头（C 排序规则下按码位比较，可使用范围索引扫描）"""
+    key = func.lower(AssetTag.tag).collate("C")
+    return and_(key >= prefix, key < prefix + PREFIX_UPPER_BOUND)
+
+
+class TagService:
+    """标签字典服务"""
+
+    async def autocomplete(self, db: AsyncSession, user_id: int, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        标签自动补全
+
+        Args:
+            db: 数据库会话
+            user_id: 用户 ID
+            query: 用户输入
+            limit: 返回数量
+
+        Returns:
+            [{"tag", "count"}, ...]，前缀匹配在前，各自按资产数降序
+        """
+        prefix = query.strip().lower()
+        if not prefix:
+            return await self.top_tags(db, user_id, limit)
+
+        result = await db.execute(
+            select(AssetTag.tag, AssetTag.asset_count)
+            .where(AssetTag.user_id == user_id, tag_prefix_filter(prefix))
+            .order_by(AssetTag.asset_count.desc(), AssetTag.tag)
+            .limit(limit)
+        )
+        rows = result.all()
+
+        # 前缀匹配不足时补充包含输入的标签（中文标签常以修饰词开头）
+        if len(rows) < limit:
+            found = [tag for tag, _ in rows]
+            contains = (
+                select(AssetTag.tag, AssetTag.asset_count)
+                .where(
+                    AssetTag.user_id == user_id,
+                    func.lower(AssetTag.tag).contains(prefix, autoescape=True),
+                )
+                .order_by(AssetTag.asset_count.desc(), AssetTag.tag)
+                .limit(limit - len(rows))
+            )
+            if found:
+                contains = contains.where(AssetTag.tag.notin_(found))
+            rows += (await db.execute(contains)).all()
+
+        return [{"tag": tag, "count": count} for tag, count in rows]
+
+    async def top_tags(self, db: AsyncSession, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """使用频率最高的标签"""
+        result = await db.execute(
+            select(AssetTag.tag, AssetTag.asset_count)
+            .where(AssetTag.user_id == user_id)
+            .order_by(AssetTag.asset_count.desc(), AssetTag.tag)
+            .limit(limit)
+        )
+        return [{"tag": tag, "count": count} for tag, count in result.all()]
+
+
+# 单例
+tag_service = TagService()
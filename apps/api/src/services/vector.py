@@ -12,11 +12,35 @@ from qdrant_client.models import (
     Filter,
     FieldCondition,
     MatchValue,
+    MatchAny,
     SearchParams,
+    PayloadSchemaType,
+    SetPayload,
+    SetPayloadOperation,
+    IsEmptyCondition,
+    PayloadField,
 )
 
 from src.config import settings
 
+# 需要建立索引的过滤字段（租户、可见性、状态、类型）
+PAYLOAD_INDEXES = {
+    "asset_id": PayloadSchemaType.INTEGER,
+    "asset_type": PayloadSchemaType.KEYWORD,
+    "user_id": PayloadSchemaType.INTEGER,
+    "is_private": PayloadSchemaType.BOOL,
+    "deleted": PayloadSchemaType.BOOL,
+    "status": PayloadSchemaType.KEYWORD,
+}
+
+# 向量 ID 命名空间（与 worker 保持一致，修改会导致全部向量 ID 变化）
+VECTOR_NAMESPACE = uuid.UUID("be45eae8-cf27-4b22-acf0-a81534483eff")
+
+
+def point_id(asset_id: int) -> str:
+    """由资产 ID 确定性生成向量 ID，重复写入时原地覆盖"""
+    return str(uuid.uuid5(VECTOR_NAMESPACE, f"asset:{asset_id}"))
+
 
 class VectorService:
     """Qdrant 向量服务"""
@@ -41,6 +65,14 @@ class VectorService:
                     ),
                 )
                 print(f"Created Qdrant collection: {self.collection_name}")
+            
+            # 创建过滤字段的 payload 索引（已存在时为幂等操作）
+            for field_name, schema in PAYLOAD_INDEXES.items():
+                await self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=schema,
+                )
         except Exception as e:
             print(f"Failed to initialize Qdrant: {e}")
     
@@ -61,7 +93,7 @@ class VectorService:
         Returns:
             向量 ID
         """
-        vector_id = str(uuid.uuid4())
+        vector_id = point_id(asset_id)
         
         await self.client.upsert(
             collection_name=self.collection_name,
@@ -79,6 +111,84 @@ class VectorService:
         
         return vector_id
     
+    async def upsert_vectors(self, items: List[tuple]) -> List[str]:
+        """
+        批量插入或更新向量（单次请求）
+        
+        Args:
+            items: (asset_id, vector, payload) 列表
+            
+        Returns:
+            与 items 一一对应的向量 ID
+        """
+        if not items:
+            return []
+        
+        vector_ids = [point_id(asset_id) for asset_id, _, _ in items]
+        await self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                PointStruct(
+                    id=vector_id,
+                    vector=vector,
+                    payload={
+                        "asset_id": asset_id,
+                        **payload,
+                    },
+                )
+                for vector_id, (asset_id, vector, payload) in zip(vector_ids, items)
+            ],
+        )
+        
+        return vector_ids
+    
+    async def set_payloads(self, items: List[tuple]):
+        """
+        批量更新向量元数据（单次请求，不修改向量本身）
+        
+        Args:
+            items: (vector_id, payload) 列表
+        """
+        if not items:
+            return
+        await self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=[
+                SetPayloadOperation(set_payload=SetPayload(payload=payload, points=[vector_id]))
+                for vector_id, payload in items
+            ],
+        )
+    
+    async def scroll_missing_field(
+        self,
+        field_name: str,
+        limit: int = 256,
+        offset: Optional[Any] = None,
+    ) -> tuple:
+        """
+        分页列出缺少指定元数据字段的向量（用于元数据回填）
+        
+        Returns:
+            ([(向量 ID, 资产 ID), ...], 下一页偏移，没有更多时为 None)
+        """
+        points, next_offset = await self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=Filter(must=[IsEmptyCondition(is_empty=PayloadField(key=field_name))]),
+            limit=limit,
+            offset=offset,
+            with_payload=["asset_id"],
+            with_vectors=False,
+        )
+        return [(point.id, (point.payload or {}).get("asset_id")) for point in points], next_offset
+    
+    async def delete_vectors(self, vector_ids: List[str]):
+        """批量删除向量"""
+        if vector_ids:
+            await self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=list(vector_ids),
+            )
+    
     async def delete_vector(self, vector_id: str):
         """删除向量"""
         await self.client.delete(
@@ -93,6 +203,10 @@ class VectorService:
         filter_conditions: Optional[Dict[str, Any]] = None,
         exclude_asset_ids: Optional[List[int]] = None,
         score_threshold: Optional[float] = None,
+        user_id: Optional[int] = None,
+        include_private: bool = False,
+        asset_types: Optional[List[str]] = None,
+        payload_fields: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
         """
         搜索相似向量
@@ -103,6 +217,10 @@ class VectorService:
             filter_conditions: 过滤条件
             exclude_asset_ids: 排除的资产 ID
             score_threshold: 相似度阈值
+            user_id: 所有者 ID，指定时只在该用户已就绪、未删除的资产中检索
+            include_private: 是否包含保险库中的私密资产
+            asset_types: 资产类型过滤
+            payload_fields: 只返回指定的 payload 字段（默认全部）
             
         Returns:
             搜索结果列表
@@ -111,6 +229,21 @@ class VectorService:
         must_conditions = []
         must_not_conditions = []
         
+        if user_id is not None:
+            # 租户与可见性过滤在 Qdrant 内完成，召回不受其他用户数据量影响
+            must_conditions += [
+                FieldCondition(key="user_id", match=MatchValue(value=user_id)),
+                FieldCondition(key="deleted", match=MatchValue(value=False)),
+                FieldCondition(key="status", match=MatchValue(value="ready")),
+            ]
+            if not include_private:
+                must_conditions.append(FieldCondition(key="is_private", match=MatchValue(value=False)))
+        
+        if asset_types:
+            must_conditions.append(
+                FieldCondition(key="asset_type", match=MatchAny(any=list(asset_types)))
+            )
+        
         if filter_conditions:
             for key, value in filter_conditions.items():
                 if value is not None:
@@ -119,10 +252,9 @@ class VectorService:
                     )
         
         if exclude_asset_ids:
-            for asset_id in exclude_asset_ids:
-                must_not_conditions.append(
-                    FieldCondition(key="asset_id", match=MatchValue(value=asset_id))
-                )
+            must_not_conditions.append(
+                FieldCondition(key="asset_id", match=MatchAny(any=list(exclude_asset_ids)))
+            )
         
         query_filter = None
         if must_conditions or must_not_conditions:
@@ -136,8 +268,9 @@ class VectorService:
             query_vector=vector,
             limit=limit,
             query_filter=query_filter,
-            search_params=SearchParams(hnsw_ef=128, exact=False),
+            search_params=SearchParams(hnsw_ef=max(128, limit), exact=False),
             score_threshold=score_threshold,
+            with_payload=payload_fields if payload_fields else True,
         )
         
         return [
@@ -153,6 +286,7 @@ class VectorService:
         self,
         asset_id: int,
         limit: int = 10,
+        user_id: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
         根据资产 ID 搜索相似资产
@@ -160,6 +294,7 @@ class VectorService:
         Args:
             asset_id: 资产 ID
             limit: 返回数量
+            user_id: 所有者 ID（只返回该用户的公开资产）
             
         Returns:
             相似资产列表
@@ -184,8 +319,9 @@ class VectorService:
         # 搜索相似向量，排除自身
         return await self.search_similar(
             vector=vector,
-            limit=limit + 1,
+            limit=limit,
             exclude_asset_ids=[asset_id],
+            user_id=user_id,
         )
     
     async def get_all_vectors(
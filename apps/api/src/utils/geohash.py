@@ -0,0 +1,96 @@
+"""
+Geohash 编码与地图视野覆盖
+
+assets.geohash 由数据库触发器根据经纬度写入（12 位，见 migrations/init.sql 中的
+geohash_encode，编码规则与本模块一致）。相同前缀的资产落在同一网格单元内：
+- 聚合：按 left(geohash, n) 分组得到第 n 级网格的聚类
+- 过滤：视野覆盖的若干前缀转为 geohash 范围条件，走 (user_id, geohash) 索引
+"""
+import math
+from typing import List, Optional, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+MAX_PRECISION = 12
+
+# 地图瓦片边长 (像素) 与期望的聚类网格边长 (像素)
+TILE_SIZE = 256
+CLUSTER_CELL_PIXELS = 64
+
+
+def encode(lat: float, lon: float, precision: int = MAX_PRECISION) -> str:
+    """经纬度编码为 geohash"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, ch, bits, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, rng = (lon, lon_range) if even else (lat, lat_range)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = ch * 2 + 1
+            rng[0] = mid
+        else:
+            ch = ch * 2
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[ch])
+            ch, bits = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """第 precision 级网格单元的 (纬度跨度, 经度跨度)，单位为度"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def precision_for_zoom(zoom: int) -> int:
+    """地图缩放级别对应的聚类精度：网格宽度不小于 CLUSTER_CELL_PIXELS 像素的最细级别"""
+    min_width = 360.0 * CLUSTER_CELL_PIXELS / (TILE_SIZE * 2 ** zoom)
+    precision = 1
+    while precision < MAX_PRECISION and cell_size(precision + 1)[1] >= min_width:
+        precision += 1
+    return precision
+
+
+def _cells(south: float, west: float, north: float, east: float, precision: int) -> List[Tuple[int, int]]:
+    lat_h, lon_w = cell_size(precision)
+    rows, cols = 2 ** (5 * precision // 2), 2 ** ((5 * precision + 1) // 2)
+    row_from = min(int((south + 90) // lat_h), rows - 1)
+    row_to = min(int((north + 90) // lat_h), rows - 1)
+    col_from = min(int((west + 180) // lon_w), cols - 1)
+    col_to = min(int((east + 180) // lon_w), cols - 1)
+    return [(row, col) for row in range(row_from, row_to + 1) for col in range(col_from, col_to + 1)]
+
+
+def covering_prefixes(
+    south: float, west: float, north: float, east: float, precision: int, max_cells: int = 16
+) -> Optional[List[str]]:
+    """
+    覆盖视野的 geohash 前缀
+
+    从 precision 开始逐级放粗，直到覆盖单元数不超过 max_cells。
+    west > east 表示视野跨越 180° 经线。
+
+    Returns:
+        前缀列表；视野接近全球、无需前缀过滤时返回 None
+    """
+    boxes = [(south, west, north, east)] if west <= east else [(south, west, north, 180.0), (south, -180.0, north, east)]
+    for level in range(min(precision, MAX_PRECISION), 0, -1):
+        lat_h, lon_w = cell_size(level)
+        count = sum(
+            (math.floor((n + 90) / lat_h) - math.floor((s + 90) / lat_h) + 1)
+            * (math.floor((e + 180) / lon_w) - math.floor((w + 180) / lon_w) + 1)
+            for s, w, n, e in boxes
+        )
+        if count > max_cells:
+            continue
+        prefixes = set()
+        for box in boxes:
+            for row, col in _cells(*box, level):
+                prefixes.add(encode(-90 + (row + 0.5) * lat_h, -180 + (col + 0.5) * lon_w, level))
+        if len(prefixes) >= len(BASE32):
+            return None
+        return sorted(prefixes)
+    return None
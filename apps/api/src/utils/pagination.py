@@ -0,0 +1,154 @@
+"""
+游标分页
+
+游标对客户端不透明（base64 编码的 JSON），有两种形式：
+- 键集游标 {"k": [排序值, id], "s": "列名:desc"}：按 (排序列, id) 定位下一页，
+  WHERE (col, id) < (:v, :id) ORDER BY col DESC, id DESC LIMIT n，
+  配合 (user_id, col, id) 索引，任意深度的翻页代价与第一页相同。排序列必须非空。
+  游标记录生成时的排序方式，更换排序后继续使用旧游标视为无效。
+- 偏移游标 {"o": n}：用于按相关度等计算值排序的结果（候选集本身有上限）。
+
+每页多取一条判断是否还有下一页，不依赖 count(*)。
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@dataclass
+class Page:
+    """一页查询结果"""
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    facets: Optional[Dict[str, Any]] = None  # 结果集的附加聚合（搜索分面）
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # 统一为 UTC 无时区时间，与写入时使用的 datetime.utcnow() 一致
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    """编码游标"""
+    if "k" in data:
+        data = {**data, "k": [_encode_value(v) for v in data["k"]]}
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    解码游标
+
+    Raises:
+        ValueError: 游标无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if "k" in data:
+            values = [_decode_value(v) for v in data["k"]]
+            if len(values) != 2:
+                raise ValueError
+            return {"k": values, "s": data.get("s")}
+        return {"o": max(int(data["o"]), 0)}
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("无效的分页游标") from e
+
+
+def page_offset(cursor: Optional[str], page: int, page_size: int) -> int:
+    """偏移分页的起始位置：优先使用偏移游标，否则按页码计算"""
+    if cursor:
+        data = decode_cursor(cursor)
+        if "o" not in data:
+            raise ValueError("无效的分页游标")
+        return data["o"]
+    return (max(page, 1) - 1) * page_size
+
+
+def slice_page(items: List[Any], offset: int, page_size: int, total: Optional[int] = None) -> Page:
+    """对已排好序的完整结果列表分页（偏移游标）"""
+    end = offset + page_size
+    next_cursor = encode_cursor({"o": end}) if end < len(items) else None
+    return Page(items=items[offset:end], next_cursor=next_cursor, total=total)
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query: Select,
+    sort_column,
+    page_size: int,
+    cursor: Optional[str] = None,
+    page: int = 1,
+    descending: bool = True,
+    keyset: bool = True,
+) -> Page:
+    """
+    执行分页查询
+
+    Args:
+        db: 数据库会话
+        query: 已包含过滤条件的查询（不含排序与分页）
+        sort_column: 排序列（模型属性）或排序表达式，以主键作为第二排序键
+        page_size: 每页数量
+        cursor: 上一页返回的游标
+        page: 未传游标时的页码（兼容按页码翻页的客户端）
+        descending: 是否降序
+        keyset: 是否使用键集游标（排序表达式或可空列需传 False，改用偏移游标）
+
+    Returns:
+        Page（total 由调用方按需填充）
+
+    Raises:
+        ValueError: 游标无效，或与当前排序方式不一致
+    """
+    entity = query.column_descriptions[0]["entity"]
+    keys = (sort_column, entity.id)
+    query = query.order_by(*[k.desc() if descending else k.asc() for k in keys])
+    sort_key = f"{getattr(sort_column, 'key', '')}:{'desc' if descending else 'asc'}"
+
+    data = decode_cursor(cursor) if cursor else {}
+    if "k" in data:
+        if not keyset:
+            raise ValueError("无效的分页游标")
+        if data["s"] != sort_key:
+            raise ValueError("分页游标与当前排序方式不一致，请从第一页重新获取")
+        row, bound = tuple_(*keys), tuple_(*data["k"])
+        query = query.where(row < bound if descending else row > bound)
+        offset = 0
+    else:
+        offset = data["o"] if "o" in data else (max(page, 1) - 1) * page_size
+        query = query.offset(offset)
+
+    result = await db.execute(query.limit(page_size + 1))
+    items = list(result.scalars().all())
+    if len(items) <= page_size:
+        return Page(items=items)
+
+    items = items[:page_size]
+    if keyset:
+        last = items[-1]
+        next_cursor = encode_cursor({"k": [getattr(last, sort_column.key), last.id], "s": sort_key})
+    else:
+        next_cursor = encode_cursor({"o": offset + page_size})
+    return Page(items=items, next_cursor=next_cursor)
@@ -0,0 +1,31 @@
+"""
+Redis 连接
+"""
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from src.config import settings
+
+_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """获取共享的 Redis 客户端（连接池在首次使用时建立）"""
+    global _client
+    if _client is None:
+        _client = aioredis.from_url(
+            settings.redis_url,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            health_check_interval=30,
+        )
+    return _client
+
+
+async def close_redis():
+    """关闭 Redis 连接池"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
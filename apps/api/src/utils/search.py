@@ -0,0 +1,57 @@
+"""
+关键词检索条件与多路检索结果融合
+
+assets.search_vector / search_text 由数据库触发器维护（见 migrations/init.sql）：
+- search_vector: 'simple' 分词的 tsvector，GIN 索引，用于词项匹配和相关度排序
+- search_text: 小写拼接文本，pg_trgm GIN 索引，用于子串匹配（中文、文件名片段）
+"""
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import func, or_
+
+from src.models import Asset
+
+# 与触发器中使用的文本检索配置一致
+TS_CONFIG = "simple"
+
+
+def _ts_query(query: str):
+    """解析用户输入（支持引号短语、OR、-排除）"""
+    return func.websearch_to_tsquery(TS_CONFIG, query)
+
+
+def keyword_filter(query: str):
+    """关键词匹配条件：词项命中或子串命中"""
+    return or_(
+        Asset.search_vector.op("@@")(_ts_query(query)),
+        Asset.search_text.contains(query.strip().lower(), autoescape=True),
+    )
+
+
+def keyword_rank(query: str):
+    """关键词相关度：加权词项得分 + 子串相似度"""
+    return (
+        func.ts_rank_cd(Asset.search_vector, _ts_query(query))
+        + func.word_similarity(query.strip().lower(), Asset.search_text)
+    )
+
+
+# 倒数排序融合常数（常用默认值，削弱单一列表头部排名的影响）
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(*rankings: Sequence[int], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    倒数排序融合：score(d) = Σ 1 / (k + rank_i(d))，rank 从 1 开始
+
+    Args:
+        rankings: 各检索方式按相关度排好序的资产 ID 列表
+
+    Returns:
+        [(资产 ID, 融合得分), ...]，按得分降序
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda x: (-x[1], -x[0]))
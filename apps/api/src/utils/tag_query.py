@@ -0,0 +1,216 @@
+"""
+标签布尔查询
+
+语法（关键字不区分大小写）：
+    风景 AND (猫 OR 狗) NOT 夜景
+    "城市 夜景" OR 街拍 -黑白
+- AND / OR / NOT，括号分组；相邻的项之间省略 AND
+- 前缀 - 等同于 NOT；含空格或关键字的标签用双引号括起
+- 优先级：NOT > AND > OR
+
+编译为 PostgreSQL 数组运算符，可使用 idx_assets_tags GIN 索引：
+- 同一 AND 组内的标签合并为一个  tags @> ARRAY[...]
+- 同一 OR 组内的标签合并为一个  tags && ARRAY[...]
+- 否定：NOT tags @> ARRAY[t]；AND 组内的多个否定合并为 NOT tags && ARRAY[...]
+tags 为 NULL 的资产按空标签处理。
+"""
+import re
+from typing import List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import and_, or_, true
+
+from src.models import Asset
+
+# 单个查询允许的最大长度、最多标签数与最大嵌套深度（括号、NOT）
+MAX_QUERY_LENGTH = 1000
+MAX_TERMS = 50
+MAX_DEPTH = 32
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+_KEYWORDS = {"AND", "OR", "NOT"}
+
+# 语法树节点：("tag", str) / ("and", [节点]) / ("or", [节点]) / ("not", 节点)
+Node = Tuple[str, Union[str, list, tuple]]
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    """切分为 (类型, 值) 序列，类型为 ( ) AND OR NOT TAG"""
+    tokens = []
+    pos, end = 0, len(query.rstrip())
+    while pos < end:
+        match = _TOKEN_RE.match(query, pos)
+        if not match:
+            raise ValueError("标签查询中的引号未闭合")
+        pos = match.end()
+        lparen, rparen, quoted, word = match.groups()
+        if lparen:
+            tokens.append(("(", lparen))
+        elif rparen:
+            tokens.append((")", rparen))
+        elif quoted is not None:
+            tokens.append(("TAG", quoted))
+        elif word.upper() in _KEYWORDS:
+            tokens.append((word.upper(), word))
+        elif word.startswith("-") and len(word) > 1:
+            tokens.extend([("NOT", "-"), ("TAG", word[1:])])
+        else:
+            tokens.append(("TAG", word))
+    return tokens
+
+
+class _Parser:
+    """递归下降解析"""
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.pos = 0
+        self.terms = 0
+        self.depth = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, str]:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self) -> Node:
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"标签查询语法错误：多余的 '{self.tokens[self.pos][1]}'")
+        return node
+
+    def parse_or(self) -> Node:
+        items = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else ("or", items)
+
+    def parse_and(self) -> Node:
+        items = [self.parse_unary()]
+        while self.peek() in ("AND", "NOT", "(", "TAG"):
+            if self.peek() == "AND":
+                self.take()
+            items.append(self.parse_unary())
+        return items[0] if len(items) == 1 else ("and", items)
+
+    def enter(self):
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise ValueError(f"标签查询嵌套不能超过 {MAX_DEPTH} 层")
+
+    def parse_unary(self) -> Node:
+        if self.peek() == "NOT":
+            self.take()
+            self.enter()
+            node = ("not", self.parse_unary())
+            self.depth -= 1
+            return node
+        return self.parse_primary()
+
+    def parse_primary(self) -> Node:
+        kind = self.peek()
+        if kind == "(":
+            self.take()
+            self.enter()
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise ValueError("标签查询语法错误：括号未闭合")
+            self.take()
+            self.depth -= 1
+            return node
+        if kind == "TAG":
+            tag = self.take()[1].strip()
+            if not tag:
+                raise ValueError("标签查询中存在空标签")
+            self.terms += 1
+            if self.terms > MAX_TERMS:
+                raise ValueError(f"标签查询最多包含 {MAX_TERMS} 个标签")
+            return ("tag", tag)
+        if kind is None:
+            raise ValueError("标签查询语法错误：表达式不完整")
+        raise ValueError(f"标签查询语法错误：意外的 '{self.tokens[self.pos][1]}'")
+
+
+def parse_tag_query(query: str) -> Optional[Node]:
+    """
+    解析标签查询
+
+    Returns:
+        语法树，查询为空时返回 None
+
+    Raises:
+        ValueError: 语法错误
+    """
+    if not isinstance(query, str):
+        raise ValueError("标签查询必须是字符串")
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ValueError(f"标签查询不能超过 {MAX_QUERY_LENGTH} 个字符")
+    tokens = _tokenize(query)
+    if not tokens:
+        return None
+    return _Parser(tokens).parse()
+
+
+def tags_all(tags: Sequence[str]):
+    """包含全部标签：tags @> ARRAY[...]"""
+    return Asset.tags.contains(list(tags))
+
+
+def tags_any(tags: Sequence[str]):
+    """包含任一标签：tags && ARRAY[...]"""
+    return Asset.tags.overlap(list(tags))
+
+
+def tags_none(tags: Sequence[str]):
+    """不包含其中任何标签：NOT tags && ARRAY[...]（单个标签时为 NOT tags @> ARRAY[t]）"""
+    inner = tags_all(tags) if len(tags) == 1 else tags_any(tags)
+    return _negate(inner)
+
+
+def _negate(clause):
+    # 正向条件在 tags 为 NULL 时为 NULL，取反时按空标签处理
+    return or_(Asset.tags.is_(None), ~clause)
+
+
+def _compile(node: Node):
+    kind, value = node
+    if kind == "tag":
+        return tags_all([value])
+    if kind == "not":
+        child_kind, child_value = value
+        if child_kind == "tag":
+            return tags_none([child_value])
+        return _negate(_compile(value))
+
+    # AND / OR：直接子节点中的标签（AND 组内还有被否定的标签）合并为一次数组运算
+    tags = [child[1] for child in value if child[0] == "tag"]
+    rest = [child for child in value if child[0] != "tag"]
+    clauses = []
+    if kind == "and":
+        excluded = [child[1][1] for child in rest if child[0] == "not" and child[1][0] == "tag"]
+        rest = [child for child in rest if not (child[0] == "not" and child[1][0] == "tag")]
+        if tags:
+            clauses.append(tags_all(tags))
+        if excluded:
+            clauses.append(tags_none(excluded))
+        clauses.extend(_compile(child) for child in rest)
+        return and_(*clauses)
+
+    if tags:
+        clauses.append(tags_all(tags) if len(tags) == 1 else tags_any(tags))
+    clauses.extend(_compile(child) for child in rest)
+    return or_(*clauses)
+
+
+def tag_filter(query: str):
+    """
+    标签查询编译为 SQL 条件
+
+    Raises:
+        ValueError: 语法错误
+    """
+    node = parse_tag_query(query)
+    return true() if node is None else _compile(node)
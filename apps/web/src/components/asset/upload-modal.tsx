@@ -9,7 +9,7 @@ import { Modal } from "@/components/ui/modal";
 import { Button } from "@/components/ui/button";
 import { AlbumSelector } from "@/components/album/album-selector";
 import { assetsApi, albumsApi } from "@/lib/api";
-import { cn, formatFileSize, generateId } from "@/lib/utils";
+import { cn, formatFileSize, generateId, sha256File } from "@/lib/utils";
 import toast from "react-hot-toast";
 
 interface UploadModalProps {
@@ -24,8 +24,14 @@ interface UploadFile {
   status: "pending" | "uploading" | "success" | "error";
   progress: number;
   error?: string;
+  skipped?: boolean; // 服务端已存在，跳过上传
 }
 
+// 超过该大小的文件不在浏览器中计算哈希，直接上传
+const HASH_CHECK_MAX_SIZE = 200 * 1024 * 1024;
+// 单次去重检查的文件数上限（与服务端一致）
+const HASH_CHECK_BATCH = 1000;
+
 export function UploadModal({ open, onClose, folderPath }: UploadModalProps) {
   const queryClient = useQueryClient();
   const [files, setFiles] = useState<UploadFile[]>([]);
@@ -118,12 +124,53 @@ export function UploadModal({ open, onClose, folderPath }: UploadModalProps) {
     }
   };
 
+  // 上传前按哈希检查，已存在的文件不再传输
+  const skipExistingFiles = async (pendingFiles: UploadFile[]) => {
+    try {
+      const hashed: Array<{ file: UploadFile; hash: string }> = [];
+      for (const f of pendingFiles) {
+        if (f.file.size > HASH_CHECK_MAX_SIZE) continue;
+        const hash = await sha256File(f.file);
+        if (!hash) return pendingFiles;
+        hashed.push({ file: f, hash });
+      }
+
+      const existing = new Set<string>();
+      for (let i = 0; i < hashed.length; i += HASH_CHECK_BATCH) {
+        const batch = hashed.slice(i, i + HASH_CHECK_BATCH);
+        const response = await assetsApi.checkUpload(
+          batch.map(({ file, hash }) => ({ hash, size: file.file.size }))
+        );
+        response.data.existing.forEach((h) => existing.add(h));
+      }
+
+      const skippedIds = new Set(
+        hashed.filter(({ hash }) => existing.has(hash)).map(({ file }) => file.id)
+      );
+      if (skippedIds.size > 0) {
+        setFiles((prev) =>
+          prev.map((f) =>
+            skippedIds.has(f.id)
+              ? { ...f, status: "success", progress: 100, skipped: true }
+              : f
+          )
+        );
+      }
+      return pendingFiles.filter((f) => !skippedIds.has(f.id));
+    } catch {
+      // 检查失败时回退为全部上传，由服务端去重
+      return pendingFiles;
+    }
+  };
+
   const handleUpload = async () => {
-    const pendingFiles = files.filter((f) => f.status === "pending");
+    let pendingFiles = files.filter((f) => f.status === "pending");
     if (pendingFiles.length === 0) return;
 
     setUploading(true);
 
+    pendingFiles = await skipExistingFiles(pendingFiles);
+
     // 并发上传，最多 3 个
     const concurrency = 3;
     for (let i = 0; i < pendingFiles.length; i += concurrency) {
@@ -222,7 +269,9 @@ export function UploadModal({ open, onClose, folderPath }: UploadModalProps) {
                   <div className="flex justify-between items-center mb-1">
                     <p className="text-sm font-medium truncate">{file.file.name}</p>
                     <span className="text-xs text-[var(--muted-foreground)]">
-                      {file.status === "uploading" && file.progress === 100
+                      {file.skipped
+                        ? "已存在，跳过上传"
+                        : file.status === "uploading" && file.progress === 100
                         ? "AI 分析中..."
                         : file.status === "uploading"
                           ? `${file.progress}%`
@@ -111,6 +111,7 @@ export interface AssetListResponse {
   page: number;
   page_size: number;
   has_more: boolean;
+  next_cursor?: string | null;
 }
 
 export interface Album {
@@ -253,6 +254,7 @@ export const assetsApi = {
   list: (params?: {
     page?: number;
     page_size?: number;
+    cursor?: string;
     asset_type?: string;
     folder_id?: number;
     status?: string;
@@ -271,13 +273,16 @@ export const assetsApi = {
   search: (params: {
     query?: string;
     ai_search?: boolean;
+    hybrid_search?: boolean;
     asset_types?: string[];
     folder_id?: number;
     tags?: string[];
+    tag_query?: string;
     date_from?: string;
     date_to?: string;
     page?: number;
     page_size?: number;
+    cursor?: string;
     sort_by?: string;
     sort_order?: string;
   }) => api.post<AssetListResponse>("/assets/search", params),
@@ -313,6 +318,10 @@ export const assetsApi = {
     );
   },
 
+  // 预上传去重检查：仅返回 missing 中的文件需要上传
+  checkUpload: (files: Array<{ hash: string; size: number }>) =>
+    api.post<{ existing: string[]; missing: string[] }>("/assets/upload/check", { files }),
+
   uploadBatch: (files: File[], folderPath?: string) => {
     const formData = new FormData();
     files.forEach((file) => formData.append("files", file));
@@ -342,6 +351,20 @@ export const assetsApi = {
 
 
   getMapAssets: () => api.get<Asset[]>("/assets/map"),
+  getMapClusters: (params: { south: number; west: number; north: number; east: number; zoom: number; limit?: number }) =>
+    api.get<{
+      precision: number;
+      total: number;
+      truncated: boolean;
+      clusters: {
+        geohash: string;
+        count: number;
+        latitude: number;
+        longitude: number;
+        asset_id: number;
+        thumbnail_url?: string;
+      }[];
+    }>("/assets/map/clusters", { params }),
 
   // 批量操作
   batchDelete: (assetIds: number[]) =>
@@ -225,3 +225,14 @@ export function isVideoFile(filename: string): boolean {
   const ext = getFileExtension(filename);
   return ["mp4", "webm", "mov", "avi", "mkv"].includes(ext);
 }
+
+/**
+ * 计算文件 SHA-256（需要安全上下文，不可用时返回 null）
+ */
+export async function sha256File(file: File): Promise<string | null> {
+  if (typeof window === "undefined" || !window.crypto?.subtle) return null;
+  const digest = await window.crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
@@ -32,6 +32,8 @@ class Settings(BaseSettings):
     
     # 定时任务配置
     album_scan_interval_hours: int = 6  # 相册建议扫描间隔
+    vector_gc_page_size: int = 1000  # 向量索引清理每页扫描的向量数
+    blob_gc_grace_hours: int = 24  # 引用归零的存储对象保留时长，超过后由清理任务删除
     
     class Config:
         env_file = ".env"
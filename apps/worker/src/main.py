@@ -9,7 +9,7 @@ from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 
 from src.config import settings
-from src.tasks import album_suggestion_task, cleanup_task
+from src.tasks import album_suggestion_task, cleanup_task, vector_gc_task
 
 
 def create_scheduler() -> AsyncIOScheduler:
@@ -34,6 +34,15 @@ def create_scheduler() -> AsyncIOScheduler:
         replace_existing=True,
     )
     
+    # 向量索引清理 - 每天凌晨 4 点执行
+    scheduler.add_job(
+        vector_gc_task,
+        trigger=CronTrigger(hour=4, minute=0),
+        id="vector_gc",
+        name="向量索引清理",
+        replace_existing=True,
+    )
+    
     return scheduler
 
 
@@ -2,6 +2,7 @@
 定时任务
 """
 import json
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any
 
@@ -42,6 +43,11 @@ class AlbumStatus(str, enum.Enum):
     ACCEPTED = "accepted"
     IGNORED = "ignored"
 
+class UploadSessionStatus(str, enum.Enum):
+    ACTIVE = "active"
+    COMPLETED = "completed"
+    ABORTED = "aborted"
+
 
 class Asset(Base):
     __tablename__ = "assets"
@@ -62,6 +68,7 @@ class Asset(Base):
     file_path = Column(String(255))
     thumbnail_path = Column(String(255))
     vector_id = Column(String(64))
+    embedding_hash = Column(String(64))
     user_id = Column(Integer)
 
 
@@ -119,6 +126,47 @@ class Collection(Base):
     deleted_at = Column(DateTime(timezone=True))
 
 
+class AssetVersion(Base):
+    __tablename__ = "asset_versions"
+    
+    id = Column(Integer, primary_key=True)
+    asset_id = Column(Integer)
+    file_path = Column(String(512))
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+    
+    hash = Column(String(64), primary_key=True)
+    file_path = Column(String(512), unique=True)
+    ref_count = Column(Integer, default=0)
+    updated_at = Column(DateTime)
+
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    
+    hash = Column(String(64), primary_key=True)
+    created_at = Column(DateTime)
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String(32), primary_key=True)
+    file_path = Column(String(512))
+    upload_id = Column(String(255))
+    status = Column(SQLEnum(UploadSessionStatus, native_enum=False))
+    expires_at = Column(DateTime)
+
+
+class UploadPart(Base):
+    __tablename__ = "upload_parts"
+    
+    session_id = Column(String(32), primary_key=True)
+    part_number = Column(Integer, primary_key=True)
+
+
 def get_gemini_client():
     """获取 Gemini 客户端"""
     from google import genai
@@ -130,23 +178,114 @@ def get_qdrant_client():
     return QdrantClient(url=settings.qdrant_url)
 
 
-def delete_from_storage(file_path: str):
-    """从 MinIO 删除文件"""
+def get_s3_client():
+    """获取 MinIO (S3) 客户端"""
     import boto3
     from botocore.config import Config
-    client = boto3.client(
+    return boto3.client(
         "s3",
         endpoint_url=settings.s3_endpoint,
         aws_access_key_id=settings.s3_access_key,
         aws_secret_access_key=settings.s3_secret_key,
         config=Config(signature_version="s3v4"),
     )
+
+
+# 与 API search_cache.GENERATION_KEY 一致
+SEARCH_GENERATION_KEY = "zmage:libgen:{}"
+
+
+def invalidate_search_cache(user_ids):
+    """递增用户的资产库版本号，使 API 缓存的搜索结果失效（在提交后调用）"""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    import redis
+    try:
+        client = redis.Redis.from_url(settings.redis_url)
+        with client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.incr(SEARCH_GENERATION_KEY.format(user_id))
+            pipe.execute()
+    except redis.RedisError as e:
+        print(f"搜索缓存失效失败: {e}")
+
+
+def delete_from_storage(file_path: str):
+    """从 MinIO 删除文件"""
+    client = get_s3_client()
     try:
         client.delete_object(Bucket=settings.s3_bucket, Key=file_path)
     except Exception as e:
         print(f"文件删除失败 ({file_path}): {e}")
 
 
+def release_storage(db, file_path: str) -> bool:
+    """
+    释放文件引用 (与 API BlobService.release 逻辑一致)
+    
+    blobs/ 下为内容寻址的共享文件，按 ref_count 计数，归零后记录保留，
+    由 sweep_unreferenced_blobs 在宽限期后删除；
+    历史遗留路径按是否仍被资产/版本引用判断。
+    
+    Returns:
+        遗留路径是否已无引用（由调用方在提交后删除物理文件）
+    """
+    if not file_path:
+        return False
+    
+    if file_path.startswith("blobs/"):
+        blob = db.query(Blob).filter(Blob.file_path == file_path).with_for_update().first()
+        if blob:
+            blob.ref_count -= 1
+            blob.updated_at = datetime.utcnow()
+        return False
+    
+    db.flush()
+    asset_refs = db.query(func.count(Asset.id)).filter(Asset.file_path == file_path).scalar()
+    version_refs = db.query(func.count(AssetVersion.id)).filter(AssetVersion.file_path == file_path).scalar()
+    return not asset_refs and not version_refs
+
+
+def sweep_unreferenced_blobs(db, batch_size: int = 500) -> int:
+    """
+    删除引用归零超过宽限期的 blob（对象与记录）
+    
+    逐条加锁 (FOR UPDATE SKIP LOCKED)：正在增加引用的事务持有行锁时跳过，
+    删除对象后才释放锁，之后重新引用的请求会发现对象缺失并重新上传。
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=settings.blob_gc_grace_hours)
+    blobs = (
+        db.query(Blob)
+        .filter(Blob.ref_count <= 0, Blob.updated_at < cutoff)
+        .with_for_update(skip_locked=True)
+        .limit(batch_size)
+        .all()
+    )
+    for blob in blobs:
+        delete_from_storage(blob.file_path)
+        db.delete(blob)
+    return len(blobs)
+
+
+def abort_multipart_upload(file_path: str, upload_id: str):
+    """取消 MinIO 分片上传，释放已上传的分片"""
+    client = get_s3_client()
+    try:
+        client.abort_multipart_upload(Bucket=settings.s3_bucket, Key=file_path, UploadId=upload_id)
+    except Exception as e:
+        print(f"分片上传取消失败 ({file_path}): {e}")
+
+
+# 向量 ID 命名空间（与 API VectorService 保持一致）
+VECTOR_NAMESPACE = uuid.UUID("be45eae8-cf27-4b22-acf0-a81534483eff")
+
+
+def point_id(asset_id: int) -> str:
+    """资产对应的确定性向量 ID"""
+    return str(uuid.uuid5(VECTOR_NAMESPACE, f"asset:{asset_id}"))
+
+
 def delete_from_qdrant(vector_id: str):
     """从 Qdrant 删除向量"""
     client = get_qdrant_client()
@@ -345,6 +484,7 @@ async def cleanup_task():
     print(f"\n[{datetime.now().isoformat()}] 开始执行清理任务...")
     
     db = SessionLocal()
+    unreferenced_files = []
     
     try:
         # 1. 清理已忽略的建议相册 (超过 30 天)
@@ -371,18 +511,24 @@ async def cleanup_task():
         ).all()
         
         for asset in trash_assets:
-            # 删除物理文件
-            if asset.file_path:
-                delete_from_storage(asset.file_path)
-            if asset.thumbnail_path:
-                delete_from_storage(asset.thumbnail_path)
-            
             # 删除向量
             if asset.vector_id:
                 delete_from_qdrant(asset.vector_id)
             
-            # 删除数据库记录
+            # 删除数据库记录（含版本记录）
+            versions = db.query(AssetVersion).filter(AssetVersion.asset_id == asset.id).all()
+            file_paths = [asset.file_path] + [v.file_path for v in versions]
+            for version in versions:
+                db.delete(version)
+            db.flush()
             db.delete(asset)
+            
+            # 释放文件引用，共享内容由 blob 清理删除，其余文件提交后删除
+            for file_path in file_paths:
+                if release_storage(db, file_path):
+                    unreferenced_files.append(file_path)
+            if asset.thumbnail_path:
+                unreferenced_files.append(asset.thumbnail_path)
         
         print(f"清空了 {len(trash_assets)} 个超过 30 天的回收站资产")
 
@@ -407,7 +553,35 @@ async def cleanup_task():
         if deleted_albums:
             print(f"清理了 {len(deleted_albums)} 个超过 30 天的已删除相册")
         
-        # 4. 清理孤立的关联记录 (防止数据库残留)
+        # 4. 取消过期的断点续传会话，释放 MinIO 中的未完成分片
+        expired_sessions = db.query(UploadSession).filter(
+            UploadSession.status == UploadSessionStatus.ACTIVE,
+            UploadSession.expires_at < datetime.utcnow(),
+        ).all()
+        
+        for session in expired_sessions:
+            abort_multipart_upload(session.file_path, session.upload_id)
+            session.status = UploadSessionStatus.ABORTED
+        
+        if expired_sessions:
+            # 分片记录只在合并时使用，会话取消后一并删除
+            db.query(UploadPart).filter(
+                UploadPart.session_id.in_([s.id for s in expired_sessions])
+            ).delete(synchronize_session=False)
+            print(f"取消了 {len(expired_sessions)} 个过期的上传会话")
+        
+        # 5. 清理不再被任何资产引用的向量嵌入缓存
+        from sqlalchemy import exists
+        result = db.execute(
+            EmbeddingCache.__table__.delete().where(
+                EmbeddingCache.created_at < cutoff_date,
+                ~exists().where(Asset.embedding_hash == EmbeddingCache.hash),
+            )
+        )
+        if result.rowcount:
+            print(f"清理了 {result.rowcount} 条未引用的向量嵌入缓存")
+        
+        # 6. 清理孤立的关联记录 (防止数据库残留)
         # 删除 asset_id 不在 assets 表中的记录
         from sqlalchemy import select
         db.execute(
@@ -418,8 +592,87 @@ async def cleanup_task():
         )
         
         db.commit()
+        invalidate_search_cache(asset.user_id for asset in trash_assets)
+        
+        # 提交后再删除不再引用的文件，回滚时文件仍然完整
+        for file_path in unreferenced_files:
+            delete_from_storage(file_path)
+        
+        # 7. 删除引用归零超过宽限期的 blob（单独的事务，尽快释放行锁）
+        swept = sweep_unreferenced_blobs(db)
+        db.commit()
+        if swept:
+            print(f"删除了 {swept} 个无引用的存储对象")
     except Exception as e:
         print(f"清理任务失败: {e}")
         db.rollback()
     finally:
         db.close()
+
+
+async def vector_gc_task():
+    """
+    向量索引清理任务
+    
+    分页扫描 Qdrant，删除以下向量：
+    - 资产已不存在或在回收站中（回收站资产的 vector_id 置空，恢复时由 API 补回）
+    - 同一资产的重复向量（既不是资产记录的 vector_id，也不是确定性 ID）
+    """
+    print(f"\n[{datetime.now().isoformat()}] 开始执行向量索引清理任务...")
+    
+    client = get_qdrant_client()
+    db = SessionLocal()
+    
+    scanned = removed = 0
+    offset = None
+    try:
+        while True:
+            points, offset = client.scroll(
+                collection_name=settings.qdrant_collection,
+                limit=settings.vector_gc_page_size,
+                offset=offset,
+                with_payload=["asset_id"],
+                with_vectors=False,
+            )
+            scanned += len(points)
+            
+            asset_ids = {p.payload.get("asset_id") for p in points if p.payload}
+            asset_ids.discard(None)
+            assets = {
+                a.id: a
+                for a in db.query(Asset).filter(Asset.id.in_(asset_ids)).all()
+            } if asset_ids else {}
+            
+            stale_ids = []
+            trashed = set()
+            for point in points:
+                asset = assets.get((point.payload or {}).get("asset_id"))
+                point_key = str(point.id)
+                if asset is None:
+                    stale_ids.append(point.id)
+                elif asset.deleted_at is not None:
+                    stale_ids.append(point.id)
+                    trashed.add(asset.id)
+                elif point_key != asset.vector_id and point_key != point_id(asset.id):
+                    stale_ids.append(point.id)
+            
+            if stale_ids:
+                client.delete(
+                    collection_name=settings.qdrant_collection,
+                    points_selector=stale_ids,
+                )
+                removed += len(stale_ids)
+            for asset_id in trashed:
+                assets[asset_id].vector_id = None
+            db.commit()
+            invalidate_search_cache(assets[asset_id].user_id for asset_id in trashed)
+            
+            if offset is None:
+                break
+        
+        print(f"扫描了 {scanned} 个向量，删除了 {removed} 个无效向量")
+    except Exception as e:
+        print(f"向量索引清理失败: {e}")
+        db.rollback()
+    finally:
+        db.close()